@@ -25,7 +25,14 @@ from app.routes.user_routes import router as user_router
 from app.routes.writing_generation_routes import router as writing_generation_router
 from app.routes.template_design_routes import router as template_design_router
 from app.routes.metaprompt_routes import router as meta_prompt_router
+from app.routes.job_routes import router as job_router
 from app.websocket_manager import router as ws_router, start_redis_listener, redis_client
+from app.utils.assistants import assistant_session
+from app.utils.atlas_client import close_mongo_clients
+from app.utils.indexes import apply_indexes
+from app.utils.jobs import job_queue
+from app.utils.llm import aclose_llm_clients, close_llm_clients
+from app.utils.responses import BSONJSONResponse
 
 
 # Load environment variables
@@ -42,7 +49,7 @@ if not logger.handlers:
 logger.setLevel(logging.ERROR)
 templates_dir = os.path.join(os.path.dirname(__file__), "templates")
 
-app = FastAPI()
+app = FastAPI(default_response_class=BSONJSONResponse)
 
 
 # Set up Jinja2 templates
@@ -59,8 +66,24 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     )
 
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     start_redis_listener()  # Start listening to Redis in a background thread
+    if os.getenv("APPLY_INDEXES_ON_STARTUP", "true").lower() == "true":
+        try:
+            apply_indexes()  # Create any missing MongoDB indexes
+        except Exception as e:
+            logger.error(f"Failed to apply MongoDB indexes: {e}")
+    await job_queue.start()  # Start the background job workers
+    assistant_session.start()  # Start deleting unused OpenAI files
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_queue.stop()  # Stop the background job workers
+    close_mongo_clients()  # Release the pooled MongoDB connections
+    await assistant_session.aclose()  # Delete the cached OpenAI assistants
+    close_llm_clients()  # Release the pooled LLM provider connections
+    await aclose_llm_clients()
 
 
 # Add session middleware
@@ -105,6 +128,7 @@ app.include_router(lab_design_router)
 app.include_router(podcast_design_router)
 app.include_router(template_design_router)
 app.include_router(meta_prompt_router)
+app.include_router(job_router)
 
 @app.get("/")
 async def read_root():
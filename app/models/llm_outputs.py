@@ -0,0 +1,33 @@
+# External imports
+from typing import List
+
+from pydantic import BaseModel
+
+
+class CourseModule(BaseModel):
+    module_name: str
+    module_description: str
+
+
+class CourseModules(BaseModel):
+    """
+    Output of COURSE_OUTLINE_TO_MODULES_PROMPT
+    """
+    modules: List[CourseModule]
+
+
+class LabIdea(BaseModel):
+    """
+    One entry of the GENERATE_LAB_IDEAS output, which is a list of ideas
+    """
+    name: str
+    description: str
+
+
+class WritingTemplate(BaseModel):
+    """
+    One entry of the GENERATE_TEMPLATES_FOR_WRITING_PROMPT output, which is a
+    list of templates
+    """
+    template_name: str
+    template_content: str
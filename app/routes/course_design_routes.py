@@ -1,8 +1,14 @@
 from app.services.course_design_services import *
 from fastapi import APIRouter, UploadFile, File, Form
 from typing import List, Optional
+from app.utils.responses import BSONRoute
+from app.utils.streaming import buffer_uploads, stream_generation
+from app.utils.jobs import job_queue, register_job
 
-router = APIRouter()
+router = APIRouter(route_class=BSONRoute)
+
+# Generations that can be queued to another worker through Redis
+register_job(generate_course_outline)
 
 # done
 @router.post("/generate_course_outline")
@@ -10,6 +16,20 @@ async def generate_course_outline_api(files: Optional[List[UploadFile]] = File(N
                                   instructions: str = Form(...), prompt: str = Form(...), use_metaprompt: Optional[bool] = Form(False)):
     return await generate_course_outline(files, instructions, prompt, use_metaprompt=False) 
 
+# Same as /generate_course_outline, streaming the outline as server-sent events
+@router.post("/generate_course_outline/stream")
+async def generate_course_outline_stream_api(files: Optional[List[UploadFile]] = File(None),
+                                             instructions: str = Form(...), prompt: str = Form(...), use_metaprompt: Optional[bool] = Form(False)):
+    return stream_generation(generate_course_outline, await buffer_uploads(files), instructions, prompt, use_metaprompt=False)
+
+# Same as /generate_course_outline, run as a background job; poll /jobs/{job_id} for the result
+@router.post("/generate_course_outline/job")
+async def generate_course_outline_job_api(files: Optional[List[UploadFile]] = File(None),
+                                          instructions: str = Form(...), prompt: str = Form(...), use_metaprompt: Optional[bool] = Form(False),
+                                          username: Optional[str] = Form(None)):
+    return await job_queue.enqueue(generate_course_outline, await buffer_uploads(files), instructions, prompt, False,
+                                   username=username)
+
 # /clone_course -> takes in the course_id, course_name, course_image, course_description, and clones the course
 @router.post("/clone_course")
 async def clone_course_api(course_id: str = Form(...)):
@@ -22,8 +42,8 @@ async def delete_course_api(course_id: str = Form(...)):
 
 # done
 @router.post("/create_course")
-async def create_course_api(username: str = Form(...),course_name: str = Form(...),  course_description: str = Form(...), course_outline: str = Form(...), files: Optional[List[UploadFile]] = File(None), course_image: UploadFile = File(...), modulesAtCreation: bool = Form(True)):
-    return await create_course(username, course_name, course_description, course_outline, files, course_image, modulesAtCreation)
+async def create_course_api(username: str = Form(...),course_name: str = Form(...),  course_description: str = Form(...), course_outline: str = Form(...), files: Optional[List[UploadFile]] = File(None), course_image: UploadFile = File(...), modulesAtCreation: bool = Form(True), use_cache: Optional[bool] = Form(True)):
+    return await create_course(username, course_name, course_description, course_outline, files, course_image, modulesAtCreation, use_cache=use_cache)
 
 @router.post("/update_course_info")
 async def update_course_info_api(course_id: str = Form(...), course_name: str = Form(...),  course_description: str = Form(...), course_outline: str = Form(...)):
@@ -39,8 +59,12 @@ async def update_module_selected_labs_api(course_id: str = Form(...), module_id:
 
 # done
 @router.post("/courses")
-async def courses_api(username: str = Form(...)):
-    return await get_courses(username)
+async def courses_api(username: str = Form(...),
+                      limit: Optional[int] = Form(0),
+                      after_id: Optional[str] = Form(None),
+                      sort_by: Optional[str] = Form("_id"),
+                      sort_order: Optional[str] = Form("asc")):
+    return await get_courses(username, limit=limit, after_id=after_id, sort_by=sort_by, sort_order=sort_order)
 
 # done
 @router.post("/add_module")
@@ -83,8 +107,8 @@ async def delete_resources_from_module_api(course_id: str = Form(...), module_id
 
 # done
 @router.get("/get_course/{course_id}")
-async def get_course_api(course_id: str):
-    return await get_course(course_id)
+async def get_course_api(course_id: str, hydrate_artifacts: bool = True):
+    return await get_course(course_id, hydrate_artifacts=hydrate_artifacts)
 
 @router.post("/update_course_tags")
 async def update_course_tags_api(course_id: str = Form(...), tags: List[str] = Form(...)):
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException
+from app.utils.jobs import job_queue
+from app.utils.responses import BSONRoute
+
+router = APIRouter(route_class=BSONRoute)
+
+
+# Status of a background job started by one of the .../job endpoints.
+# Updates are also pushed to /ws/tasks/{username}/{job_id}.
+@router.get("/jobs/{job_id}")
+async def get_job_api(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
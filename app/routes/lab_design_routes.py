@@ -1,9 +1,11 @@
 from app.services.lab_design_services import *
 from fastapi import APIRouter, UploadFile, File, Form
 from typing import List, Optional
+from app.utils.responses import BSONRoute
+from app.utils.streaming import buffer_uploads, stream_generation
 from app.services.github_helper_functions import get_repo_issues
 
-router = APIRouter()
+router = APIRouter(route_class=BSONRoute)
 
 # Endpoint for generating lab outline based on input files and instructions.
 @router.post("/generate_lab_outline")
@@ -13,6 +15,14 @@ async def generate_lab_outline_api(files: List[List[UploadFile]] = File(...),
                                   ):
     return await generate_lab_outline(files, instructions, use_metaprompt=False) 
 
+# Same as /generate_lab_outline, streaming the outline as server-sent events
+@router.post("/generate_lab_outline/stream")
+async def generate_lab_outline_stream_api(files: List[UploadFile] = File(...),
+                                          instructions: str = Form(...),
+                                          use_metaprompt: Optional[bool] = Form(False)
+                                          ):
+    return stream_generation(generate_lab_outline, await buffer_uploads(files), instructions, use_metaprompt=False)
+
 # Endpoint to clone an existing lab using the provided lab_id.
 @router.post("/clone_lab")
 async def clone_lab_api(lab_id: str = Form(...)):
@@ -32,8 +42,12 @@ async def create_lab_api(username: str = Form(...), lab_name: str = Form(...),
 
 # Endpoint to fetch labs associated with a username.
 @router.post("/labs")
-async def labs_api(username: str = Form(...)):
-    return await get_labs(username)
+async def labs_api(username: str = Form(...),
+                   limit: Optional[int] = Form(0),
+                   after_id: Optional[str] = Form(None),
+                   sort_by: Optional[str] = Form("_id"),
+                   sort_order: Optional[str] = Form("asc")):
+    return await get_labs(username, limit=limit, after_id=after_id, sort_by=sort_by, sort_order=sort_order)
 
 # Endpoint to add resources to an existing lab.
 @router.post("/add_resources_to_lab")
@@ -74,26 +88,60 @@ async def get_lab_api(lab_id: str):
 # Endpoint to generate an idea for a concept lab using lab_id, instructions, and a prompt.
 @router.post("/generate_idea_for_concept_lab")
 async def generate_idea_for_concept_lab_api(lab_id: str = Form(...), instructions: str = Form(...),
-                                            prompt: str = Form(...), use_metaprompt: Optional[bool] = Form(False)):
-    return await generate_idea_for_concept_lab(lab_id, instructions, prompt, use_metaprompt=False)
+                                            prompt: str = Form(...), use_metaprompt: Optional[bool] = Form(False),
+                                            use_cache: Optional[bool] = Form(True)):
+    return await generate_idea_for_concept_lab(lab_id, instructions, prompt, use_metaprompt=False, use_cache=use_cache)
 
 # Endpoint to generate a business use case for a lab using lab_id and a prompt.
 @router.post("/generate_business_use_case_for_lab")
 async def generate_business_use_case_for_lab_api(lab_id: str = Form(...), prompt: str = Form(...),
-                                                 use_metaprompt: Optional[bool] = Form(False)):
-    return await generate_business_use_case_for_lab(lab_id, prompt, use_metaprompt)
+                                                 use_metaprompt: Optional[bool] = Form(False),
+                                                 use_cache: Optional[bool] = Form(True)):
+    return await generate_business_use_case_for_lab(lab_id, prompt, use_metaprompt, use_cache=use_cache)
 
 # Endpoint to generate technical specifications for a lab using lab_id and a prompt.
 @router.post("/generate_technical_specifications_for_lab")
 async def generate_technical_specifications_for_lab_api(lab_id: str = Form(...), prompt: str = Form(...),
-                                                        use_metaprompt: Optional[bool] = Form(False)):
-    return await generate_technical_specifications_for_lab(lab_id, prompt, use_metaprompt=False)
+                                                        use_metaprompt: Optional[bool] = Form(False),
+                                                        use_cache: Optional[bool] = Form(True)):
+    return await generate_technical_specifications_for_lab(lab_id, prompt, use_metaprompt=False, use_cache=use_cache)
 
 # Endpoint to regenerate content with user provided feedback.
 @router.post("/regenerate_with_feedback")
 async def regenerate_with_feedback_api(content: str = Form(...), feedback: str = Form(...),
-                                       use_metaprompt: Optional[bool] = Form(False)):
-    return await regenerate_with_feedback(content, feedback, use_metaprompt=False)
+                                       use_metaprompt: Optional[bool] = Form(False),
+                                       use_cache: Optional[bool] = Form(True)):
+    return await regenerate_with_feedback(content, feedback, use_metaprompt=False, use_cache=use_cache)
+
+# Streaming variants of the generation endpoints above. They take the same
+# form fields and answer with server-sent events; the result is saved to the
+# lab and GitHub once generation finishes, even if the client disconnects.
+@router.post("/generate_idea_for_concept_lab/stream")
+async def generate_idea_for_concept_lab_stream_api(lab_id: str = Form(...), instructions: str = Form(...),
+                                                   prompt: str = Form(...), use_metaprompt: Optional[bool] = Form(False),
+                                                   use_cache: Optional[bool] = Form(True)):
+    return stream_generation(generate_idea_for_concept_lab, lab_id, instructions, prompt, use_metaprompt=False,
+                             use_cache=use_cache, detach=True)
+
+@router.post("/generate_business_use_case_for_lab/stream")
+async def generate_business_use_case_for_lab_stream_api(lab_id: str = Form(...), prompt: str = Form(...),
+                                                        use_metaprompt: Optional[bool] = Form(False),
+                                                        use_cache: Optional[bool] = Form(True)):
+    return stream_generation(generate_business_use_case_for_lab, lab_id, prompt, use_metaprompt,
+                             use_cache=use_cache, detach=True)
+
+@router.post("/generate_technical_specifications_for_lab/stream")
+async def generate_technical_specifications_for_lab_stream_api(lab_id: str = Form(...), prompt: str = Form(...),
+                                                               use_metaprompt: Optional[bool] = Form(False),
+                                                               use_cache: Optional[bool] = Form(True)):
+    return stream_generation(generate_technical_specifications_for_lab, lab_id, prompt, use_metaprompt=False,
+                             use_cache=use_cache, detach=True)
+
+@router.post("/regenerate_with_feedback/stream")
+async def regenerate_with_feedback_stream_api(content: str = Form(...), feedback: str = Form(...),
+                                              use_metaprompt: Optional[bool] = Form(False),
+                                              use_cache: Optional[bool] = Form(True)):
+    return stream_generation(regenerate_with_feedback, content, feedback, use_metaprompt=False, use_cache=use_cache)
 
 # Endpoint to save a concept lab idea to the lab.
 @router.post("/save_concept_lab_idea")
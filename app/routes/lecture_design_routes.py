@@ -1,8 +1,10 @@
 from app.services.lecture_design_services import *
 from fastapi import APIRouter, UploadFile, File, Form
 from typing import List, Optional
+from app.utils.responses import BSONRoute
+from app.utils.streaming import buffer_uploads, stream_generation
 
-router = APIRouter()
+router = APIRouter(route_class=BSONRoute)
 
 # done
 @router.post("/generate_lecture_outline")
@@ -10,6 +12,12 @@ async def generate_lecture_outline_api(files: Optional[List[UploadFile]] = File(
                                   instructions: str = Form(...)):
     return await generate_lecture_outline(files, instructions) 
 
+# Same as /generate_lecture_outline, streaming the outline as server-sent events
+@router.post("/generate_lecture_outline/stream")
+async def generate_lecture_outline_stream_api(files: Optional[List[UploadFile]] = File(None),
+                                              instructions: str = Form(...)):
+    return stream_generation(generate_lecture_outline, await buffer_uploads(files), instructions)
+
 # /clone_course -> takes in the course_id, course_name, course_image, course_description, and clones the course
 @router.post("/clone_lecture")
 async def clone_lecture_api(lecture_id: str = Form(...)):
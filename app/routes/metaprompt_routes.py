@@ -1,10 +1,20 @@
 from app.services.metaprompt import *
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from typing import List, Optional
+from app.utils.prompts import prompt_registry
+from app.utils.responses import BSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=BSONRoute)
 
 
 @router.post("/generate_prompt")
 async def generate_prompt_api(prompt: str = Form(...)):
-    return await generate_prompt(prompt) 
\ No newline at end of file
+    return await generate_prompt(prompt) 
+
+# Re-read app/data/prompts.json without waiting for the mtime check
+@router.post("/reload_prompts")
+async def reload_prompts_api():
+    try:
+        return {"prompts": prompt_registry.reload()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"The prompts file is not valid JSON: {e}")
@@ -1,8 +1,14 @@
 from app.services.podcast_design_services import *
 from fastapi import APIRouter, UploadFile, File, Form
 from typing import List, Optional
+from app.utils.responses import BSONRoute
+from app.utils.streaming import buffer_uploads, stream_generation
+from app.utils.jobs import job_queue, register_job
 
-router = APIRouter()
+router = APIRouter(route_class=BSONRoute)
+
+# Generations that can be queued to another worker through Redis
+register_job(generate_podcast_outline)
 
 @router.post("/generate_podcast_outline")
 async def generate_podcast_outline_api(files: Optional[List[UploadFile]] = File(None),
@@ -12,6 +18,26 @@ async def generate_podcast_outline_api(files: Optional[List[UploadFile]] = File(
                                   ):
     return await generate_podcast_outline(files, instructions, prompt, use_metaprompt=False) 
 
+# Same as /generate_podcast_outline, streaming the outline as server-sent events
+@router.post("/generate_podcast_outline/stream")
+async def generate_podcast_outline_stream_api(files: Optional[List[UploadFile]] = File(None),
+                                              instructions: str = Form(...),
+                                              prompt: str = Form(...),
+                                              use_metaprompt: Optional[bool] = Form(False)
+                                              ):
+    return stream_generation(generate_podcast_outline, await buffer_uploads(files), instructions, prompt, use_metaprompt=False)
+
+# Same as /generate_podcast_outline, run as a background job; poll /jobs/{job_id} for the result
+@router.post("/generate_podcast_outline/job")
+async def generate_podcast_outline_job_api(files: Optional[List[UploadFile]] = File(None),
+                                           instructions: str = Form(...),
+                                           prompt: str = Form(...),
+                                           use_metaprompt: Optional[bool] = Form(False),
+                                           username: Optional[str] = Form(None)
+                                           ):
+    return await job_queue.enqueue(generate_podcast_outline, await buffer_uploads(files), instructions, prompt, False,
+                                   username=username)
+
 @router.post("/generate_audio_for_podcast")
 async def generate_audio_for_podcast_api(
     outline_text: str = Form(...),
@@ -20,13 +46,23 @@ async def generate_audio_for_podcast_api(
     return await generate_audio_for_podcast(outline_text)
 
 @router.post("/podcasts")
-async def podcasts_api(username: str = Form(...)):
-    return await get_podcasts(username)
+async def podcasts_api(username: str = Form(...),
+                       limit: Optional[int] = Form(0),
+                       after_id: Optional[str] = Form(None),
+                       sort_by: Optional[str] = Form("_id"),
+                       sort_order: Optional[str] = Form("asc")):
+    return await get_podcasts(username, limit=limit, after_id=after_id, sort_by=sort_by, sort_order=sort_order)
 
 @router.post("/create_podcast")
 async def create_podcast_api(username: str = Form(...), podcast_name: str = Form(...),  podcast_description: str = Form(...), podcast_transcript: str = Form(...), files: Optional[List[UploadFile]] = File(None), podcast_image: UploadFile = File(...)):
     return await create_podcast(username, podcast_name, podcast_description, podcast_transcript, files, podcast_image)
 
+# Same as /create_podcast, run as a background job since the audio is synthesized inline
+@router.post("/create_podcast/job")
+async def create_podcast_job_api(username: str = Form(...), podcast_name: str = Form(...),  podcast_description: str = Form(...), podcast_transcript: str = Form(...), files: Optional[List[UploadFile]] = File(None), podcast_image: UploadFile = File(...)):
+    return await job_queue.enqueue(create_podcast, username, podcast_name, podcast_description, podcast_transcript,
+                                   await buffer_uploads(files), (await buffer_uploads([podcast_image]))[0], username=username)
+
 @router.get("/get_podcast/{podcast_id}")
 async def get_podcast_api(podcast_id: str):
     return await get_podcast(podcast_id)
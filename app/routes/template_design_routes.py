@@ -1,8 +1,9 @@
 from app.services.template_design_services import get_templates, get_template_details, delete_report, create_model_project, get_model_projects, get_model_project, delete_model_project, import_templates_to_project, get_project_template_reports, save_project_template_data, get_sample_data, get_sample_report, consolidate_reports, get_completion_status
 from fastapi import APIRouter, UploadFile, File, Form
 from typing import List, Optional
+from app.utils.responses import BSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=BSONRoute)
 
 
 # get all templates
@@ -32,8 +33,12 @@ async def create_model_project_api(username: str = Form(...), project_name: str
 
 # get model projects
 @router.post("/model_projects")
-async def model_projects_api(username: str = Form(...)):
-    return await get_model_projects(username)
+async def model_projects_api(username: str = Form(...),
+                             limit: Optional[int] = Form(0),
+                             after_id: Optional[str] = Form(None),
+                             sort_by: Optional[str] = Form("_id"),
+                             sort_order: Optional[str] = Form("asc")):
+    return await get_model_projects(username, limit=limit, after_id=after_id, sort_by=sort_by, sort_order=sort_order)
 
 # get model project from id
 @router.post("/model_project")
@@ -1,7 +1,8 @@
 from app.services.user_services import *
 from fastapi import APIRouter, Form
 from typing import List, Optional
-router = APIRouter()
+from app.utils.responses import BSONRoute
+router = APIRouter(route_class=BSONRoute)
 
 @router.post("/add_user_to_project_waitlist")
 async def add_user_to_project_waitlist_api(
@@ -1,12 +1,22 @@
 from app.services.writing_generation_services import *
 from fastapi import APIRouter, UploadFile, File, Form
 from typing import List, Optional
+from app.utils.responses import BSONRoute
+from app.utils.streaming import buffer_uploads, stream_generation
+from app.utils.jobs import job_queue, register_job
 
-router = APIRouter()
+router = APIRouter(route_class=BSONRoute)
+
+# Generations that can be queued to another worker through Redis
+register_job(writing_outline)
 
 @router.post("/writings")
-async def writings_api(username: str = Form(...)):
-    return await get_writings(username)
+async def writings_api(username: str = Form(...),
+                       limit: Optional[int] = Form(0),
+                       after_id: Optional[str] = Form(None),
+                       sort_by: Optional[str] = Form("_id"),
+                       sort_order: Optional[str] = Form("asc")):
+    return await get_writings(username, limit=limit, after_id=after_id, sort_by=sort_by, sort_order=sort_order)
 
 @router.post("/prompt")
 async def writing_prompt_api(identifier: str = Form(...)):
@@ -32,6 +42,26 @@ async def writing_outline_api(files: Optional[List[UploadFile]] = File(None),
                                   ):
     return await writing_outline(files, instructions, identifier, use_metaprompt=False) 
 
+# Same as /writing_outline, streaming the draft as server-sent events
+@router.post("/writing_outline/stream")
+async def writing_outline_stream_api(files: Optional[List[UploadFile]] = File(None),
+                                     instructions: str = Form(...),
+                                     identifier: str = Form(...),
+                                     use_metaprompt: Optional[bool] = Form(False)
+                                     ):
+    return stream_generation(writing_outline, await buffer_uploads(files), instructions, identifier, use_metaprompt=False, detach=True)
+
+# Same as /writing_outline, run as a background job; poll /jobs/{job_id} for the result
+@router.post("/writing_outline/job")
+async def writing_outline_job_api(files: Optional[List[UploadFile]] = File(None),
+                                  instructions: str = Form(...),
+                                  identifier: str = Form(...),
+                                  use_metaprompt: Optional[bool] = Form(False),
+                                  username: Optional[str] = Form(None)
+                                  ):
+    return await job_queue.enqueue(writing_outline, await buffer_uploads(files), instructions, identifier, False,
+                                   username=username)
+
 @router.post("/generate_templates")
 async def generate_templates_api(files: Optional[List[UploadFile]] = File(None), 
                                  identifier: str = Form(...),
@@ -105,8 +135,8 @@ async def save_writing_api(writing_id: str = Form(...),
     return await save_writing(writing_id, writing_outline, message, resources)
 
 @router.post("/rewrite_writing")
-async def rewrite_writing_api(writing_input: str = Form(...)):
-    return await rewrite_writing(writing_input)
+async def rewrite_writing_api(writing_input: str = Form(...), use_cache: Optional[bool] = Form(True)):
+    return await rewrite_writing(writing_input, use_cache=use_cache)
 
 
 @router.post("/create_rewriting")
@@ -1,15 +1,12 @@
 # generate_course_outline, clone_course, delete_course, create_course, add_module, add_resources_to_module, get_course, submit_module_for_content_generation, save_changes_post_content_generation, submit_module_for_structure_generation, save_changes_post_structure_generation, submit_module_for_deliverables_generation, save_changes_post_deliverables_generation, submit_for_publishing_pipeline
 # the stages of the course design pipeline are: raw_resources, in_content_generation_queue, pre_processed_content, post_processed_content, in_structure_generation_queue, pre_processed_structure, post_processed_structure, in_deliverables_generation_queue, pre_processed_deliverables, post_processed_deliverables, in_publishing_queue, published
 # Python standard libraries
-import ast
-import json
+import asyncio
 import logging
 import mimetypes
 import os
-import random
 import tempfile
-import time
-from urllib.parse import quote, unquote, urlparse
+from urllib.parse import unquote, urlparse
 
 # Third-party libraries
 import magic
@@ -18,15 +15,17 @@ import requests
 from bson.objectid import ObjectId
 from fastapi import FastAPI, HTTPException, UploadFile
 from fastapi.responses import StreamingResponse
-from langchain_core.prompts import PromptTemplate
-from openai import OpenAI
 from pptx import Presentation
 
 # Local application imports
 from app.services.metaprompt import generate_prompt
-from app.utils.atlas_client import AtlasClient
-from app.utils.llm import LLM
-from app.utils.s3_file_manager import S3FileManager
+from app.utils.atlas_client import AsyncAtlasClient
+from app.utils.pagination import find_page_or_400
+from app.utils.prompts import prompt_registry
+from app.models.llm_outputs import CourseModules
+from app.utils.llm import LLM, get_cache_ttl, get_parsed_response
+from app.utils.assistants import assistant_session
+from app.utils.s3_file_manager import S3FileManager, get_public_url
 
 
 COURSE_DESIGN_STEPS = [
@@ -47,10 +46,35 @@ COURSE_DESIGN_STEPS = [
     "published"  # expert-review-step
 ]
 
-
-def _get_course_and_module(course_id, module_id):
-    atlas_client = AtlasClient()
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+# Fields left out of the course list returned to the dashboard
+COURSE_SUMMARY_PROJECTION = {"modules": 0, "raw_resources": 0, "additional_artifacts": 0}
+COURSE_SORT_FIELDS = {"_id", "course_name", "status"}
+
+# Collection holding each kind of additional artifact. Anything else is a writing.
+ARTIFACT_COLLECTIONS = {
+    "Lecture": "lecture_design",
+    "Lab": "lab_design",
+    "Podcast": "podcast_design",
+}
+
+# Fields of the additional artifacts that the course page does not render
+ARTIFACT_PROJECTIONS = {
+    "lecture_design": {"raw_resources": 0},
+    "lab_design": {
+        "idea_history": 0,
+        "business_use_case_history": 0,
+        "technical_specifications_history": 0,
+        "lab_ideas": 0,
+        "raw_resources": 0,
+    },
+    "podcast_design": {"podcast_transcript": 0, "raw_resources": 0},
+    "writing_design": {"history": 0, "all_resources": 0},
+}
+
+
+async def _get_course_and_module(course_id, module_id):
+    atlas_client = AsyncAtlasClient()
+    course = await atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
     if not course:
         return "Course not found", None
 
@@ -63,91 +87,53 @@ def _get_course_and_module(course_id, module_id):
     return course, module
 
 
-def _get_prompt(prompt_name):
+async def _update_module(course_id, module_id, update):
     """
-    Get the prompt template
+    Apply an update to a single module of a course in one atomic operation
 
     Args:
-    prompt_name: str - the name of the prompt
+    course_id: str - the id of the course
+    module_id: ObjectId - the id of the module
+    update: dict - the update to apply, addressing the module as "modules.$[module]"
 
     Returns:
-    PromptTemplate: the prompt template
+    dict: the updated course, or None if the course or the module was not found
     """
-    prompts_file = "app/data/prompts.json"
-    with open(prompts_file, "r") as file:
-        prompts = json.load(file)
-    if prompt_name not in prompts:
-        logging.error(f"Prompt {prompt_name} not found")
-        return ""
-    return prompts[prompt_name]
+    atlas_client = AsyncAtlasClient()
+    return await atlas_client.find_one_and_update("course_design",
+                                                  filter={"_id": ObjectId(course_id), "modules.module_id": module_id},
+                                                  update=update,
+                                                  array_filters=[{"module.module_id": module_id}])
 
 
-def _get_response_from_llm(llm, prompt, inputs, output_type="json"):
+async def _module_not_found_message(course_id):
     """
-    Get the response from the LLM
+    Tell apart a missing course from a missing module after a module update matched nothing
 
     Args:
-    llm: LLM - the LLM object
-    prompt: PromptTemplate - the prompt template
-    inputs: dict - the inputs for the prompt
-    output_type: str - the type of output to be returned
+    course_id: str - the id of the course
 
     Returns:
-    dict: the response from the LLM
+    str: the error message
     """
-    # Try multiple times
-    trials = 5
-    for _ in range(trials):
-        try:
-            time.sleep(random.randint(1, 3))
-
-            response = llm.get_response(prompt, inputs=inputs)
-            logging.info(f"Processed response: {response}")
-
-            if output_type == "json":
-                return json.loads(response[response.index("{"):response.rindex("}")+1])
-
-            elif output_type == "list":
-                return ast.literal_eval(response[response.index("["):response.rindex("]")+1])
-
-            else:
-                return response
-
-        except Exception as e:
-            logging.error(f"Error in getting response: {e}")
-            continue
-
-    raise Exception("Something went wrong. Please try again later.")
-
+    atlas_client = AsyncAtlasClient()
+    course = await atlas_client.find_one("course_design", filter={"_id": ObjectId(course_id)}, projection={"_id": 1})
+    if not course:
+        return "Course not found"
+    return "Module not found in course"
 
-def _get_response(llm, prompt, inputs, output_type="json"):
-    # try with chatgpt first and then with gemini
-    try:
-        llm = LLM("chatgpt")
-        response = _get_response_from_llm(llm, prompt, inputs, output_type)
-        return response
-    except Exception as e:
-        logging.error(f"Error in getting response from chatgpt: {e}")
 
-    try:
-        llm = LLM("gemini")
-        response = _get_response_from_llm(llm, prompt, inputs, output_type)
-        return response
-    except Exception as e:
-        logging.error(f"Error in getting response from gemini: {e}")
-
-    raise Exception("Something went wrong. Please try again later.")
+def _get_prompt(prompt_name):
+    """
+    Get the prompt template
 
+    Args:
+    prompt_name: str - the name of the prompt
 
-def _convert_object_ids_to_strings(data):
-    if isinstance(data, dict):
-        return {key: _convert_object_ids_to_strings(value) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [_convert_object_ids_to_strings(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    else:
-        return data
+    Returns:
+    PromptTemplate: the prompt template
+    """
+    return prompt_registry.get(prompt_name)
 
 
 def _get_file_type(file: UploadFile):
@@ -159,116 +145,48 @@ def _get_file_type(file: UploadFile):
         return "File"
 
 
-async def get_courses(username: str):
-    atlas_client = AtlasClient()
-
-    # Find courses where username matches
-    courses = atlas_client.find("course_design")
-    user_courses = []
-    for course in courses:
-        users = course.get('users', [])
-        if username in users:
-            user_courses.append(course)
-    # courses = atlas_client.find("course_design")
-    
-    # Convert ObjectIDs to strings before returning
-    courses = _convert_object_ids_to_strings(user_courses)
+async def get_courses(username: str, limit=0, after_id=None, sort_by="_id", sort_order="asc"):
+    # Find courses where username matches, leaving out the heavy fields
+    courses = await find_page_or_400("course_design", COURSE_SORT_FIELDS,
+                                     filter={"users": username},
+                                     projection=COURSE_SUMMARY_PROJECTION,
+                                     limit=limit,
+                                     after_id=after_id,
+                                     sort_by=sort_by,
+                                     sort_order=sort_order,
+                                     noun="courses")
     
     return courses
 
 # generate_course_outline -> take in the input as the file and the instructions and generate the course outline
 
 
-async def generate_course_outline(files, instructions, prompt, use_metaprompt):
-    course_outline_instructions = prompt
+async def generate_course_outline(files, instructions, prompt, use_metaprompt, on_delta=None):
+    course_outline_prompt = prompt
     if use_metaprompt:
-        course_outline_instructions = _get_prompt("COURSE_OUTLINE_PROMPT")
-        course_outline_instructions = await generate_prompt(course_outline_instructions)
+        course_outline_prompt = await generate_prompt(_get_prompt("COURSE_OUTLINE_PROMPT"))
 
-    client = OpenAI(timeout=120, api_key=os.getenv("OPENAI_KEY"))
-    assistant_files_streams = []
     if files:
-        for file in files:
-            file_content = file.file.read()
-            file.file.seek(0)
-
-
-            assistant_files_streams.append((file.filename, file_content))
-
         instructions = instructions + "Use the attached files to create the course outline."
         instructions = instructions + "### Files: " + ", ".join([file.filename for file in files])
 
-    # Track created resources
-    created_assistant_id = None
-    created_vector_store_id = None
-    created_thread_id = None
+    # The assistant is keyed by its instructions, so they stay the same for
+    # every request and the per-request prompt goes in the message
+    course_outline_instructions = _get_prompt("COURSE_OUTLINE_PROMPT").replace(
+        "{INSTRUCTIONS}", "Given in the user's message")
 
     try:
-        assistant = client.beta.assistants.create(
+        response = await assistant_session.run(
             name="Course outline creator",
             instructions=course_outline_instructions,
-            model=os.getenv("OPENAI_MODEL"),
-            tools=[{"type": "file_search"}]
-        )
-        created_assistant_id = assistant.id  # Track the assistant
-
-        vector_store = client.vector_stores.create(
-            name="Course Resources",
-            expires_after={"days": 1, "anchor": "last_active_at"},
-        )
-        created_vector_store_id = vector_store.id  # Track the vector store
-        if files:
-            file_batch = client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=vector_store.id, files=assistant_files_streams
-            )
-
-            assistant = client.beta.assistants.update(
-                assistant_id=assistant.id,
-                tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}},
-            )
-
-        else:
-            assistant = client.beta.assistants.update(
-                assistant_id=assistant.id,
-            )
-
-        thread = client.beta.threads.create(
-            messages=[{
-                "role": "user",
-                "content": "Create the course outline based on the instructions provided and the following user's instructions: " + instructions,
-                }]
-            )
-        created_thread_id = thread.id  # Track the thread
-
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id, assistant_id=assistant.id, poll_interval_ms=10000
+            message=course_outline_prompt + "\n\nCreate the course outline based on the instructions provided and the following user's instructions: " + instructions,
+            files=files,
+            vector_store_name="Course Resources",
+            on_delta=on_delta,
         )
-
-        messages = list(client.beta.threads.messages.list(
-            thread_id=thread.id, run_id=run.id))
-        message_content = messages[0].content[0].text
-        annotations = message_content.annotations
-        citations = []
-
-        for index, annotation in enumerate(annotations):
-            message_content.value = message_content.value.replace(
-                annotation.text, f"[{index}]")
-            if file_citation := getattr(annotation, "file_citation", None):
-                cited_file = client.files.retrieve(file_citation.file_id)
-                citations.append(f"[{index}] {cited_file.filename}")
-
-        response = message_content.value
     except Exception as e:
         logging.error(f"Error in generating course outline: {e}")
         return "The request timed out. Please try again later. However, here's a sample response: \n\n# Module 1: **On Machine Learning Applications in Investments**\n**Description**: This module provides an overview of the use of machine learning (ML) in investment practices, including its potential benefits and common challenges. It highlights examples where ML techniques have outperformed traditional investment models.\n\n**Learning Outcomes**:\n- Understand the motivations behind using ML in investment strategies.\n- Recognize the challenges and solutions in applying ML to finance.\n- Explore practical applications of ML for predicting equity returns and corporate performance.\n### Module 2: **Alternative Data and AI in Investment Research**\n**Description**: This module explores how alternative data sources combined with AI are transforming investment research by providing unique insights and augmenting traditional methods.\n\n**Learning Outcomes**:\n- Identify key sources of alternative data and their relevance in investment research.\n- Understand how AI can process and derive actionable insights from alternative data.\n- Analyze real-world use cases showcasing the impact of AI in research and decision-making.\n### Module 3: **Data Science for Active and Long-Term Fundamental Investing**\n**Description**: This module covers the integration of data science into long-term fundamental investing, discussing how quantitative analysis can enhance traditional methods.\n\n**Learning Outcomes**:\n- Learn the foundational role of data science in long-term investment strategies.\n- Understand the benefits of combining data science with active investing.\n- Evaluate case studies on the effective use of data science to support investment decisions.\n### Module 4: **Unlocking Insights and Opportunities**\n**Description**: This module focuses on techniques and strategies for using data-driven insights to identify market opportunities and enhance investment management processes.\n\n**Learning Outcomes**:\n- Grasp the importance of leveraging advanced data analytics for opportunity identification.\n- Understand how to apply insights derived from data to optimize investment outcomes.\n- Explore tools and methodologies that facilitate the unlocking of valuable investment insights.\n### Module 5: **Advances in Natural Language Understanding for Investment Management**\n**Description**: This module highlights the progression of natural language understanding (NLU) and its application in finance. It covers recent developments and their implications for asset management.\n\n**Learning Outcomes**:\n- Recognize advancements in NLU and their integration into investment strategies.\n- Explore trends and applications of NLU in financial data analysis.\n- Understand the technical challenges and solutions associated with implementing NLU tools.\n###"
-    finally:
-        # Clean up all created resources to avoid charges
-        if created_assistant_id:
-            client.beta.assistants.delete(created_assistant_id)
-        if created_vector_store_id:
-            client.vector_stores.delete(created_vector_store_id)
-        if created_thread_id:
-            client.beta.threads.delete(created_thread_id)
 
     return response
 
@@ -277,8 +195,8 @@ async def generate_course_outline(files, instructions, prompt, use_metaprompt):
 
 async def clone_course(course_id):
 
-    atlas_client = AtlasClient()
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+    atlas_client = AsyncAtlasClient()
+    course = await atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
 
     if not course:
         return "Course not found"
@@ -299,9 +217,7 @@ async def clone_course(course_id):
                 data[index] = clone(item)
         return data
 
-    atlas_client.insert("course_design", course)
-
-    course = _convert_object_ids_to_strings(course)
+    await atlas_client.insert("course_design", course)
 
     return course
 
@@ -309,45 +225,41 @@ async def clone_course(course_id):
 # delete_course -> takes in the course_id and deletes the course
 async def delete_course(course_id):
 
-    atlas_client = AtlasClient()
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+    atlas_client = AsyncAtlasClient()
+    course = await atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
 
     if not course:
         return "Course not found"
 
     course = course[0]
 
-    atlas_client.delete("course_design", filter={"_id": ObjectId(course_id)})
-
-    course = _convert_object_ids_to_strings(course)
+    await atlas_client.delete("course_design", filter={"_id": ObjectId(course_id)})
 
     return course
 
 
 # create_course -> takes in the course name, course image, course description, files, course_outline, and creates a course object. also handles creation of modules
-async def create_course(username, course_name, course_description, course_outline, files, course_image, modulesAtCreation):
+async def create_course(username, course_name, course_description, course_outline, files, course_image, modulesAtCreation, use_cache=True):
     course_status = "In Design Phase"
 
     s3_file_manager = S3FileManager()
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     modules = []
     if modulesAtCreation:
         # convert the course outline to modules
-        course_outline_to_modules_prompt = _get_prompt("COURSE_OUTLINE_TO_MODULES_PROMPT")
         inputs = {"COURSE_OUTLINE": course_outline}
-        prompt = PromptTemplate(template=course_outline_to_modules_prompt,
-                                input_variables=["COURSE_OUTLINE"])
+        prompt = prompt_registry.template("COURSE_OUTLINE_TO_MODULES_PROMPT")
 
         llm = LLM("chatgpt")
-        response = _get_response(llm, prompt, inputs, output_type="json")
-        modules = response.get("modules", [])
+        response = await get_parsed_response(llm, prompt, inputs, output_type=CourseModules,
+                                             use_cache=use_cache, cache_ttl=get_cache_ttl("COURSE_OUTLINE_TO_MODULES_PROMPT"))
+        modules = [module.model_dump() for module in response.modules]
 
     # upload the course image to s3 and get the link
     course_id = ObjectId()
     key = f"qu-course-design/{course_id}/course_image/{course_image.filename}"
     await s3_file_manager.upload_file_from_frontend(course_image, key)
-    key = quote(key)
-    course_image_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+    course_image_link = get_public_url(key)
 
     users = [username]
     course = {        
@@ -370,8 +282,7 @@ async def create_course(username, course_name, course_description, course_outlin
 
             key = f"qu-course-design/{course_id}/{step_directory}/{file_id}.{file.filename.split('.')[-1]}"
             await s3_file_manager.upload_file_from_frontend(file, key)
-            key = quote(key)
-            resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+            resource_link = get_public_url(key)
 
             raw_resources += [{
                 "resource_id": ObjectId(),
@@ -398,8 +309,7 @@ async def create_course(username, course_name, course_description, course_outlin
                     file.file.seek(0)
                     key = f"qu-course-design/{course_id}/{step_directory}/{file_id}.{file.filename.split('.')[-1]}"
                     await s3_file_manager.upload_file_from_frontend(file, key)
-                    key = quote(key)
-                    resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+                    resource_link = get_public_url(key)
 
                     raw_resources += [{
                         "resource_id": ObjectId(),
@@ -413,9 +323,8 @@ async def create_course(username, course_name, course_description, course_outlin
 
     course["modules"] = modules
 
-    atlas_client.insert("course_design", course)
+    await atlas_client.insert("course_design", course)
 
-    course = _convert_object_ids_to_strings(course)
     return course
 
 
@@ -427,13 +336,13 @@ def _get_resource_key_from_link(resource_link):
 
 
 async def update_course_tags(course_id, tags):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
      # Check if tags contain a single empty string and convert it to an empty list
     if len(tags) == 1 and tags[0] == "":
         tags = []
     
     # Fetch the course from the database
-    course_data = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+    course_data = await atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
 
     if not course_data:
         return "Course not found"
@@ -445,7 +354,7 @@ async def update_course_tags(course_id, tags):
     }
 
     # Perform the update operation
-    update_response = atlas_client.update(
+    update_response = await atlas_client.update(
         "course_design",  # Collection name
         filter = {"_id": ObjectId(course_id)},  # Identify the correct lab
         update = update_payload
@@ -460,18 +369,20 @@ async def update_course_tags(course_id, tags):
 
 # add_module -> takes in the course_id, module_name, module_description, and adds a module to the course
 async def add_module(course_id, module_name, module_description):
-    atlas_client = AtlasClient()
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+    atlas_client = AsyncAtlasClient()
+    course = await atlas_client.find_one("course_design", filter={"_id": ObjectId(course_id)},
+                                         projection={"raw_resources": 1})
 
     if not course:
         return "Course not found"
 
-    course = course[0]
     raw_resources = course.get("raw_resources", [])
 
     module_id = ObjectId()
+    s3_file_manager = S3FileManager()
 
     raw_resources_added_to_module = []
+    copies = []
     # add the raw_resources to the module
     for resource in raw_resources:
         resource_type = resource.get("resource_type")
@@ -482,10 +393,8 @@ async def add_module(course_id, module_name, module_description):
 
         resource_key = _get_resource_key_from_link(resource_link)
         key = f"qu-course-design/{course_id}/{str(module_id)}/raw_resources/{resource_name}"
-        s3_file_manager = S3FileManager()
-        s3_file_manager.copy_file(resource_key, key)
-        key = quote(key)
-        resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+        copies.append((resource_key, key))
+        resource_link = get_public_url(key)
 
         raw_resources_added_to_module.append({"resource_id": resource_id,
                                               "resource_type": resource_type,
@@ -494,7 +403,10 @@ async def add_module(course_id, module_name, module_description):
                                               "resource_link": resource_link
                                               })
 
-    modules = course.get("modules", [])
+    # copy the raw resources in one batch, undoing the copies if any of them failed
+    if not await s3_file_manager.acopy_files_or_undo(copies):
+        return "Failed to copy the course resources to the module"
+
     module = {"module_id": module_id,
               "module_name": module_name,
               "module_description": module_description,
@@ -502,53 +414,68 @@ async def add_module(course_id, module_name, module_description):
               "raw_resources": raw_resources_added_to_module
               }
 
-    modules.append(module)
-    course["modules"] = modules
-
-    atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, update={"$set": {"modules": modules}})
+    course = await atlas_client.find_one_and_update("course_design", filter={"_id": ObjectId(course_id)},
+                                                    update={"$push": {"modules": module}})
+    if not course:
+        return "Course not found"
 
-    course = _convert_object_ids_to_strings(course)
     return course
 
 # get_course -> takes in the course_id and returns the course object
 
 
-async def get_course(course_id):
+async def _hydrate_artifacts(atlas_client, additional_artifacts):
+    """
+    Fetch the documents referenced by a course's additional artifacts, with
+    one $in query per artifact collection, run concurrently
 
-    atlas_client = AtlasClient()
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+    Args:
+    atlas_client: AsyncAtlasClient - the database client
+    additional_artifacts: list - the {artifact_type, artifact_id} references
+
+    Returns:
+    list: the artifact documents that still exist, in reference order
+    """
+    ids_by_collection = {}
+    for artifact in additional_artifacts:
+        collection_name = ARTIFACT_COLLECTIONS.get(artifact.get("artifact_type"), "writing_design")
+        ids_by_collection.setdefault(collection_name, []).append(ObjectId(artifact.get("artifact_id")))
+
+    collection_names = list(ids_by_collection)
+    results = await asyncio.gather(*[
+        atlas_client.find(collection_name,
+                          filter={"_id": {"$in": ids_by_collection[collection_name]}},
+                          projection=ARTIFACT_PROJECTIONS.get(collection_name))
+        for collection_name in collection_names
+    ])
+
+    documents = {}
+    for collection_name, items in zip(collection_names, results):
+        for item in items:
+            documents[(collection_name, item["_id"])] = item
+
+    artifacts = []
+    for artifact in additional_artifacts:
+        collection_name = ARTIFACT_COLLECTIONS.get(artifact.get("artifact_type"), "writing_design")
+        document = documents.get((collection_name, ObjectId(artifact.get("artifact_id"))))
+        if document:
+            artifacts.append(document)
+    return artifacts
+
+
+async def get_course(course_id, hydrate_artifacts=True):
+
+    atlas_client = AsyncAtlasClient()
+    course = await atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
 
     if not course:
         return {}
 
     course = course[0]
 
-    # populate the additional artifacts
-    artifacts = []
-    for artifact in course.get("additional_artifacts", []):
-        artifact_type = artifact.get("artifact_type")
-        artifact_id = artifact.get("artifact_id")
-
-        if artifact_type == "Lecture":
-            writing = atlas_client.find("lecture_design", filter={"_id": ObjectId(artifact_id)})
-            if writing:
-                artifacts.append(writing[0])
-        elif artifact_type == "Lab":
-            lab = atlas_client.find("lab_design", filter={"_id": ObjectId(artifact_id)})
-            if lab:
-                artifacts.append(lab[0])
-        elif artifact_type == "Podcast":
-            podcast = atlas_client.find("podcast_design", filter={"_id": ObjectId(artifact_id)})
-            if podcast:
-                artifacts.append(podcast[0])
-        else:
-            lecture = atlas_client.find("writing_design", filter={"_id": ObjectId(artifact_id)})
-            if lecture:
-                artifacts.append(lecture[0])
-
-    course['additional_artifacts'] = artifacts
-
-    course = _convert_object_ids_to_strings(course)
+    # populate the additional artifacts, unless the caller only needs the course shell
+    if hydrate_artifacts:
+        course['additional_artifacts'] = await _hydrate_artifacts(atlas_client, course.get("additional_artifacts", []))
 
     return course
 
@@ -564,15 +491,13 @@ async def add_resources_to_module(course_id, module_id, resource_type, resource_
         # resource file is the file
         key = f"qu-course-design/{course_id}/{module_id}/{step_directory}/{str(resource_id)}."+resource_file.filename.split(".")[-1]
         await s3_file_manager.upload_file_from_frontend(resource_file, key)
-        key = quote(key)
-        resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+        resource_link = get_public_url(key)
 
     elif resource_type == "Image":
         # resource file is the image
         key = f"qu-course-design/{course_id}/{module_id}/{step_directory}/{str(resource_id)}."+resource_file.filename.split(".")[-1]
         await s3_file_manager.upload_file_from_frontend(resource_file, key)
-        key = quote(key)
-        resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+        resource_link = get_public_url(key)
 
     elif resource_type == "Link":
         # resource file is the resource link
@@ -590,44 +515,26 @@ async def add_resources_to_module(course_id, module_id, resource_type, resource_
 
         key = f"qu-course-design/{course_id}/{module_id}/{step_directory}/{resource_file_name}"
         await s3_file_manager.upload_file(resource_file_name, key)
-        key = quote(key)
 
         # remove the temp file
         os.remove(resource_file_name)
-        resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
-
-    atlas_client = AtlasClient()
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
-    if not course:
-        return "Course not found"
-
-    course = course[0]
-    modules = course.get("modules", [])
-
-    for index, module in enumerate(modules):
-        if module.get("module_id") == ObjectId(module_id):
-            resources = module.get(f"{step_directory}", [])
-            resource = {
-                "resource_id": resource_id,
-                "resource_type": resource_type,
-                "resource_name": resource_name,
-                "resource_description": resource_description,
-                "resource_link": resource_link
-            }
-            resources.append(resource)
-            modules[index][step_directory] = resources
-            break
-
-    course["modules"] = modules
-
-    atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, update={
-        "$set": {
-            "modules": modules
-        }
+        resource_link = get_public_url(key)
+
+    resource = {
+        "resource_id": resource_id,
+        "resource_type": resource_type,
+        "resource_name": resource_name,
+        "resource_description": resource_description,
+        "resource_link": resource_link
     }
-    )
 
-    course = _convert_object_ids_to_strings(course)
+    course = await _update_module(course_id, ObjectId(module_id), {
+        "$push": {
+            f"modules.$[module].{step_directory}": resource
+        }
+    })
+    if not course:
+        return await _module_not_found_message(course_id)
 
     return course
 
@@ -636,30 +543,14 @@ async def add_resources_to_module(course_id, module_id, resource_type, resource_
 async def delete_resources_from_module(course_id, module_id, resource_id, course_design_step=0):
     step_directory = COURSE_DESIGN_STEPS[course_design_step]
 
-    atlas_client = AtlasClient()
-    course = atlas_client.find("course_design", filter={
-                               "_id": ObjectId(course_id)})
+    course = await _update_module(course_id, ObjectId(module_id), {
+        "$pull": {
+            f"modules.$[module].{step_directory}": {"resource_id": ObjectId(resource_id)}
+        }
+    })
 
     if not course:
-        return "Course not found"
-
-    course = course[0]
-    modules = course.get("modules", [])
-    for module in modules:
-        if module.get("module_id") == ObjectId(module_id):
-            resources = module.get(step_directory, [])
-            for resource in resources:
-                if resource.get("resource_id") == ObjectId(resource_id):
-                    resources.remove(resource)
-                    break
-            module[step_directory] = resources
-            break
-
-    course["modules"] = modules
-
-    atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, update={"$set": {"modules": modules}})
-
-    course = _convert_object_ids_to_strings(course)
+        return await _module_not_found_message(course_id)
 
     return course
 
@@ -684,31 +575,40 @@ async def replace_resources_in_module(course_id, module_id, resource_id, resourc
                                            resource_id=resource_id,
                                            course_design_step=course_design_step)
 
-    course = _convert_object_ids_to_strings(course)
-
     return course
 
 
-def _handle_s3_file_transfer(course_id, module_id, prev_step_directory, step_directory, resources):
+async def _handle_s3_file_transfer(course_id, module_id, prev_step_directory, step_directory, resources):
+    """
+    Copy the resources of the previous step to the next one. If any copy
+    fails, the objects it created are deleted again.
+
+    Returns:
+    bool: True if every resource was copied, False otherwise
+    """
     s3_file_manager = S3FileManager()
+    copies = []
     for resource in resources:
         next_step_key = f"qu-course-design/{course_id}/{module_id}/{step_directory}/{resource['resource_link'].split('/')[-1]}"
         prev_step_key = f"qu-course-design/{course_id}/{module_id}/{prev_step_directory}/{resource['resource_link'].split('/')[-1]}"
-        s3_file_manager.copy_file(prev_step_key, next_step_key)
+        copies.append((prev_step_key, next_step_key))
+    return await s3_file_manager.acopy_files_or_undo(copies)
 
 
-def _rollback_s3_file_transfer(course_id, module_id, step_directory, resources):
+async def _rollback_s3_file_transfer(course_id, module_id, step_directory, resources):
     s3_file_manager = S3FileManager()
-    for resource in resources:
-        delete_file_key = f"""qu-course-design/{course_id}/{module_id}/{step_directory}/{resource["resource_link"].split('/')[-1]}"""
-        s3_file_manager.delete_file(delete_file_key)
+    keys = [f"""qu-course-design/{course_id}/{module_id}/{step_directory}/{resource["resource_link"].split('/')[-1]}"""
+            for resource in resources]
+    # One batch delete on the S3 executor instead of a blocking call per file
+    if keys:
+        await s3_file_manager.adelete_files(keys)
 
 
 async def remove_module_from_step(course_id, module_id, course_design_step, queue_name_suffix, instructions=""):
     step_directory = COURSE_DESIGN_STEPS[course_design_step]
     prev_step_directory = COURSE_DESIGN_STEPS[course_design_step - 1]
 
-    course, module = _get_course_and_module(course_id, module_id)
+    course, module = await _get_course_and_module(course_id, module_id)
 
     if not course:
         return "Course not found"
@@ -720,12 +620,12 @@ async def remove_module_from_step(course_id, module_id, course_design_step, queu
     #     module["instructions"] = instructions
     course["modules"] = [module if m.get("module_id") == module_id else m for m in course.get("modules", [])]
 
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     # atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, update={"$set": {"modules": course.get("modules", [])}
     # })
 
     step_directory_resources = module.get(step_directory, [])
-    _rollback_s3_file_transfer(
+    await _rollback_s3_file_transfer(
         course_id, module_id, step_directory, step_directory_resources)
     # _handle_s3_file_transfer(
     #     course_id, module_id, prev_step_directory, step_directory, prev_step_resources)
@@ -738,16 +638,14 @@ async def remove_module_from_step(course_id, module_id, course_design_step, queu
         queue_payload["instructions"] = instructions
 
     # Check if the document already exists
-    existing_item = atlas_client.find(
+    existing_item = await atlas_client.find(
         step_directory, {"course_id": course_id, "module_id": module_id}, limit=1)
 
     if existing_item:
         # If it exists, update it
-        atlas_client.delete(
+        await atlas_client.delete(
             step_directory, {"course_id": course_id, "module_id": module_id})
 
-    course = _convert_object_ids_to_strings(course)
-
     return True
 
 
@@ -755,7 +653,7 @@ async def submit_module_for_step(course_id, module_id, course_design_step, queue
     step_directory = COURSE_DESIGN_STEPS[course_design_step]
     prev_step_directory = COURSE_DESIGN_STEPS[course_design_step - 1]
 
-    course, module = _get_course_and_module(course_id, module_id)
+    course, module = await _get_course_and_module(course_id, module_id)
 
     if not course:
         return "Course not found"
@@ -780,20 +678,19 @@ async def submit_module_for_step(course_id, module_id, course_design_step, queue
     if course_design_step == 10:
         await remove_module_from_step(course_id, module_id, 12, "in_publishing_queue", instructions)
 
+    prev_step_resources = module.get(prev_step_directory, [])
+    if not await _handle_s3_file_transfer(course_id, module_id, prev_step_directory, step_directory, prev_step_resources):
+        return "Failed to copy the module resources to the next step"
+
     module["status"] = f"{queue_name_suffix.replace('_', ' ').title()}"
+    module_update = {"modules.$[module].status": module["status"]}
     if instructions:
         module["instructions"] = instructions
-    
-    course["modules"] = [module if m.get(
-        "module_id") == module_id else m for m in course.get("modules", [])]
+        module_update["modules.$[module].instructions"] = instructions
 
-    atlas_client = AtlasClient()
-    atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, 
-                        update={"$set": {"modules": course.get("modules", [])}})
+    await _update_module(course_id, module["module_id"], {"$set": module_update})
 
-    prev_step_resources = module.get(prev_step_directory, [])
-    _handle_s3_file_transfer(
-        course_id, module_id, prev_step_directory, step_directory, prev_step_resources)
+    atlas_client = AsyncAtlasClient()
 
     queue_payload = {
         "course_id": course_id,
@@ -807,18 +704,16 @@ async def submit_module_for_step(course_id, module_id, course_design_step, queue
         queue_payload["template_url"] = template_url
 
     # Check if the document already exists
-    existing_item = atlas_client.find(
+    existing_item = await atlas_client.find(
         step_directory, {"course_id": course_id, "module_id": module_id}, limit=1)
 
     if existing_item:
         # If it exists, update it
-        atlas_client.delete(step_directory, {"course_id": course_id, "module_id": module_id})
-        atlas_client.insert(step_directory, queue_payload)
+        await atlas_client.delete(step_directory, {"course_id": course_id, "module_id": module_id})
+        await atlas_client.insert(step_directory, queue_payload)
     else:
         # If it does not exist, insert a new document
-        atlas_client.insert(step_directory, queue_payload)
-
-    course = _convert_object_ids_to_strings(course)
+        await atlas_client.insert(step_directory, queue_payload)
 
     return course
 
@@ -827,26 +722,26 @@ async def submit_module_for_unpublish(course_id, module_id, course_design_step,
     step_directory = COURSE_DESIGN_STEPS[course_design_step]
     prev_step_directory = COURSE_DESIGN_STEPS[course_design_step - 1]
 
-    course, module = _get_course_and_module(course_id, module_id)
+    course, module = await _get_course_and_module(course_id, module_id)
 
     if not course:
         return "Course not found"
     if not module:
         return "Module not found"
 
+    prev_step_resources = module.get(prev_step_directory, [])
+    if not await _handle_s3_file_transfer(course_id, module_id, prev_step_directory, step_directory, prev_step_resources):
+        return "Failed to copy the module resources to the next step"
+
     module["status"] = prev_step_directory
+    module_update = {"modules.$[module].status": module["status"]}
     if instructions:
         module["instructions"] = instructions
-    course["modules"] = [module if m.get(
-        "module_id") == module_id else m for m in course.get("modules", [])]
+        module_update["modules.$[module].instructions"] = instructions
 
-    atlas_client = AtlasClient()
-    atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, update={"$set": {"modules": course.get("modules", [])}
-                                                                                      })
+    await _update_module(course_id, module["module_id"], {"$set": module_update})
 
-    prev_step_resources = module.get(prev_step_directory, [])
-    _handle_s3_file_transfer(
-        course_id, module_id, prev_step_directory, step_directory, prev_step_resources)
+    atlas_client = AsyncAtlasClient()
 
     queue_payload = {        
         "course_id": course_id,
@@ -857,23 +752,21 @@ async def submit_module_for_unpublish(course_id, module_id, course_design_step,
         queue_payload["instructions"] = instructions
 
     # Check if the document already exists
-    existing_item = atlas_client.find(step_directory, {"course_id": course_id, "module_id": module_id}, limit=1)
+    existing_item = await atlas_client.find(step_directory, {"course_id": course_id, "module_id": module_id}, limit=1)
 
     if existing_item:
         # If it exists, update it
-        atlas_client.update(step_directory, {"course_id": course_id, "module_id": module_id}, {"$set": queue_payload})
+        await atlas_client.update(step_directory, {"course_id": course_id, "module_id": module_id}, {"$set": queue_payload})
     else:
         # If it does not exist, insert a new document
-        atlas_client.insert(step_directory, queue_payload)
-
-    course = _convert_object_ids_to_strings(course)
+        await atlas_client.insert(step_directory, queue_payload)
 
     return course
 
 
 async def submit_course_for_publishing(course_id: str, step_directory: str, queue_name_suffix: str):
     # Initialize Atlas Client
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
     # Validate step_directory
     step_directory = COURSE_DESIGN_STEPS[step_directory]
@@ -881,7 +774,7 @@ async def submit_course_for_publishing(course_id: str, step_directory: str, queu
         return "Invalid step directory", None
 
     # Fetch course by ID
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+    course = await atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
     if not course:
         return "Course not found", None
     course = course[0]
@@ -890,7 +783,7 @@ async def submit_course_for_publishing(course_id: str, step_directory: str, queu
     formatted_status = queue_name_suffix.replace('_', ' ').title()
     update_status_payload = {"$set": {"status": formatted_status}}
 
-    update_response = atlas_client.update(
+    update_response = await atlas_client.update(
         "course_design", 
         filter={"_id": ObjectId(course_id)}, 
         update=update_status_payload
@@ -903,21 +796,18 @@ async def submit_course_for_publishing(course_id: str, step_directory: str, queu
     queue_payload = {"course_id": course_id}
 
     # Check if the document exists in the step directory
-    existing_item = atlas_client.find(step_directory, {"course_id": course_id}, limit=1)
+    existing_item = await atlas_client.find(step_directory, {"course_id": course_id}, limit=1)
     if existing_item:
         # Update the existing document
-        update_response = atlas_client.update(step_directory, {"course_id": course_id}, {"$set": queue_payload})
+        update_response = await atlas_client.update(step_directory, {"course_id": course_id}, {"$set": queue_payload})
         if not update_response:
             raise ValueError("Failed to update the queue document.")
     else:
         # Insert a new document if it doesn't exist
-        insert_response = atlas_client.insert(step_directory, queue_payload)
+        insert_response = await atlas_client.insert(step_directory, queue_payload)
         if not insert_response:
             raise ValueError("Failed to insert new queue document.")
 
-    # Convert object IDs to strings before returning
-    course = _convert_object_ids_to_strings(course)
-
     return course, None  # Return course data with no errors
 
 
@@ -925,25 +815,26 @@ async def submit_module_for_deliverables_step(course_id, module_id, course_desig
     step_directory = COURSE_DESIGN_STEPS[course_design_step]
     prev_step_directory = COURSE_DESIGN_STEPS[course_design_step - 1]
 
-    course, module = _get_course_and_module(course_id, module_id)
+    course, module = await _get_course_and_module(course_id, module_id)
 
     if not course:
         return "Course not found"
     if not module:
         return "Module not found"
 
+    prev_step_resources = module.get(prev_step_directory, [])
+    if not await _handle_s3_file_transfer(course_id, module_id, prev_step_directory, step_directory, prev_step_resources):
+        return "Failed to copy the module resources to the next step"
+
     module["status"] = f"{queue_name_suffix.replace('_', ' ').title()}"
     module["assessment"] = assessment
-   
-    course["modules"] = [module if m.get("module_id") == module_id else m for m in course.get("modules", [])]
 
-    atlas_client = AtlasClient()
-    atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, 
-                        update={"$set": {"modules": course.get("modules", [])}})
+    await _update_module(course_id, module["module_id"], {"$set": {
+        "modules.$[module].status": module["status"],
+        "modules.$[module].assessment": assessment
+    }})
 
-    prev_step_resources = module.get(prev_step_directory, [])
-    _handle_s3_file_transfer(
-        course_id, module_id, prev_step_directory, step_directory, prev_step_resources)
+    atlas_client = AsyncAtlasClient()
 
     queue_payload = {"course_id": course_id,
                      "module_id": module_id,
@@ -954,17 +845,15 @@ async def submit_module_for_deliverables_step(course_id, module_id, course_desig
         queue_payload["chatbot"] = chatbot
 
     # Check if the document already exists
-    existing_item = atlas_client.find(step_directory, {"course_id": course_id, "module_id": module_id}, limit=1)
+    existing_item = await atlas_client.find(step_directory, {"course_id": course_id, "module_id": module_id}, limit=1)
 
     if existing_item:
         # If it exists, update it
-        atlas_client.delete(step_directory, {"course_id": course_id, "module_id": module_id})
-        atlas_client.insert(step_directory, queue_payload)
+        await atlas_client.delete(step_directory, {"course_id": course_id, "module_id": module_id})
+        await atlas_client.insert(step_directory, queue_payload)
     else:
         # If it does not exist, insert a new document
-        atlas_client.insert(step_directory, queue_payload)
-
-    course = _convert_object_ids_to_strings(course)
+        await atlas_client.insert(step_directory, queue_payload)
 
     return course
 
@@ -979,6 +868,20 @@ async def fetch_pdf(url):
     Returns:
         StreamingResponse: The PDF as a StreamingResponse.
     """
+    try:
+        bucket_name, key = parse_s3_url(url)
+    except ValueError:
+        bucket_name, key = None, None
+
+    # Stream PDFs in our own bucket straight from S3
+    s3_file_manager = S3FileManager()
+    if bucket_name == s3_file_manager.bucket_name:
+        reader = await s3_file_manager.open_reader(unquote(key))
+        if reader is None:
+            raise HTTPException(status_code=400, detail="Failed to fetch PDF: the file could not be read from S3")
+        headers = {"Content-Length": str(reader.content_length)} if reader.content_length is not None else None
+        return StreamingResponse(reader, media_type="application/pdf", headers=headers)
+
     try:
         # Fetch the PDF file from the provided URL
         response = requests.get(url, stream=True)
@@ -1027,17 +930,17 @@ async def fetch_note(url):
         # Parse the S3 URL to extract the bucket and key
         _, key = parse_s3_url(url)
 
-        # Get the file from S3
-        response = s3_file_manager.get_object(key=key)
+        # Stream the file from S3
+        reader = await s3_file_manager.open_reader(unquote(key))
 
         # Return an empty response if the file is not found
-        if response is None:
+        if reader is None:
             return {"content": "", "content_type": "text/plain"}
 
-        file_content = response["Body"].read()
+        file_content = b"".join([chunk async for chunk in reader])
 
         # Infer content type
-        content_type = response.get("ContentType") or mimetypes.guess_type(key)[0] or "application/octet-stream"
+        content_type = reader.content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
 
         # Return the note content and content type
         return {            
@@ -1062,37 +965,33 @@ async def fetch_quizdata(url):
 
 
 async def add_artifact_to_course(course_id, artifact_type, artifact_id):
-    atlas_client = AtlasClient()
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+    atlas_client = AsyncAtlasClient()
+    # Append in place instead of rewriting the whole list
+    course = await atlas_client.find_one_and_update("course_design", filter={"_id": ObjectId(course_id)},
+                                                    update={"$push": {"additional_artifacts": {
+                                                        "artifact_type": artifact_type,
+                                                        "artifact_id": artifact_id
+                                                    }}},
+                                                    projection={"_id": 1})
     if not course:
         return "Course not found"
-    course = course[0]
-    additional_artifacts = course.get("additional_artifacts", [])
-
-    additional_artifacts.append({        "artifact_type": artifact_type,
-        "artifact_id": artifact_id
-    })
-
-    atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, 
-                        update={"$set": {"additional_artifacts": additional_artifacts}})
     course = await get_course(course_id)
-    course = _convert_object_ids_to_strings(course)
     return course
 
 
 async def fetch_qu_skill_bridge_course_id(course_id):
-    atlas_client = AtlasClient()
-    course = atlas_client.find("courses", filter={"course_id": ObjectId(course_id)})
+    atlas_client = AsyncAtlasClient()
+    course = await atlas_client.find("courses", filter={"course_id": ObjectId(course_id)})
     if not course:
         return "Course not found"
     course = course[0]
     return str(course["_id"])
 
 async def update_course_info(course_id, course_name, course_description, course_outline):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     
     # Fetch the course from the database
-    course = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
+    course = await atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
     
     if not course:
         return "Course not found"
@@ -1107,7 +1006,7 @@ async def update_course_info(course_id, course_name, course_description, course_
     }
     
     # Perform the update operation
-    update_response = atlas_client.update(
+    update_response = await atlas_client.update(
         "course_design",  # Assuming 'courses' is the correct collection name
         filter={"_id": ObjectId(course_id)},
         update={"$set": update_payload}
@@ -1120,50 +1019,22 @@ async def update_course_info(course_id, course_name, course_description, course_
 
 
 async def update_module_info(course_id, module_id, module_name, module_description):
-    atlas_client = AtlasClient()
-    
-    # Fetch the course from the database
-    course_data = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
-
-    if not course_data:
-        return "Course not found"
-    
-    course = course_data[0]  # Assuming find() returns a list, get the first match
-    
-    # Get the modules array from the course
-    modules = course.get("modules", [])
-
     # Convert module_id to ObjectId if stored as ObjectId in MongoDB
     try:
         module_id = ObjectId(module_id)
     except Exception:
         pass  # Keep it as a string if not stored as ObjectId
 
-    # Update the specific module in the list
-    module_found = False
-    for module in modules:
-        if module["module_id"] == module_id:  # Find the module that matches
-            module["module_name"] = module_name
-            module["module_description"] = module_description
-            module_found = True
-            break  # Stop loop after updating the correct module
-
-    if not module_found:
-        return "Module not found in course"
-
-    # Define the update payload for replacing the modules array
-    update_payload = {
+    # Update only the fields of the matching module
+    update_response = await _update_module(course_id, module_id, {
         "$set": {
-            "modules": modules  # Save the updated modules list back to the course
+            "modules.$[module].module_name": module_name,
+            "modules.$[module].module_description": module_description
         }
-    }
+    })
 
-    # Perform the update operation
-    update_response = atlas_client.update(
-        "course_design",  # Collection name
-        filter={"_id": ObjectId(course_id)},  # Identify the correct course
-        update=update_payload
-    )
+    if not update_response:
+        return await _module_not_found_message(course_id)
 
     # Check if the update was successful
     if update_response:
@@ -1174,49 +1045,21 @@ async def update_module_info(course_id, module_id, module_name, module_descripti
 
 
 async def update_selected_labs_info(course_id, module_id, selected_labs):
-    atlas_client = AtlasClient()
-    
-    # Fetch the course from the database
-    course_data = atlas_client.find("course_design", filter={"_id": ObjectId(course_id)})
-
-    if not course_data:
-        return "Course not found"
-    
-    course = course_data[0]  # Assuming find() returns a list, get the first match
-    
-    # Get the modules array from the course
-    modules = course.get("modules", [])
-
     # Convert module_id to ObjectId if stored as ObjectId in MongoDB
     try:
         module_id = ObjectId(module_id)
     except Exception:
         pass  # Keep it as a string if not stored as ObjectId
 
-    # Update the specific module in the list
-    module_found = False
-    for module in modules:
-        if module["module_id"] == module_id:  # Find the module that matches
-            module["selected_labs"] = selected_labs
-            module_found = True
-            break  # Stop loop after updating the correct module
-
-    if not module_found:
-        return "Module not found in course"
-
-    # Define the update payload for replacing the modules array
-    update_payload = {
+    # Update only the selected labs of the matching module
+    update_response = await _update_module(course_id, module_id, {
         "$set": {
-            "modules": modules  # Save the updated modules list back to the course
+            "modules.$[module].selected_labs": selected_labs
         }
-    }
+    })
 
-    # Perform the update operation
-    update_response = atlas_client.update(
-        "course_design",  # Collection name
-        filter={"_id": ObjectId(course_id)},  # Identify the correct course
-        update=update_payload
-    )
+    if not update_response:
+        return await _module_not_found_message(course_id)
 
     # Check if the update was successful
     if update_response:
@@ -1231,9 +1074,8 @@ async def course_outline_prompt():
 
 
 async def get_templates():
-    atlas_client = AtlasClient()
-    templates = atlas_client.find("qu-create-slide-templates", {})
-    templates = _convert_object_ids_to_strings(templates)
+    atlas_client = AsyncAtlasClient()
+    templates = await atlas_client.find("qu-create-slide-templates", {})
     return templates
 
 
@@ -1312,14 +1154,9 @@ async def validate_template(uploaded_file: UploadFile):
 
 async def store_custom_template(course_id, module_id, template_file: UploadFile):
     s3 = S3FileManager()
-    atlas_client = AtlasClient()
     template_id = ObjectId()
     key = f"qu-course-design/{course_id}/{module_id}/template/{template_id}.pptx"
     await s3.upload_file_from_frontend(template_file, key)
-    key = quote(key)
-    template_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
-    course, module = _get_course_and_module(course_id, module_id)
-    module['template_link'] = template_link
-    course["modules"] = [module if m.get("module_id") == module_id else m for m in course.get("modules", [])]
-    atlas_client.update("course_design", filter={"_id": ObjectId(course_id)}, update={"$set": {"modules": course.get("modules", [])}})
+    template_link = get_public_url(key)
+    await _update_module(course_id, ObjectId(module_id), {"$set": {"modules.$[module].template_link": template_link}})
     return template_link
\ No newline at end of file
@@ -1,30 +1,31 @@
 # Standard library imports
 import datetime
-import time
-import random
 import json
-import ast
 import os
 import logging
 import shutil
 from pathlib import Path
-from urllib.parse import urlparse, quote, unquote
+from typing import List
+from urllib.parse import urlparse, unquote
 import mimetypes
 
 # Third-party library imports
 import requests
 from fastapi import HTTPException, UploadFile
 from bson.objectid import ObjectId
-from openai import OpenAI
 from langchain_core.prompts import PromptTemplate
-from google import genai
 from litellm import check_valid_key
 
 # Application-specific imports
 from app.services.report_generation.generate_pdf import convert_markdown_to_pdf
-from app.utils.llm import LLM
-from app.utils.s3_file_manager import S3FileManager
-from app.utils.atlas_client import AtlasClient
+from app.models.llm_outputs import LabIdea
+from app.utils.json_repair import parse_structured
+from app.utils.llm import LLM, get_cache_ttl, get_genai_client, get_parsed_response
+from app.utils.assistants import assistant_session
+from app.utils.s3_file_manager import S3FileManager, get_public_url
+from app.utils.atlas_client import AsyncAtlasClient
+from app.utils.pagination import find_page_or_400
+from app.utils.prompts import prompt_registry
 from app.services.github_helper_functions import create_repo_in_github, upload_file_to_github, update_file_in_github, create_github_issue, delete_repo_from_github
 from app.services.metaprompt import generate_prompt
 from app.services.user_services import quAPIVault
@@ -38,10 +39,20 @@ LAB_DESIGN_STEPS = [
     "deliverables", #automatic
 ]
 
+# Fields left out of the lab list returned to the dashboard
+LAB_SUMMARY_PROJECTION = {
+    "idea_history": 0,
+    "business_use_case_history": 0,
+    "technical_specifications_history": 0,
+    "lab_ideas": 0,
+    "raw_resources": 0,
+}
+LAB_SORT_FIELDS = {"_id", "lab_name", "status"}
 
-def _get_lab(lab_id):
-    atlas_client = AtlasClient()
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+
+async def _get_lab(lab_id):
+    atlas_client = AsyncAtlasClient()
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
     if not lab:
         return "Lecture not found", None
     
@@ -59,78 +70,7 @@ def _get_prompt(prompt_name):
     Returns:
     PromptTemplate: the prompt template
     """
-    prompts_file = "app/data/prompts.json"
-    with open(prompts_file, "r") as file:
-        prompts = json.load(file)
-    if prompt_name not in prompts:
-        logging.error(f"Prompt {prompt_name} not found")
-        return ""
-    return prompts[prompt_name]
-
-def _get_response_from_llm(llm, prompt, inputs, output_type="json"):
-    """
-    Get the response from the LLM
-
-    Args:
-    llm: LLM - the LLM object
-    prompt: PromptTemplate - the prompt template
-    inputs: dict - the inputs for the prompt
-    output_type: str - the type of output to be returned
-
-    Returns:
-    dict: the response from the LLM
-    """
-    # Try multiple times
-    trials = 5
-    for _ in range(trials):
-        try:
-            time.sleep(random.randint(1, 3))
-
-            response = llm.get_response(prompt, inputs=inputs)
-            logging.info(f"Processed response: {response}")
-
-            if output_type == "json":
-                return json.loads(response[response.index("{"):response.rindex("}")+1])
-
-            elif output_type == "list":
-                return ast.literal_eval(response[response.index("["):response.rindex("]")+1])
-
-            else:
-                return response
-
-        except Exception as e:
-            logging.error(f"Error in getting response: {e}")
-            continue
-
-    raise Exception("Something went wrong. Please try again later.")
-
-def _get_response(llm, prompt, inputs, output_type="json"):
-    # try with chatgpt first and then with gemini
-    try:
-        llm = LLM("chatgpt")
-        response = _get_response_from_llm(llm, prompt, inputs, output_type)
-        return response
-    except Exception as e:
-        logging.error(f"Error in getting response from chatgpt: {e}")
-    
-    try:
-        llm = LLM("gemini")
-        response = _get_response_from_llm(llm, prompt, inputs, output_type)
-        return response
-    except Exception as e:
-        logging.error(f"Error in getting response from gemini: {e}")
-
-    raise Exception("Something went wrong. Please try again later.")
-
-def _convert_object_ids_to_strings(data):
-    if isinstance(data, dict):
-        return {key: _convert_object_ids_to_strings(value) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [_convert_object_ids_to_strings(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    else:
-        return data
+    return prompt_registry.get(prompt_name)
 
 def _get_file_type(file: UploadFile):
     if file.content_type.startswith("image"):
@@ -140,113 +80,49 @@ def _get_file_type(file: UploadFile):
     else:
         return "File"
 
-async def get_labs(username):
-    atlas_client = AtlasClient()
-    labs = atlas_client.find("lab_design")
-    user_labs = []
-    for lab in labs:
-        users = lab.get('users', [])
-        if username in users:
-            user_labs.append(lab)
-    labs = _convert_object_ids_to_strings(user_labs)
+async def get_labs(username, limit=0, after_id=None, sort_by="_id", sort_order="asc"):
+    labs = await find_page_or_400("lab_design", LAB_SORT_FIELDS,
+                                  filter={"users": username},
+                                  projection=LAB_SUMMARY_PROJECTION,
+                                  limit=limit,
+                                  after_id=after_id,
+                                  sort_by=sort_by,
+                                  sort_order=sort_order,
+                                  noun="labs")
     return labs
     
 # generate_course_outline -> take in the input as the file and the instructions and generate the course outline
-async def generate_lab_outline(files, instructions, use_metaprompt=False):
-
-    lab_outline_instructions = _get_prompt("LAB_OUTLINE_PROMPT")
+async def generate_lab_outline(files, instructions, use_metaprompt=False, on_delta=None):
 
-    lab_outline_instructions += f"\n\nUser's instructions:\n{instructions}"
+    lab_outline_message = f"Create the lab outline based on the instructions provided.\n\nUser's instructions:\n{instructions}"
 
     if use_metaprompt:
-        lab_outline_instructions = await generate_prompt(lab_outline_instructions)
-
-    if lab_outline_instructions == "The request timed out. Please try again.":
-        lab_outline_instructions = _get_prompt("LAB_OUTLINE_PROMPT")
-        lab_outline_instructions += f"\n\nUser's instructions:\n{instructions}"
-
-    client = OpenAI(timeout=120, api_key=os.getenv("OPENAI_KEY"))
-
-    assistant_files_streams = []
-    for file in files:
-        file_content = file.file.read()
-
-        file.file.seek(0)
-
-        assistant_files_streams.append((file.filename, file_content))
-
-    # Track created resources
-    created_assistant_id = None
-    created_vector_store_id = None
-    created_thread_id = None
+        lab_outline_prompt = await generate_prompt(_get_prompt("LAB_OUTLINE_PROMPT") + f"\n\nUser's instructions:\n{instructions}")
+        if lab_outline_prompt != "The request timed out. Please try again.":
+            lab_outline_message = lab_outline_prompt
 
     try:
-        assistant = client.beta.assistants.create(
-            name="Lecture outline creator",
-            instructions=lab_outline_instructions,
-            model=os.getenv("OPENAI_MODEL"),
-            tools=[{"type": "file_search"}]
+        # The request's instructions go in the message so the assistant, keyed
+        # by its instructions, is reused across requests
+        response = await assistant_session.run(
+            name="Lab outline creator",
+            instructions=_get_prompt("LAB_OUTLINE_PROMPT"),
+            message=lab_outline_message,
+            files=files,
+            vector_store_name="Lab Resources",
+            on_delta=on_delta,
         )
-        created_assistant_id = assistant.id  # Track the assistant
-
-        vector_store = client.vector_stores.create(
-            name="Lecture Resources",
-            expires_after={"days": 1, "anchor": "last_active_at"},
-        )
-        created_vector_store_id = vector_store.id  # Track the vector store
-
-        file_batch = client.vector_stores.file_batches.upload_and_poll(
-            vector_store_id=vector_store.id, files=assistant_files_streams
-        )
-
-        assistant = client.beta.assistants.update(
-            assistant_id=assistant.id,
-            tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}},
-        )
-
-        thread = client.beta.threads.create(
-            messages=[{
-                "role": "user",
-                "content": "Create the lab outline based on the instructions provided"
-            }]
-        )
-        created_thread_id = thread.id  # Track the thread
-
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id, assistant_id=assistant.id, poll_interval_ms=10000
-        )
-
-        messages = list(client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id))
-        message_content = messages[0].content[0].text
-        annotations = message_content.annotations
-        citations = []
-
-        for index, annotation in enumerate(annotations):
-            message_content.value = message_content.value.replace(annotation.text, f"[{index}]")
-            if file_citation := getattr(annotation, "file_citation", None):
-                cited_file = client.files.retrieve(file_citation.file_id)
-                citations.append(f"[{index}] {cited_file.filename}")
-
-        response = message_content.value
     except Exception as e:
         logging.error(f"Error in generating lab outline: {e}")
         return "The request timed out. Please try again later. However, here's a sample response:\n\n# Slide 1: **On Machine Learning Applications in Investments**\n**Description**: This module provides an overview of the use of machine learning (ML) in investment practices, including its potential benefits and common challenges. It highlights examples where ML techniques have outperformed traditional investment models.\n\n**Learning Outcomes**:\n- Understand the motivations behind using ML in investment strategies.\n- Recognize the challenges and solutions in applying ML to finance.\n- Explore practical applications of ML for predicting equity returns and corporate performance.\n### Slide 2: **Alternative Data and AI in Investment Research**\n**Description**: This module explores how alternative data sources combined with AI are transforming investment research by providing unique insights and augmenting traditional methods.\n\n**Learning Outcomes**:\n- Identify key sources of alternative data and their relevance in investment research.\n- Understand how AI can process and derive actionable insights from alternative data.\n- Analyze real-world use cases showcasing the impact of AI in research and decision-making.\n### Slide 3: **Data Science for Active and Long-Term Fundamental Investing**\n**Description**: This module covers the integration of data science into long-term fundamental investing, discussing how quantitative analysis can enhance traditional methods.\n\n**Learning Outcomes**:\n- Learn the foundational role of data science in long-term investment strategies.\n- Understand the benefits of combining data science with active investing.\n- Evaluate case studies on the effective use of data science to support investment decisions.\n### Slide 4: **Unlocking Insights and Opportunities**\n**Description**: This module focuses on techniques and strategies for using data-driven insights to identify market opportunities and enhance investment management processes.\n\n**Learning Outcomes**:\n- Grasp the importance of leveraging advanced data analytics for opportunity identification.\n- Understand how to apply insights derived from data to optimize investment outcomes.\n- Explore tools and methodologies that facilitate the unlocking of valuable investment insights.\n### Slide 5: **Advances in Natural Language Understanding for Investment Management**\n**Description**: This module highlights the progression of natural language understanding (NLU) and its application in finance. It covers recent developments and their implications for asset management.\n\n**Learning Outcomes**:\n- Recognize advancements in NLU and their integration into investment strategies.\n- Explore trends and applications of NLU in financial data analysis.\n- Understand the technical challenges and solutions associated with implementing NLU tools.\n###"
-    finally:
-        # Clean up all created resources to avoid charges
-        if created_assistant_id:
-            client.beta.assistants.delete(created_assistant_id)
-        if created_vector_store_id:
-            client.vector_stores.delete(created_vector_store_id)
-        if created_thread_id:
-            client.beta.threads.delete(created_thread_id)
 
     return response
 
 # clone_course -> takes in the course_id and clones the course
 async def clone_lab(lab_id):
     
-    atlas_client = AtlasClient()
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    atlas_client = AsyncAtlasClient()
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lecture not found"
@@ -267,9 +143,7 @@ async def clone_lab(lab_id):
                 data[index] = clone(item)
         return data
 
-    atlas_client.insert("lab_design", lab)
-
-    lab = _convert_object_ids_to_strings(lab)
+    await atlas_client.insert("lab_design", lab)
 
     return lab
 
@@ -277,8 +151,8 @@ async def clone_lab(lab_id):
 # delete_course -> takes in the course_id and deletes the course
 async def delete_lab(lab_id):
     
-    atlas_client = AtlasClient()
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    atlas_client = AsyncAtlasClient()
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lecture not found"
@@ -290,10 +164,8 @@ async def delete_lab(lab_id):
     
     # TODO: remove lab from ec2 instance and its documentation if the lab is in the final stage
     
-    atlas_client.delete("lab_design", filter={"_id": ObjectId(lab_id)})
+    await atlas_client.delete("lab_design", filter={"_id": ObjectId(lab_id)})
 
-    lab = _convert_object_ids_to_strings(lab)
-    
     return lab
     
 
@@ -302,15 +174,14 @@ async def create_lab(username, lab_name, lab_description, lab_outline, files, la
     lab_status = "In Design Phase"
 
     s3_file_manager = S3FileManager()
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
     
     # upload the course image to s3 and get the link
     lab_id = ObjectId()
     key = f"qu-lab-design/{lab_id}/lab_image/{lab_image.filename}"
     await s3_file_manager.upload_file_from_frontend(lab_image, key)
-    key = quote(key)
-    lab_image_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+    lab_image_link = get_public_url(key)
 
     users = [username]
 
@@ -341,8 +212,7 @@ async def create_lab(username, lab_name, lab_description, lab_outline, files, la
 
             key = f"qu-lab-design/{lab_id}/{step_directory}/{file.filename}"  
             await s3_file_manager.upload_file_from_frontend(file, key)
-            key = quote(key)
-            resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"    
+            resource_link = get_public_url(key)    
                 
             raw_resources += [{
                 "resource_id": ObjectId(),
@@ -354,11 +224,10 @@ async def create_lab(username, lab_name, lab_description, lab_outline, files, la
     
     lab[step_directory] = raw_resources
 
-    atlas_client.insert("lab_design", lab)
+    await atlas_client.insert("lab_design", lab)
 
-    lab = _convert_object_ids_to_strings(lab)
     # Create Repo on GitHub
-    res = create_repo_in_github(lab["_id"], lab_description, private=False)
+    res = create_repo_in_github(str(lab["_id"]), lab_description, private=False)
     # Create it as an object id and store the unique objectid
     return lab
 
@@ -373,14 +242,13 @@ def _get_resource_key_from_link(resource_link):
 # get_course -> takes in the course_id and returns the course object
 async def get_lab(lab_id):
 
-    atlas_client = AtlasClient()
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    atlas_client = AsyncAtlasClient()
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return {}
     
     lab = lab[0]
-    lab = _convert_object_ids_to_strings(lab)
     
     return lab
 
@@ -394,15 +262,13 @@ async def add_resources_to_lab(lab_id, resource_type, resource_name, resource_de
         # resource file is the file
         key = f"qu-lab-design/{lab_id}/{step_directory}/{str(resource_id)}."+resource_file.filename.split(".")[-1]
         await s3_file_manager.upload_file_from_frontend(resource_file, key)
-        key = quote(key)
-        resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+        resource_link = get_public_url(key)
 
     elif resource_type == "Image":
         # resource file is the image
         key = f"qu-lab-design/{lab_id}/{step_directory}/{str(resource_id)}."+resource_file.filename.split(".")[-1]
         await s3_file_manager.upload_file_from_frontend(resource_file, key)
-        key = quote(key)
-        resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+        resource_link = get_public_url(key)
 
     elif resource_type == "Link":
         # resource file is the resource link
@@ -418,14 +284,13 @@ async def add_resources_to_lab(lab_id, resource_type, resource_name, resource_de
 
         key = f"qu-lab-design/{lab_id}/{step_directory}/{resource_file_name}"
         await s3_file_manager.upload_file(resource_file_name, key)
-        key = quote(key)
 
         # remove the temp file
         os.remove(resource_file_name)
-        resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+        resource_link = get_public_url(key)
 
-    atlas_client = AtlasClient()
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    atlas_client = AsyncAtlasClient()
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
     if not lab:
         return "lab not found"
     
@@ -441,15 +306,13 @@ async def add_resources_to_lab(lab_id, resource_type, resource_name, resource_de
     resources.append(resource)
     lab[step_directory] = resources
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             step_directory: resources
         }
     }
     )
 
-    lab = _convert_object_ids_to_strings(lab)
-
     return lab
 
 
@@ -457,8 +320,8 @@ async def add_resources_to_lab(lab_id, resource_type, resource_name, resource_de
 async def delete_resources_from_lab(lab_id, resource_id, lab_design_step=0):
     step_directory = LAB_DESIGN_STEPS[lab_design_step]
 
-    atlas_client = AtlasClient()
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    atlas_client = AsyncAtlasClient()
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lecture not found"
@@ -471,15 +334,13 @@ async def delete_resources_from_lab(lab_id, resource_id, lab_design_step=0):
             break
     
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             step_directory: resources
         }
     }
     )
 
-    lab = _convert_object_ids_to_strings(lab)
-
     return lab
 
 # replace the resource in the module and s3
@@ -499,40 +360,48 @@ async def replace_resources_in_lab(lab_id, resource_id, resource_name, resource_
                                            resource_id=resource_id, 
                                            lab_design_step=lab_design_step)
 
-    lab = _convert_object_ids_to_strings(lab)
-    
     return lab
 
-def _handle_s3_file_transfer(lab_id, prev_step_directory, step_directory, resources):
+async def _handle_s3_file_transfer(lab_id, prev_step_directory, step_directory, resources):
+    """
+    Copy the resources of the previous step to the next one. If any copy
+    fails, the objects it created are deleted again.
+
+    Returns:
+    bool: True if every resource was copied, False otherwise
+    """
     s3_file_manager = S3FileManager()
+    copies = []
     for resource in resources:
         next_step_key = f"qu-lab-design/{lab_id}/{step_directory}/{resource.get('resource_name')}"
         prev_step_key = f"qu-lab-design/{lab_id}/{prev_step_directory}/{resource.get('resource_name')}"
-        s3_file_manager.copy_file(prev_step_key, next_step_key)
+        copies.append((prev_step_key, next_step_key))
+    return await s3_file_manager.acopy_files_or_undo(copies)
 
 async def submit_lab_for_step(lab_id, lab_design_step, queue_name_suffix, instructions=""):
     step_directory = LAB_DESIGN_STEPS[lab_design_step]
     prev_step_directory = LAB_DESIGN_STEPS[lab_design_step - 1]
 
-    lab, _ = _get_lab(lab_id=lab_id)
+    lab, _ = await _get_lab(lab_id=lab_id)
 
     if not lab:
         return "Lecture not found"
 
+    prev_step_resources = lab.get(prev_step_directory, [])
+    if not await _handle_s3_file_transfer(lab_id, prev_step_directory, step_directory, prev_step_resources):
+        return "Failed to copy the lab resources to the next step"
+
     lab["status"] = f"{queue_name_suffix.replace('_', ' ').title()}"
     if instructions:
         lab["instructions"] = instructions
 
-    atlas_client = AtlasClient()
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    atlas_client = AsyncAtlasClient()
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "status": f"{queue_name_suffix.replace('_', ' ').title()}"
         }
     })
 
-    prev_step_resources = lab.get(prev_step_directory, [])
-    _handle_s3_file_transfer(lab_id, prev_step_directory, step_directory, prev_step_resources)
-
     queue_payload = {
         "lab_id": lab_id,
         "type": "lab"
@@ -541,11 +410,9 @@ async def submit_lab_for_step(lab_id, lab_design_step, queue_name_suffix, instru
     if instructions:
         queue_payload["instructions"] = instructions
 
-    atlas_client.insert(step_directory, queue_payload)
-
-    course = _convert_object_ids_to_strings(course)
+    await atlas_client.insert(step_directory, queue_payload)
 
-    return course
+    return lab
 
 
 
@@ -569,16 +436,16 @@ async def fetch_note(url):
     try:
         bucket_name, key = parse_s3_url(url)
 
-        # Get the file from S3
-        response = s3_file_manager.get_object(key=key)
+        # Stream the file from S3
+        reader = await s3_file_manager.open_reader(unquote(key))
 
-        if response is None:
+        if reader is None:
             return {"content": "", "content_type": "text/plain"}
-        
-        file_content = response["Body"].read()
+
+        file_content = b"".join([chunk async for chunk in reader])
 
         # Infer content type
-        content_type = response.get("ContentType") or mimetypes.guess_type(key)[0] or "application/octet-stream"
+        content_type = reader.content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
 
         return {
             "content": file_content.decode("utf-8"),
@@ -610,17 +477,16 @@ async def convert_to_pdf_for_lab(lab_id, markdown, template_name, lab_design_ste
     s3_file_manager = S3FileManager()
     await s3_file_manager.upload_file(output_path, key)
 
-    key = quote(key)
 
     # store the filepath in mongodb
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    atlas_client.update(
+    await atlas_client.update(
         collection_name="lab_design",
         filter={"_id": ObjectId(lab_id)},
         update={
             "$set": {
-                f"{LAB_DESIGN_STEPS[lab_design_step]}_pdf": f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+                f"{LAB_DESIGN_STEPS[lab_design_step]}_pdf": get_public_url(key)
             }
         }
     )
@@ -629,17 +495,17 @@ async def convert_to_pdf_for_lab(lab_id, markdown, template_name, lab_design_ste
     os.remove(output_path)
 
     # return file url in s3
-    return f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+    return get_public_url(key)
 
 
-async def generate_idea_for_concept_lab(lab_id: str, instructions: str, prompt, use_metaprompt=False):
+async def generate_idea_for_concept_lab(lab_id: str, instructions: str, prompt, use_metaprompt=False, use_cache=True, on_delta=None):
     if use_metaprompt:
         prompt = _get_prompt("CONCEPT_LAB_IDEA_PROMPT")
         prompt = await generate_prompt(prompt)
         
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lab not found"
@@ -659,7 +525,8 @@ async def generate_idea_for_concept_lab(lab_id: str, instructions: str, prompt,
 
 
     llm = LLM("chatgpt")
-    response = _get_response(llm, prompt, inputs, output_type="str")
+    response = await get_parsed_response(llm, prompt, inputs, output_type="str",
+                                         use_cache=use_cache, cache_ttl=get_cache_ttl("CONCEPT_LAB_IDEA_PROMPT"), on_delta=on_delta)
     if response.startswith("```"):
         response = response[3:].strip()
     if response.startswith("markdown"):
@@ -678,7 +545,7 @@ async def generate_idea_for_concept_lab(lab_id: str, instructions: str, prompt,
     }]
     lab["idea"] = response
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "status": "Idea Review",
             "idea_history": lab["idea_history"],
@@ -686,18 +553,17 @@ async def generate_idea_for_concept_lab(lab_id: str, instructions: str, prompt,
         }
     })
 
-    lab = _convert_object_ids_to_strings(lab)
     res = upload_file_to_github(lab_id, "idea.md", response, "Add concept lab idea.")
     return lab
 
 
-async def generate_business_use_case_for_lab(lab_id: str, prompt, use_metaprompt=False):
+async def generate_business_use_case_for_lab(lab_id: str, prompt, use_metaprompt=False, use_cache=True, on_delta=None):
     if use_metaprompt:
         prompt = _get_prompt("BUSINESS_USE_CASE_PROMPT")
         prompt = await generate_prompt(prompt)
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lab not found"
@@ -722,7 +588,8 @@ async def generate_business_use_case_for_lab(lab_id: str, prompt, use_metaprompt
     prompt = PromptTemplate(template=prompt, input_variables=inputs)
 
     llm = LLM("chatgpt")
-    response = _get_response(llm, prompt, inputs, output_type="str")
+    response = await get_parsed_response(llm, prompt, inputs, output_type="str",
+                                         use_cache=use_cache, cache_ttl=get_cache_ttl("BUSINESS_USE_CASE_PROMPT"), on_delta=on_delta)
 
     if response.startswith("```"):
         response = response[3:].strip()
@@ -743,7 +610,7 @@ async def generate_business_use_case_for_lab(lab_id: str, prompt, use_metaprompt
     }]
     lab["business_use_case"] = response
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "status": "Business Use Case Review",
             "business_use_case_history": lab["business_use_case_history"],
@@ -751,17 +618,16 @@ async def generate_business_use_case_for_lab(lab_id: str, prompt, use_metaprompt
         }
     })
 
-    lab = _convert_object_ids_to_strings(lab)
     res = upload_file_to_github(lab_id, "business_requirements.md", response, "Add business requirements")
     return lab
 
-async def generate_technical_specifications_for_lab(lab_id, prompt=_get_prompt("TECHNICAL_SPECIFICATION_PROMPT"), use_metaprompt=False):
+async def generate_technical_specifications_for_lab(lab_id, prompt=None, use_metaprompt=False, use_cache=True, on_delta=None):
     # if use_metaprompt:
     #     prompt = _get_prompt("TECHNICAL_SPECIFICATION_PROMPT")
     #     prompt = await generate_prompt(prompt)
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lab not found"
@@ -788,14 +654,15 @@ async def generate_technical_specifications_for_lab(lab_id, prompt=_get_prompt("
     inputs = {
         "NAME": idea_name,
         "DESCRIPTION": idea_description,
-        "INSTRUCTIONS": _get_instructions_string(lab_id)
+        "INSTRUCTIONS": await _get_instructions_string(lab_id)
     }
 
     # Do this instead: Append the business use case to the prompt so that at frontend business use case parameters are not visible.
     prompt = PromptTemplate(template=prompt, input_variables=inputs)
 
     llm = LLM("chatgpt")
-    response = _get_response(llm, prompt, inputs, output_type="str")
+    response = await get_parsed_response(llm, prompt, inputs, output_type="str",
+                                         use_cache=use_cache, cache_ttl=get_cache_ttl("TECHNICAL_SPECIFICATION_PROMPT"), on_delta=on_delta)
 
     if response.startswith("```"):
         response = response[3:].strip()
@@ -815,7 +682,7 @@ async def generate_technical_specifications_for_lab(lab_id, prompt=_get_prompt("
     }]
     lab["technical_specifications"] = response
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "technical_specifications_history": lab["technical_specifications_history"],
             "technical_specifications": response,
@@ -823,13 +690,12 @@ async def generate_technical_specifications_for_lab(lab_id, prompt=_get_prompt("
         }
     })
 
-    lab = _convert_object_ids_to_strings(lab)
 
     res = upload_file_to_github(lab_id, "technical_specifications.md", response, "Add technical specifications")
     return lab
 
 
-async def regenerate_with_feedback(content, feedback, use_metaprompt=False):
+async def regenerate_with_feedback(content, feedback, use_metaprompt=False, use_cache=True, on_delta=None):
     prompt = _get_prompt("REGENERATE_WITH_FEEDBACK_PROMPT")
     inputs = {
         "CONTENT": content,
@@ -845,14 +711,15 @@ async def regenerate_with_feedback(content, feedback, use_metaprompt=False):
     prompt = PromptTemplate(template=prompt, input_variables=inputs)
 
     llm = LLM("chatgpt")
-    response = _get_response(llm, prompt, inputs, output_type="str")
+    response = await get_parsed_response(llm, prompt, inputs, output_type="str",
+                                         use_cache=use_cache, cache_ttl=get_cache_ttl("REGENERATE_WITH_FEEDBACK_PROMPT"), on_delta=on_delta)
 
     return response
 
 async def save_concept_lab_idea(lab_id, idea):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lab not found"
@@ -879,14 +746,13 @@ async def save_concept_lab_idea(lab_id, idea):
         }
         idea_history.append(new_version)
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "idea": idea,
             "idea_history": idea_history,
         }
     })
 
-    lab = _convert_object_ids_to_strings(lab)
     res = update_file_in_github(
         repo_name=lab_id, 
         file_path="idea.md", 
@@ -896,9 +762,9 @@ async def save_concept_lab_idea(lab_id, idea):
     return lab
 
 async def save_business_use_case(lab_id, business_use_case):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lab not found"
@@ -925,14 +791,13 @@ async def save_business_use_case(lab_id, business_use_case):
         }
         business_use_case_history.append(new_version)
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "business_use_case": business_use_case,
             "business_use_case_history": business_use_case_history
         }
     })
 
-    lab = _convert_object_ids_to_strings(lab)
     res = update_file_in_github(
         repo_name=lab_id, 
         file_path="business_requirements.md", 
@@ -942,9 +807,9 @@ async def save_business_use_case(lab_id, business_use_case):
     return lab
 
 async def save_technical_specifications(lab_id, technical_specifications):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lab not found"
@@ -971,14 +836,13 @@ async def save_technical_specifications(lab_id, technical_specifications):
         }
         technical_specifications_history.append(new_version)
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "technical_specifications": technical_specifications,
             "technical_specifications_history": technical_specifications_history
         }
     })
 
-    lab = _convert_object_ids_to_strings(lab)
     res = update_file_in_github(
         repo_name=lab_id, 
         file_path="technical_specifications.md", 
@@ -990,9 +854,9 @@ async def save_technical_specifications(lab_id, technical_specifications):
 
 async def save_lab_instructions(lab_id, instructions):
     instructions = json.loads(instructions)
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return "Lab not found"
@@ -1001,19 +865,17 @@ async def save_lab_instructions(lab_id, instructions):
 
     lab["instructions"] = instructions
 
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "instructions": instructions
         }
     })
 
-    lab = _convert_object_ids_to_strings(lab)
-
     return lab
 
 async def submit_lab_for_generation(username, lab_id, company, model, key, queue_name_suffix, name, description, type, saveAPIKEY):
     print(f"username: {username}, lab_id: {lab_id}, model: {model}, key: {key}, queue_name_suffix: {queue_name_suffix}, name: {name}, saveAPIKEY: {saveAPIKEY}")
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     
     if saveAPIKEY:
             try: 
@@ -1024,7 +886,7 @@ async def submit_lab_for_generation(username, lab_id, company, model, key, queue
             
     try:
         # Fetch the lab
-        lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+        lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
         if not lab:
             return "Lab not found"
         lab = lab[0]
@@ -1034,18 +896,16 @@ async def submit_lab_for_generation(username, lab_id, company, model, key, queue
             "lab_id": str(lab_id),
             "status": f"{queue_name_suffix.replace('_', ' ').title()}",
         }
-        atlas_client.update("lab_design", {"_id": ObjectId(lab_id)}, {"$set": {"status": queue_payload["status"]}})
+        await atlas_client.update("lab_design", {"_id": ObjectId(lab_id)}, {"$set": {"status": queue_payload["status"]}})
 
         # Check and update/insert into step directory
-        existing_item = atlas_client.find(queue_name_suffix, {"lab_id": str(lab_id)}, limit=1)
+        existing_item = await atlas_client.find(queue_name_suffix, {"lab_id": str(lab_id)}, limit=1)
         if existing_item:
-            atlas_client.delete(queue_name_suffix, {"lab_id": str(lab_id)})
-            atlas_client.insert(queue_name_suffix, {"lab_id": str(lab_id), "model": model, "key": key})
+            await atlas_client.delete(queue_name_suffix, {"lab_id": str(lab_id)})
+            await atlas_client.insert(queue_name_suffix, {"lab_id": str(lab_id), "model": model, "key": key})
         else:
-            atlas_client.insert(queue_name_suffix, {"lab_id": str(lab_id), "model": model, "key": key})
+            await atlas_client.insert(queue_name_suffix, {"lab_id": str(lab_id), "model": model, "key": key})
 
-        # Convert ObjectId fields to strings
-        lab = _convert_object_ids_to_strings(lab)
         return lab
 
     except Exception as e:
@@ -1066,9 +926,7 @@ async def create_github_issue_in_lab(lab_id, issue_title, issue_description, lab
             key = f"qu-lab-design/{lab_id}/image_{index}.{file.filename.split('.')[-1]}"
             await s3_file_manager.upload_file_from_frontend(file, key)
 
-            # URL encode the key for S3
-            key = quote(key)
-            resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}" 
+            resource_link = get_public_url(key)
 
             # Append the image to the description in Markdown format
             issue_description += f"[image-screenshot-{index}]({resource_link})\n"
@@ -1080,8 +938,8 @@ async def create_github_issue_in_lab(lab_id, issue_title, issue_description, lab
             # labels = [label.strip() for label in labels[0].split(",")]
             labels = [label.strip().lower() for label in labels[0].split(",")] 
 
-    atlas_client = AtlasClient()
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    atlas_client = AsyncAtlasClient()
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab:
         return {"status": 404, "message": "Lab not found"}
@@ -1108,10 +966,10 @@ async def get_labs_prompt(prompt_type):
 
 
 async def update_lab_info(lab_id, lab_name, lab_description):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     
     # Fetch the course from the database
-    lab_data = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab_data = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab_data:
         return "Lab not found"
@@ -1126,7 +984,7 @@ async def update_lab_info(lab_id, lab_name, lab_description):
     }
 
     # Perform the update operation
-    update_response = atlas_client.update(
+    update_response = await atlas_client.update(
         "lab_design",  # Collection name
         filter = {"_id": ObjectId(lab_id)},  # Identify the correct lab
         update = update_payload
@@ -1139,13 +997,13 @@ async def update_lab_info(lab_id, lab_name, lab_description):
         return "Failed to update lab information"
     
 async def update_lab_tags(lab_id, tags):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
      # Check if tags contain a single empty string and convert it to an empty list
     if len(tags) == 1 and tags[0] == "":
         tags = []
     
     # Fetch the course from the database
-    lab_data = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab_data = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     if not lab_data:
         return "Lab not found"
@@ -1157,7 +1015,7 @@ async def update_lab_tags(lab_id, tags):
     }
 
     # Perform the update operation
-    update_response = atlas_client.update(
+    update_response = await atlas_client.update(
         "lab_design",  # Collection name
         filter = {"_id": ObjectId(lab_id)},  # Identify the correct lab
         update = update_payload
@@ -1170,9 +1028,9 @@ async def update_lab_tags(lab_id, tags):
         return "Failed to update lab information"
 
 
-def _get_instructions_string(lab_id):
-    atlas_client = AtlasClient()
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+async def _get_instructions_string(lab_id):
+    atlas_client = AsyncAtlasClient()
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
     if not lab:
         return ""
     lab = lab[0]
@@ -1201,11 +1059,11 @@ async def get_lab_ideas(lab_id):
     Returns:
         list or str: A list of lab ideas if parsed successfully, or an error message string.
     """
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     s3_file_manager = S3FileManager()
 
     # 1. Fetch the lab object from the database
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
     if not lab:
         return "Lab not found"
     lab = lab[0]
@@ -1215,7 +1073,7 @@ async def get_lab_ideas(lab_id):
     Path(download_path).mkdir(parents=True, exist_ok=True)
 
     # 3. Initialize the Google Gemini client for file upload and model inference
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    client = get_genai_client()
     uploaded_files = []
 
     # 4. Iterate through raw_resources, download each file from S3, and upload to Gemini
@@ -1226,27 +1084,27 @@ async def get_lab_ideas(lab_id):
         # Construct the S3 key from the resource link
         key = f"qu-lab-design/{resource_link.split('qu-lab-design/')[1]}"
         download_file_path = f"{download_path}/{resource_link.split('/')[-1]}"
-        s3_file_manager.download_file(key, download_file_path)
+        await s3_file_manager.adownload_file(key, download_file_path)
         
         # Upload the file to Gemini and store the resulting file reference
-        uploaded_files.append(client.files.upload(file=download_file_path))
+        uploaded_files.append(await client.aio.files.upload(file=download_file_path))
     
     # 5. Retrieve the prompt template for generating lab ideas
     prompt = _get_prompt("GENERATE_LAB_IDEAS")
-    prompt = prompt.format(INSTRUCTIONS=_get_instructions_string(lab_id))
+    prompt = prompt.format(INSTRUCTIONS=await _get_instructions_string(lab_id))
 
     # 6. Generate content by combining the prompt with the uploaded files using the Gemini model
-    response = client.models.generate_content(
+    response = await client.aio.models.generate_content(
         model=os.getenv("GEMINI_MODEL"),
-        contents=[prompt] + uploaded_files
+        contents=[prompt] + uploaded_files,
+        config={"response_mime_type": "application/json", "response_schema": list[LabIdea]}
     )
     response = response.text
     logging.info(response)
     
-    # 7. Attempt to extract and parse the JSON part of the response
+    # 7. Attempt to parse the JSON response, repairing it if needed
     try:
-        response = response[response.index("```json") + 7:response.rindex("```")].strip()
-        response = json.loads(response)
+        response = [idea.model_dump() for idea in parse_structured(response, List[LabIdea])]
         response.append({
             "name": "Custom",
             "description": "Describe your custom lab here."
@@ -1278,7 +1136,7 @@ async def get_lab_ideas(lab_id):
 
     # 9. Add the lab ideas to the lab object and update the database
     lab["lab_ideas"] = response
-    atlas_client.update(
+    await atlas_client.update(
         "lab_design",
         filter={"_id": ObjectId(lab_id)},
         update={"$set": {"lab_ideas": response, "status": "Idea Selection"}}
@@ -1304,16 +1162,15 @@ async def update_lab_ideas(lab_id, lab_ideas):
         The updated lab design document with ObjectIds converted to strings, or a string message
         "Lab not found" if the lab document does not exist.
     """
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     lab_ideas = json.loads(lab_ideas)
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
     if not lab:
         return "Lab not found"
     lab = lab[0]
     lab["lab_ideas"] = lab_ideas
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={"$set": {"lab_ideas": lab_ideas}})
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={"$set": {"lab_ideas": lab_ideas}})
 
-    lab = _convert_object_ids_to_strings(lab)
     return lab
 
 async def update_selected_idea(lab_id, index):
@@ -1330,10 +1187,10 @@ async def update_selected_idea(lab_id, index):
                      otherwise returns "Lab not found".
     """
     # Initialize the AtlasClient for database operations
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
     # Retrieve the lab design document using the provided lab_id
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     # If the lab is not found, return an error message
     if not lab:
@@ -1345,7 +1202,7 @@ async def update_selected_idea(lab_id, index):
     lab_ideas = lab.get("lab_ideas", [])
 
     # Update the lab design document by setting the selected idea based on the provided index
-    atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "selected_idea": lab_ideas[index]
         }
@@ -1353,7 +1210,6 @@ async def update_selected_idea(lab_id, index):
 
     # Convert any ObjectId fields in the lab document to strings for compatibility
     lab['selected_idea'] = lab_ideas[index]
-    lab = _convert_object_ids_to_strings(lab)
 
     # Return the updated lab design document
     return lab
@@ -1361,10 +1217,10 @@ async def update_selected_idea(lab_id, index):
 
 async def update_lab_design_status(lab_id, lab_design_status):
     print(lab_id, lab_design_status)
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
     # Retrieve the lab design document using the provided lab_id
-    lab = atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
+    lab = await atlas_client.find("lab_design", filter={"_id": ObjectId(lab_id)})
 
     # If the lab is not found, return an error message
     if not lab:
@@ -1374,7 +1230,7 @@ async def update_lab_design_status(lab_id, lab_design_status):
     lab = lab[0]
     
     # Update the lab design document by setting the status based on the provided lab_design_status
-    response = atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
+    response = await atlas_client.update("lab_design", filter={"_id": ObjectId(lab_id)}, update={
         "$set": {
             "status": lab_design_status
         }
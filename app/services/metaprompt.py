@@ -1,14 +1,10 @@
 
-from openai import OpenAI
-import os
+from app.utils.llm import async_provider_slot, get_async_openai_client
 from dotenv import load_dotenv
 import logging
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_KEY")
-client = OpenAI(timeout=120, api_key=OPENAI_API_KEY)
-
 META_PROMPT = """
 Given a task description or existing prompt, produce a detailed system prompt to guide a language model in completing the task effectively.
 
@@ -59,19 +55,20 @@ The final prompt you output should adhere to the following structure below. Do n
 async def generate_prompt(task_or_prompt: str):
     logging.info("Generating Metaprompt...")
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": META_PROMPT,
-                },
-                {
-                    "role": "user",
-                    "content": "Task, Goal, or Current Prompt:\n" + task_or_prompt,
-                },
-            ],
-        )
+        async with async_provider_slot("openai"):
+            completion = await get_async_openai_client().chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": META_PROMPT,
+                    },
+                    {
+                        "role": "user",
+                        "content": "Task, Goal, or Current Prompt:\n" + task_or_prompt,
+                    },
+                ],
+            )
         response = completion.choices[0].message.content
         return response
     except Exception as e:
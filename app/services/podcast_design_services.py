@@ -1,24 +1,23 @@
+import asyncio
 import requests
 from fastapi.responses import StreamingResponse
 from fastapi import FastAPI, HTTPException
-from fastapi import HTTPException
 from urllib.parse import urlparse
 import mimetypes
-from app.utils.llm import LLM
-from app.utils.s3_file_manager import S3FileManager
-from app.utils.atlas_client import AtlasClient
+from app.utils.llm import LLM, async_provider_slot, get_async_openai_client
+from app.utils.assistants import assistant_session
+from app.utils.s3_file_manager import S3FileManager, get_public_url
+from app.utils.atlas_client import AsyncAtlasClient
+from app.utils.pagination import find_page_or_400
+from app.utils.prompts import prompt_registry
 import logging
 import time
 import random
-import json
 import ast
 from langchain_core.prompts import PromptTemplate
 from bson.objectid import ObjectId
-from openai import OpenAI
-import os
 from fastapi import UploadFile
-from urllib.parse import quote, unquote
-import concurrent.futures as cf
+from urllib.parse import unquote
 import io
 from tempfile import NamedTemporaryFile  # Import for temporary file creation
 from pathlib import Path  # Import Path for handling filesystem paths
@@ -46,6 +45,10 @@ PODCAST_DESIGN_STEPS = [
     "published"  # expert-review-step
 ]
 
+# Fields left out of the podcast list returned to the dashboard
+PODCAST_SUMMARY_PROJECTION = {"podcast_transcript": 0, "raw_resources": 0}
+PODCAST_SORT_FIELDS = {"_id", "podcast_name", "status"}
+
 # Voice mapping for speakers
 VOICE_MAP = {
     "male-1": "ash",
@@ -62,23 +65,7 @@ def _get_prompt(prompt_name):
     Returns:
     PromptTemplate: the prompt template
     """
-    prompts_file = "app/data/prompts.json"
-    with open(prompts_file, "r") as file:
-        prompts = json.load(file)
-    if prompt_name not in prompts:
-        logging.error(f"Prompt {prompt_name} not found")
-        return ""
-    return prompts[prompt_name]
-
-def _convert_object_ids_to_strings(data):
-    if isinstance(data, dict):
-        return {key: _convert_object_ids_to_strings(value) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [_convert_object_ids_to_strings(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    else:
-        return data
+    return prompt_registry.get(prompt_name)
 
 def _get_file_type(file: UploadFile):
     if file.content_type.startswith("image"):
@@ -127,7 +114,7 @@ def format_podcast_dialogue(response_text):
     return "\n\n".join(formatted_lines)
 
 
-async def generate_podcast_outline(files, instructions, prompt, use_metaprompt, retry_count=0, max_retries=3):
+async def generate_podcast_outline(files, instructions, prompt, use_metaprompt, retry_count=0, max_retries=3, on_delta=None):
 
     if use_metaprompt:
         podcast_prompt = _get_prompt("GENERATE_PODCAST_PROMPT")
@@ -138,72 +125,22 @@ async def generate_podcast_outline(files, instructions, prompt, use_metaprompt,
     if podcast_prompt == "The request timed out. Please try again.":
         podcast_prompt = _get_prompt("GENERATE_PODCAST_PROMPT")
 
-    client = OpenAI(timeout=120, api_key=os.getenv("OPENAI_KEY"))
-
-    assistant_files_streams = []
-    if files:
-        for file in files:
-            file_content = file.file.read()
-            file.file.seek(0)
-            assistant_files_streams.append((file.filename, file_content))
-    created_assistant_id = None
-    created_vector_store_id = None
-    created_thread_id = None
-
     try:
-        assistant = client.beta.assistants.create(
+        # The request's prompt goes in the message so the assistant, keyed by
+        # its instructions, is reused across requests
+        response = await assistant_session.run(
             name="podcast creator",
-            instructions=podcast_prompt,
-            model=os.getenv("OPENAI_MODEL"),
-            tools=[{"type": "file_search"}]
-        )
-        created_assistant_id = assistant.id
-
-        vector_store = client.vector_stores.create(
-            name="Podcast Resources",
-            expires_after={"days": 1, "anchor": "last_active_at"},
-        )
-        created_vector_store_id = vector_store.id
-
-        if files:
-            client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=vector_store.id, files=assistant_files_streams
-            )
-            assistant = client.beta.assistants.update(
-                assistant_id=assistant.id,
-                tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}}
-            )
-
-        thread = client.beta.threads.create(
-            messages=[{"role": "user", "content": podcast_prompt}]
+            instructions=_get_prompt("GENERATE_PODCAST_PROMPT").replace("{text}", "(given in the user's message)"),
+            message=podcast_prompt,
+            files=files,
+            vector_store_name="Podcast Resources",
+            on_delta=on_delta,
         )
-        created_thread_id = thread.id
-
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id, assistant_id=assistant.id, poll_interval_ms=10000
-        )
-
-        messages = list(client.beta.threads.messages.list(
-            thread_id=thread.id, run_id=run.id))
-        
-        # Logging the received messages to debug
-        # print("Messages are:", messages)
-
-        # Extracting only the first message's content
-        response = messages[0].content[0].text.value  # Extract text content
 
     except Exception as e:
         logging.error(f"Error in generating podcast outline: {e}")
         return "The request timed out. Please try again later."
 
-    finally:
-        if created_assistant_id:
-            client.beta.assistants.delete(created_assistant_id)
-        if created_vector_store_id:
-            client.vector_stores.delete(created_vector_store_id)
-        if created_thread_id:
-            client.beta.threads.delete(created_thread_id)
-
     # Extracting dialogue format using regex
     match = re.search(r'<podcast_dialogue>(.*?)</podcast_dialogue>', response, re.DOTALL)
 
@@ -211,118 +148,46 @@ async def generate_podcast_outline(files, instructions, prompt, use_metaprompt,
         return match.group(1).strip()  # Return the dialogue between <podcast_dialogue> tags
     elif retry_count < max_retries:
         print(f"Attempt {retry_count + 1}: Retrying to generate dialogue format...", response)
-        return await generate_podcast_outline(files, instructions, prompt, use_metaprompt, retry_count + 1, max_retries)
+        return await generate_podcast_outline(files, instructions, prompt, use_metaprompt, retry_count + 1, max_retries, on_delta)
     else:
         return "Failed to generate a dialogue format after multiple attempts. Please try again later."
 
 async def generate_podcast_dialogue(dialogue, files = None):
     podcast_prompt = _get_prompt("EXTRACT_DIALOGUE_FROM_CONTENT")
-    podcast_prompt = podcast_prompt.replace("{text}", dialogue)
-
-    client = OpenAI(timeout=120, api_key=os.getenv("OPENAI_KEY"))
-
-    assistant_files_streams = []
-    if files:
-        for file in files:
-            file_content = file.file.read()
-
-            file.file.seek(0)
-
-            assistant_files_streams.append((file.filename, file_content))
-
-    # Track created resources
-    created_assistant_id = None
-    created_vector_store_id = None
-    created_thread_id = None
+    podcast_prompt = podcast_prompt.replace("{text}", "(given in the user's message)")
 
     try:
-        assistant = client.beta.assistants.create(
+        response = await assistant_session.run(
             name="podcast creator",
             instructions=podcast_prompt,
-            model=os.getenv("OPENAI_MODEL"),
-            tools=[{"type": "file_search"}]
-        )
-        created_assistant_id = assistant.id  # Track the assistant
-
-        vector_store = client.vector_stores.create(
-            name="Podcast Resources",
-            expires_after={"days": 1, "anchor": "last_active_at"},
-        )
-        created_vector_store_id = vector_store.id  # Track the vector store
-        if files:
-            file_batch = client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=vector_store.id, files=assistant_files_streams
-            )
-
-            assistant = client.beta.assistants.update(
-                assistant_id=assistant.id,
-                tool_resources={"file_search": {
-                    "vector_store_ids": [vector_store.id]}},
-            )
-
-        else:
-            assistant = client.beta.assistants.update(
-                assistant_id=assistant.id,
-            )
-
-        thread = client.beta.threads.create(
-            messages=[{
-                "role": "user",
-                "content": "Create the podcast based on the instructions provided and the following user's instructions: " + instructions,
-            }]
-        )
-        created_thread_id = thread.id  # Track the thread
-
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id, assistant_id=assistant.id, poll_interval_ms=10000
+            message="Create the podcast based on the instructions provided.\n\n" + dialogue,
+            files=files,
+            vector_store_name="Podcast Resources",
         )
-
-        messages = list(client.beta.threads.messages.list(
-            thread_id=thread.id, run_id=run.id))
-
-        message_content = messages[0].content[0].text
-        annotations = message_content.annotations
-        citations = []
-
-        for index, annotation in enumerate(annotations):
-            message_content.value = message_content.value.replace(
-                annotation.text, f"[{index}]")
-            if file_citation := getattr(annotation, "file_citation", None):
-                cited_file = client.files.retrieve(file_citation.file_id)
-                citations.append(f"[{index}] {cited_file.filename}")
-
-        response = message_content.value
     except Exception as e:
         logging.error(f"Error in generating course outline: {e}")
         return """The request timed out. Please try again later. However, here's a sample response:\n\n **Alex:** Welcome, everyone, to *Decoding AI: A Revolution in Business and National Security*! I'm your host, Alex Johnson, and today, we're diving into the fascinating world of artificial intelligence with a leading expert, Dr. Anya Sharma. **Anya:** Thanks for having me, Alex. It's exciting to discuss this rapidly evolving field. **Alex:** Absolutely! For those just tuning in, can you give us a quick, jargon-free definition of artificial intelligence and machine learning? **Anya:** Certainly. Artificial intelligence, or AI, is essentially the ability of a computer to mimic human intelligence. That includes problem-solving, decision-making, and learning from experience. Machine learning, or ML, is a subset of AI. It’s where we teach computers to learn from data without explicit programming—they learn patterns and make predictions based on that data. **Alex:** So, essentially, it's like teaching a computer to learn by example, rather than giving it a set of strict rules to follow? **Anya:** Exactly! That’s a huge shift from how computers have worked for the past 75 years. Think about it—before AI, we programmed every single step a computer took. Now, we can train a system to learn and adapt on its own, leading to some pretty amazing capabilities. **Alex:** That’s fascinating. Can you explain this difference using an analogy? **Anya:** Sure. Imagine explaining computers in 1950 to someone using slide rules and manual calculators. You tell them about machines that can do complex calculations instantly, learn, and adapt—they’d be amazed! That’s where we are now with AI—a complete game-changer impacting everything from business to defense. **Alex:** What exactly can AI do these days? And just as importantly, what can’t it do? **Anya:** AI excels at tasks involving massive data sets, like natural language processing, computer vision, and anomaly detection. It’s transforming industries—think self-driving cars, medical diagnoses, and fraud detection. But AI has limitations: it struggles with uncertainty, explaining its reasoning, and handling unexpected situations or genuine creativity. **Alex:** Let’s delve into specific applications. How is AI impacting business? **Anya:** AI is revolutionizing industries. It assists humans in programming and decision-making, streamlines supply chains, optimizes marketing, and enhances customer support. In healthcare, it’s helping with diagnostics, drug discovery, and personalized medicine. Autonomous vehicles and human-machine teaming are other key areas of transformation. **Alex:** And in national security? How is AI reshaping warfare and intelligence? **Anya:** AI is transforming national security with enhanced surveillance, autonomous systems, and efficient data analysis. It plays a crucial role in human-machine teaming, augmenting intelligence while keeping humans at the decision-making helm. However, ethical concerns arise, especially regarding autonomous weapons and AI-driven disinformation. **Alex:** Those are critical points. Let’s talk about the hardware driving these advancements. What’s happening on that front? **Anya:** Hardware is crucial. Specialized AI chips, cloud computing, and robust infrastructure are propelling the field forward. Companies like Nvidia lead the way, with a significant software advantage that creates a competitive edge. However, challenges remain as newer players work to catch up. **Alex:** This field is moving at lightning speed. To wrap things up, what are the key takeaways? **Anya:** AI is a revolutionary force transforming business and national security. While its potential is immense, so are its challenges. Responsible development, ethical considerations, and informed usage are critical. This is a rapidly evolving field, so staying informed is essential. **Alex:** Dr. Sharma, thank you for sharing your expertise. And to our listeners, thank you for tuning in to *Decoding AI*. Until next time, keep exploring and stay curious! """
-    finally:
-        # Clean up all created resources to avoid charges
-        if created_assistant_id:
-            client.beta.assistants.delete(created_assistant_id)
-        if created_vector_store_id:
-            client.vector_stores.delete(created_vector_store_id)
-        if created_thread_id:
-            client.beta.threads.delete(created_thread_id)
 
     return response
 
-async def get_podcasts(username: str):
+async def get_podcasts(username: str, limit=0, after_id=None, sort_by="_id", sort_order="asc"):
     try:
-        atlas_client = AtlasClient()
-        
-        # Attempt to retrieve podcasts
-        podcasts = atlas_client.find("podcast_design")
-        user_podcasts = []
-        for podcast in podcasts:
-            users = podcast.get("users", [])
-            if username in users:
-                user_podcasts.append(podcast)
-
-        # Ensure ObjectIds are converted to strings
-        podcasts = _convert_object_ids_to_strings(user_podcasts)
-      
+        # Attempt to retrieve the user's podcasts, leaving out the transcript
+        podcasts = await find_page_or_400("podcast_design", PODCAST_SORT_FIELDS,
+                                          filter={"users": username},
+                                          projection=PODCAST_SUMMARY_PROJECTION,
+                                          limit=limit,
+                                          after_id=after_id,
+                                          sort_by=sort_by,
+                                          sort_order=sort_order,
+                                          noun="podcasts")
+
         return podcasts
 
+    except HTTPException:
+        # Bad paging arguments are the caller's to fix
+        raise
+
     except ConnectionError as ce:
         # Handle connection errors
         return {"error": "Failed to connect to the database. Please try again later."}
@@ -352,32 +217,30 @@ async def generate_audio_for_podcast(outline_text: str, podcast_id: str):
     audio = b""  # Initialize the audio data as an empty byte string
     transcript = outline_text.strip()  # Use the provided outline as the transcript
 
-    # Generate audio for each line in the transcript
-    with cf.ThreadPoolExecutor() as executor:
-        futures = []
-        # Detect the number of speakers (assuming 2 for this case)
-        speaker_voices = list(VOICE_MAP.values())
-        lines = transcript.split("\n")
-
-        voiceToggle = True
-
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line:  # Ignore empty lines
-                if voiceToggle:
-                    voice = speaker_voices[0]
-                    voiceToggle = False
-                else:   
-                    voice = speaker_voices[1]
-                    voiceToggle = True
-                # voice = speaker_voices[i % 2]  # Alternate between two voices
-                future = executor.submit(get_mp3, line, voice)
-                futures.append((future, line))
-        
-        # Collect the audio chunks from each future
-        for future, line in futures:
-            audio_chunk = future.result()
-            audio += audio_chunk
+    # Generate audio for each line in the transcript concurrently; the OpenAI
+    # provider slots bound how many requests are in flight at once
+    tasks = []
+    # Detect the number of speakers (assuming 2 for this case)
+    speaker_voices = list(VOICE_MAP.values())
+    lines = transcript.split("\n")
+
+    voiceToggle = True
+
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if line:  # Ignore empty lines
+            if voiceToggle:
+                voice = speaker_voices[0]
+                voiceToggle = False
+            else:   
+                voice = speaker_voices[1]
+                voiceToggle = True
+            # voice = speaker_voices[i % 2]  # Alternate between two voices
+            tasks.append(get_mp3(line, voice))
+
+    # Collect the audio chunks in transcript order
+    for audio_chunk in await asyncio.gather(*tasks):
+        audio += audio_chunk
 
 
     s3_file_manager = S3FileManager()
@@ -394,42 +257,38 @@ async def generate_audio_for_podcast(outline_text: str, podcast_id: str):
     # Log success
     logging.info(f"File uploaded to S3 with key: {audio_key}")
 
-    # Make the uploaded file public
-    s3_file_manager.make_object_public(audio_key)
-
     # Generate the S3 URL for the uploaded audio
-    audio_key = quote(audio_key)
-    podcast_audio_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{audio_key}"
+    podcast_audio_link = get_public_url(audio_key)
 
     return podcast_audio_link, transcript
 
-def get_mp3(text: str, voice: str) -> bytes:
+async def get_mp3(text: str, voice: str) -> bytes:
     """
     Generate MP3 audio for the given text and voice using the OpenAI API.
     """
-    client = OpenAI(timeout=120, api_key=os.getenv("OPENAI_KEY"))
-    with client.audio.speech.with_streaming_response.create(
-        model="tts-1",
-        voice=voice,
-        input=text,
-    ) as response:
-        with io.BytesIO() as file:
-            for chunk in response.iter_bytes():
-                file.write(chunk)
-            return file.getvalue()
+    client = get_async_openai_client()
+    async with async_provider_slot("openai"):
+        async with client.audio.speech.with_streaming_response.create(
+            model="tts-1",
+            voice=voice,
+            input=text,
+        ) as response:
+            with io.BytesIO() as file:
+                async for chunk in response.iter_bytes():
+                    file.write(chunk)
+                return file.getvalue()
 
 async def create_podcast(username, podcast_name, podcast_description, podcast_transcript, files, podcast_image):
     podcast_status = "In Design Phase"
 
     s3_file_manager = S3FileManager()
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
     # Upload the podcast image to S3 and get the link
     podcast_id = ObjectId()
     key = f"qu-podcast-design/{podcast_id}/podcast_image/{podcast_image.filename}"
     await s3_file_manager.upload_file_from_frontend(podcast_image, key)
-    key = quote(key)
-    podcast_image_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+    podcast_image_link = get_public_url(key)
 
     # Generate podcast audio and get the link
     podcast_audio_link, _ = await generate_audio_for_podcast(podcast_transcript, str(podcast_id))
@@ -459,8 +318,7 @@ async def create_podcast(username, podcast_name, podcast_description, podcast_tr
 
             key = f"qu-podcast-design/{podcast_id}/{step_directory}/{file.filename}"
             await s3_file_manager.upload_file_from_frontend(file, key)
-            key = quote(key)
-            resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+            resource_link = get_public_url(key)
 
             raw_resources += [{
                 "resource_id": ObjectId(),
@@ -473,33 +331,30 @@ async def create_podcast(username, podcast_name, podcast_description, podcast_tr
     podcast[step_directory] = raw_resources
 
     # Insert the podcast into the database
-    atlas_client.insert("podcast_design", podcast)
+    await atlas_client.insert("podcast_design", podcast)
 
-    # Convert object IDs to strings for the response
-    podcast = _convert_object_ids_to_strings(podcast)
     return podcast
 
 async def get_podcast(podcast_id):
 
-    atlas_client = AtlasClient()
-    podcast = atlas_client.find("podcast_design", filter={
+    atlas_client = AsyncAtlasClient()
+    podcast = await atlas_client.find("podcast_design", filter={
                                "_id": ObjectId(podcast_id)})
 
     if not podcast:
         return {}
 
-    podcast = _convert_object_ids_to_strings(podcast)
     podcast = podcast[0]
     return podcast
 
 async def update_podcast_tags(podcast_id, tags):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
      # Check if tags contain a single empty string and convert it to an empty list
     if len(tags) == 1 and tags[0] == "":
         tags = []
     
     # Fetch the podcast from the database
-    podcast_data = atlas_client.find("podcast_design", filter={"_id": ObjectId(podcast_id)})
+    podcast_data = await atlas_client.find("podcast_design", filter={"_id": ObjectId(podcast_id)})
 
     if not podcast_data:
         return "Podcast not found"
@@ -511,7 +366,7 @@ async def update_podcast_tags(podcast_id, tags):
     }
 
     # Perform the update operation
-    update_response = atlas_client.update(
+    update_response = await atlas_client.update(
         "podcast_design",  # Collection name
         filter = {"_id": ObjectId(podcast_id)},  # Identify the correct lab
         update = update_payload
@@ -526,8 +381,8 @@ async def update_podcast_tags(podcast_id, tags):
 
 async def delete_podcast(podcast_id):
 
-    atlas_client = AtlasClient()
-    podcast = atlas_client.find("podcast_design", filter={
+    atlas_client = AsyncAtlasClient()
+    podcast = await atlas_client.find("podcast_design", filter={
                                "_id": ObjectId(podcast_id)})
 
     if not podcast:
@@ -535,9 +390,7 @@ async def delete_podcast(podcast_id):
 
     podcast = podcast[0]
 
-    atlas_client.delete("podcast_design", filter={"_id": ObjectId(podcast_id)})
-
-    podcast = _convert_object_ids_to_strings(podcast)
+    await atlas_client.delete("podcast_design", filter={"_id": ObjectId(podcast_id)})
 
     return podcast
 
@@ -546,10 +399,10 @@ async def podcast_prompt():
     return podcast_prompt
 
 async def update_podcast_info(podcast_id, podcast_name, podcast_description):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     
     # Fetch the course from the database
-    podcast_data = atlas_client.find("podcast_design", filter={"_id": ObjectId(podcast_id)})
+    podcast_data = await atlas_client.find("podcast_design", filter={"_id": ObjectId(podcast_id)})
 
     if not podcast_data:
         return "Podcast not found"
@@ -564,7 +417,7 @@ async def update_podcast_info(podcast_id, podcast_name, podcast_description):
     }
 
     # Perform the update operation
-    update_response = atlas_client.update(
+    update_response = await atlas_client.update(
         "podcast_design",  # Collection name
         filter = {"_id": ObjectId(podcast_id)},  # Identify the correct lab
         update = update_payload
@@ -8,10 +8,9 @@ from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_parse import LlamaParse
 from app.utils.atlas_client import AtlasClient
 from bson.objectid import ObjectId
-from app.utils.s3_file_manager import S3FileManager
+from app.utils.s3_file_manager import S3FileManager, get_public_url
 from pathlib import Path
 from llama_index.core.schema import TextNode
-from urllib.parse import quote
 import os
 from llama_index.core import (
     StorageContext,
@@ -132,8 +131,7 @@ async def upload_images_to_s3(image_dicts, course_id, module_id):
             path = image["path"]
             key = f"qu-course-design/{course_id}/{module_id}/raw_resources/{image['name']}"
             await s3_file_manager.upload_file(path, key)
-            key = quote(key)
-            resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+            resource_link = get_public_url(key)
             image["path"] = resource_link
             refactored_image_paths.append(image)
         except Exception as e:
@@ -228,17 +226,14 @@ def update_module_in_db(course_id, module_id, index_name):
         index_name (str): Name of the Pinecone index.
     """
     try:
-        course = atlas_client.find("course_design", {"_id": ObjectId(course_id)})[0]
-        modules = course["modules"]
-        module = next((m for m in modules if m["module_id"] == ObjectId(module_id)), None)
-
-        if module:
-            module["index"] = index_name
-            atlas_client.update(
-                "course_design",
-                {"_id": ObjectId(course_id)},
-                {"$set": {"modules": modules}},
-            )
+        course = atlas_client.find_one_and_update(
+            "course_design",
+            {"_id": ObjectId(course_id), "modules.module_id": ObjectId(module_id)},
+            {"$set": {"modules.$.index": index_name}},
+            projection={"_id": 1},
+        )
+
+        if course:
             logging.info(f"Updated module {module_id} with index {index_name}.")
         else:
             raise ValueError(f"Module with ID {module_id} not found.")
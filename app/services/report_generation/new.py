@@ -3,10 +3,10 @@
 # store the file locations in mongodb in resources
 # add file
 # delete file
-from app.utils.s3_file_manager import S3FileManager
+from app.utils.s3_file_manager import S3FileManager, get_public_url
 from app.utils.atlas_client import AtlasClient
 from bson.objectid import ObjectId
-from urllib.parse import quote, unquote
+from urllib.parse import unquote
 from llama_parse import LlamaParse
 from pathlib import Path
 from dotenv import load_dotenv
@@ -86,8 +86,7 @@ async def add_file(collection_name, collection_id, file):
     key = f"{collection_name}/{collection_id}/raw_resources/{resource_id}/{file.filename}"
     # Upload file to S3
     await s3.upload_file_from_frontend(file, key)
-    key = quote(key)
-    resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+    resource_link = get_public_url(key)
     resource={
         "resource_id": resource_id,
         "resource_link": resource_link,
@@ -110,8 +109,7 @@ async def add_file(collection_name, collection_id, file):
     for image_dict in image_dicts:
         image_key = f"{collection_name}/{collection_id}/raw_resources/{resource_id}/images/{image_dict['name']}"
         await s3.upload_file(image_dict["image_path"], image_key)
-        image_key = quote(image_key)
-        image_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{image_key}"
+        image_link = get_public_url(image_key)
         image_dict["image_link"] = image_link
 
     file_dict = {
@@ -168,7 +166,7 @@ async def delete_file(collection_name, collection_id, resource_id):
             remaining_resources.append(resource)
 
     resource_link = resource_to_be_deleted["resource_link"]
-    await s3.delete_file(resource_link)
+    await s3.adelete_file(resource_link)
 
     atlas_client.update(collection_name, filter={"_id": ObjectId(collection_id)}, update={"$set": {"raw_resources": remaining_resources}})
 
@@ -1,25 +1,19 @@
 # Import necessary modules and packages
 from pathlib import Path
-from app.utils.s3_file_manager import S3FileManager
-from app.utils.atlas_client import AtlasClient
+from app.utils.s3_file_manager import S3FileManager, get_public_url
+from app.utils.atlas_client import AsyncAtlasClient
+from app.utils.pagination import find_page_or_400
 import ast
+import asyncio
 from bson.objectid import ObjectId
 import os
 from app.services.qu_audit.qu_audit import *
 import fitz
 import json
+import logging
 
+PROJECT_SORT_FIELDS = {"_id", "name"}
 
-def _convert_object_ids_to_strings(data):
-    if isinstance(data, dict):
-        return {key: _convert_object_ids_to_strings(value) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [_convert_object_ids_to_strings(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    else:
-        return data
-    
 
 # Function to get all templates
 async def get_templates():
@@ -29,9 +23,9 @@ async def get_templates():
     Returns:
     - list of templates
     """
-    mongo_client = AtlasClient()  # Initialize MongoDB client
+    mongo_client = AsyncAtlasClient()  # Initialize MongoDB client
 
-    templates = mongo_client.find("model_templates", {})  # Find all templates
+    templates = await mongo_client.find("model_templates", {})  # Find all templates
 
     redacted_templates = []
     
@@ -43,7 +37,7 @@ async def get_templates():
             "note": template["note"],
         })
 
-    return _convert_object_ids_to_strings(redacted_templates)  # Return redacted templates
+    return redacted_templates  # Return redacted templates
 
 # Function to get template details
 async def get_template_details(template_id):
@@ -56,11 +50,11 @@ async def get_template_details(template_id):
     Returns:
     - template outline
     """
-    mongo_client = AtlasClient()  # Initialize MongoDB client
+    mongo_client = AsyncAtlasClient()  # Initialize MongoDB client
 
-    template_details  = mongo_client.find("model_templates", {"_id": ObjectId(template_id)})  # Find template by ID
+    template_details  = await mongo_client.find("model_templates", {"_id": ObjectId(template_id)})  # Find template by ID
 
-    return _convert_object_ids_to_strings(template_details)  # Return template details
+    return template_details  # Return template details
 
 # Function to convert table data to string
 def convert_table_data_to_string(table_data):
@@ -110,10 +104,10 @@ async def save_template_data(template_id, template_data):
     # 5. Save the url of the report html file to the model_reports collection
     # 6. Return the report_id, template_id, name and the url of the report html file
 
-    mongo_client = AtlasClient()  # Initialize MongoDB client
+    mongo_client = AsyncAtlasClient()  # Initialize MongoDB client
 
     # Get template name
-    template_name = mongo_client.find("model_templates", {"_id": ObjectId(template_id)})[0]["name"]
+    template_name = (await mongo_client.find("model_templates", {"_id": ObjectId(template_id)}))[0]["name"]
 
     report_inputs = TemplateValue({})  # Initialize template values
     tables = []  # List to store table data
@@ -149,21 +143,21 @@ async def save_template_data(template_id, template_data):
     s3_key = f"qu-model-design/reports/{report_id}.html"  # Define S3 key for the report
     await s3_file_manager.upload_file(f"reports/{report_id}.html", s3_key)  # Upload report to S3
 
-    s3_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{s3_key}"  # Generate S3 link for the report
+    s3_link = get_public_url(s3_key)  # Generate S3 link for the report
 
     os.remove(f"reports/{report_id}.html")  # Remove local HTML file
 
-    mongo_client.insert("model_reports", {"_id": report_id, "template_id": template_id, "name": template_name, "url": s3_link, "original_data": template_data})  # Insert report details into MongoDB
+    await mongo_client.insert("model_reports", {"_id": report_id, "template_id": template_id, "name": template_name, "url": s3_link, "original_data": template_data})  # Insert report details into MongoDB
 
     # Return report details
-    report_data = mongo_client.find("model_reports", {"_id": report_id})[0]
+    report_data = (await mongo_client.find("model_reports", {"_id": report_id}))[0]
 
-    return _convert_object_ids_to_strings(report_data)  # Return report details
+    return report_data  # Return report details
 
 # Function to delete a report
 async def delete_report(project_id, template_id, report_id):
-    mongo_client = AtlasClient()
-    project = mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    mongo_client = AsyncAtlasClient()
+    project = await mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
     if not project:
         return "Project not found"
     project = project[0]
@@ -173,100 +167,106 @@ async def delete_report(project_id, template_id, report_id):
             project["templates"][index]["report_ids"].remove(report_id)
             break
 
-    mongo_client.update("model_projects", {"_id": ObjectId(project_id)}, {"$set": {"templates": project["templates"]}})
-    mongo_client.delete("model_reports", {"_id": ObjectId(report_id)})
+    await mongo_client.update("model_projects", {"_id": ObjectId(project_id)}, {"$set": {"templates": project["templates"]}})
+    await mongo_client.delete("model_reports", {"_id": ObjectId(report_id)})
 
     return True
 
 # Function to create a model project
 async def create_model_project(username, project_name, project_description):
-    mongo_client = AtlasClient()
+    mongo_client = AsyncAtlasClient()
     users = [username]
-    project_id = mongo_client.insert("model_projects", {"users": users, "name": project_name, "description": project_description, "templates": []})
-    return _convert_object_ids_to_strings({"_id": str(project_id), "name": project_name, "description": project_description})
+    project_id = await mongo_client.insert("model_projects", {"users": users, "name": project_name, "description": project_description, "templates": []})
+    return {"_id": str(project_id), "name": project_name, "description": project_description}
 
 # Function to get all model projects
-async def get_model_projects(username):
-    mongo_client = AtlasClient()
-    projects = mongo_client.find("model_projects")
-    redacted_projects = []
-    for project in projects:
-        users = project["users"]
-        if(username in users):
-            redacted_projects.append({
-                "_id": str(project["_id"]),
-                "name": project["name"],
-                "description": project["description"],
-            })
-    return _convert_object_ids_to_strings(redacted_projects)
+async def get_model_projects(username, limit=0, after_id=None, sort_by="_id", sort_order="asc"):
+    # Only the summary fields are fetched from the database
+    redacted_projects = await find_page_or_400("model_projects", PROJECT_SORT_FIELDS,
+                                               filter={"users": username},
+                                               projection={"name": 1, "description": 1},
+                                               limit=limit,
+                                               after_id=after_id,
+                                               sort_by=sort_by,
+                                               sort_order=sort_order,
+                                               noun="projects")
+    return redacted_projects
 
 # Function to get a model project
 async def get_model_project(project_id):
-    mongo_client = AtlasClient()
-    project = mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    mongo_client = AsyncAtlasClient()
+    project = await mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    if not project:
+        return "Project not found"
+
+    template_details, missing = await mongo_client.find_many_by_ids("model_templates",
+                                                                    [template["template_id"] for template in project[0]["templates"]],
+                                                                    projection={"name": 1, "note": 1})
+    if missing:
+        logging.warning(f"Project {project_id} references missing templates: {missing}")
+    template_details = {str(template["_id"]): template for template in template_details}
+
     templates = []
     for template in project[0]["templates"]:
-        template_id = template["template_id"]
-        template_details = mongo_client.find("model_templates", {"_id": ObjectId(template_id)})
+        details = template_details.get(template["template_id"])
+        if not details:
+            continue
         redacted_template = {
-            "_id": str(template_details[0]["_id"]),
-            "name": template_details[0]["name"],
-            "note": template_details[0]["note"],
+            "_id": str(details["_id"]),
+            "name": details["name"],
+            "note": details["note"],
             "status": template["status"]
         }
         templates.append(redacted_template)
     
     project[0]["templates"] = templates
-    
-    if project:
-        return _convert_object_ids_to_strings(project[0])
-    else:
-        return "Project not found"
+    return project[0]
 
 # Function to delete a model project
 async def delete_model_project(project_id):
-    mongo_client = AtlasClient()
-    project = mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    mongo_client = AsyncAtlasClient()
+    project = await mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
     if project:
-        mongo_client.delete("model_projects", {"_id": ObjectId(project_id)})
+        await mongo_client.delete("model_projects", {"_id": ObjectId(project_id)})
         return True
     else:
         return "Project not found"
 
 # Function to import templates to a project
 async def import_templates_to_project(project_id, template_ids):
-    mongo_client = AtlasClient()
-    project = mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    mongo_client = AsyncAtlasClient()
+    project = await mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
     templates = project[0]["templates"] if project else []
     if project:
         for template_id in template_ids:
             templates.append({"template_id": str(template_id), "report_ids": [], "status": "Pending"})
         
-        mongo_client.update("model_projects", {"_id": ObjectId(project_id)}, {"$set": {"templates": templates}})
+        await mongo_client.update("model_projects", {"_id": ObjectId(project_id)}, {"$set": {"templates": templates}})
         return await get_model_project(project_id)
     else:
         return "Project not found"
 
 # Function to get the reports for a template in a project
 async def get_project_template_reports(project_id, template_id):
-    mongo_client = AtlasClient()
-    project = mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    mongo_client = AsyncAtlasClient()
+    project = await mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
     template_reports = []
     if project:
         for template in project[0]["templates"]:
             if template["template_id"] == template_id:
-                for report_id in template["report_ids"]:
-                    report = mongo_client.find("model_reports", {"_id": ObjectId(report_id)})
-                    template_reports.append(report[0])
-        return _convert_object_ids_to_strings(template_reports)
+                reports, missing = await mongo_client.find_many_by_ids("model_reports", template["report_ids"])
+                if missing:
+                    logging.warning(f"Project {project_id} references missing reports: {missing}")
+                template_reports.extend(reports)
+        return template_reports
     else:
         return "Project not found"
 
 # Function to save project template data
 async def save_project_template_data(project_id, template_id, template_data):    
     template_data = json.loads(template_data)
-    mongo_client = AtlasClient()
-    project = mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    mongo_client = AsyncAtlasClient()
+    project = await mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
     if not project:
         return "Project not found"
     project = project[0]
@@ -280,33 +280,44 @@ async def save_project_template_data(project_id, template_id, template_data):
             project["templates"][index]["status"] = "Completed"
             break
 
+    reports, _ = await mongo_client.find_many_by_ids("model_reports", report_ids, projection={"name": 1, "url": 1})
     report_datas = []
-    for report_id in report_ids:
-        report = mongo_client.find("model_reports", {"_id": ObjectId(report_id)})
+    for report in reports:
         report_data = {
-            "report_id": str(report_id),
-            "name": report[0]["name"],
-            "url": report[0]["url"]
+            "report_id": str(report["_id"]),
+            "name": report["name"],
+            "url": report["url"]
         }
         report_datas.append(report_data)
 
-    mongo_client.update("model_projects", {"_id": ObjectId(project_id)}, {"$set": {"templates": project["templates"]}})
-    return _convert_object_ids_to_strings(report_datas)
+    await mongo_client.update("model_projects", {"_id": ObjectId(project_id)}, {"$set": {"templates": project["templates"]}})
+    return report_datas
 
 # Function to get sample data for a template
 async def get_sample_data(template_id):
-    mongo_client = AtlasClient()
-    template = mongo_client.find("model_templates", {"_id": ObjectId(template_id)})
-    return _convert_object_ids_to_strings(template[0]["sample_data"])
+    mongo_client = AsyncAtlasClient()
+    template = await mongo_client.find("model_templates", {"_id": ObjectId(template_id)})
+    return template[0]["sample_data"]
 
 # Function to get sample report for a template
 async def get_sample_report(template_id):
-    mongo_client = AtlasClient()
-    template = mongo_client.find("model_templates", {"_id": ObjectId(template_id)})
-    return _convert_object_ids_to_strings(template[0]["sample_report"])
+    mongo_client = AsyncAtlasClient()
+    template = await mongo_client.find("model_templates", {"_id": ObjectId(template_id)})
+    return template[0]["sample_report"]
+
+def _merge_pdfs(pdf_files, combined_pdf_file):
+    pdf_writer = fitz.open()  # Initialize PDF writer
+
+    for pdf_file in pdf_files:
+        pdf_reader = fitz.open(pdf_file)
+        pdf_writer.insert_pdf(pdf_reader)
+        pdf_reader.close()
+
+    pdf_writer.save(combined_pdf_file)  # Save the combined pdf file
+    pdf_writer.close()
 
 # Function to combine pdfs
-def combine_pdfs(pdf_urls):
+async def combine_pdfs(pdf_urls):
     # Steps:
     # 1. Download all the pdfs from the urls
     # 2. Combine the pdfs into a single pdf
@@ -322,30 +333,25 @@ def combine_pdfs(pdf_urls):
     output_path = f"reports/{unique_id}/"  # Define output path for the combined pdf
     Path(output_path).mkdir(parents=True, exist_ok=True)  # Create output directory
 
-    # download all the pdfs
+    # download all the pdfs in parallel on the S3 executor
+    downloads = []
     for index, pdf_url in enumerate(pdf_urls):
         pdf_file = f"{output_path}{index}.pdf"  # Define pdf file path
         pdf_files.append(pdf_file)  # Add pdf file to pdf_files list
         s3_key = pdf_url.split("/")[3] + "/" + "/".join(pdf_url.split("/")[4:])  # Define S3 key for the pdf
 
-        s3_file_manager.download_file(s3_key, pdf_file)  # Download pdf file from S3
+        downloads.append(s3_file_manager.adownload_file(s3_key, pdf_file))  # Download pdf file from S3
+    await asyncio.gather(*downloads)
 
     combined_pdf_file = f"reports/{unique_id}/combined.pdf"  # Define path for the combined pdf file
 
-    # Combine the pdfs into a single pdf
-    pdf_writer = fitz.open()  # Initialize PDF writer
-
-    for pdf_file in pdf_files:
-        pdf_reader = fitz.open(pdf_file)
-        pdf_writer.insert_pdf(pdf_reader)
-        pdf_reader.close()
-
-    pdf_writer.save(combined_pdf_file)  # Save the combined pdf file
+    # Combine the pdfs into a single pdf, off the event loop
+    await asyncio.to_thread(_merge_pdfs, pdf_files, combined_pdf_file)
 
     s3_key = f"qu-model-design/reports/{unique_id}/combined.pdf"  # Define S3 key for the combined pdf
-    s3_file_manager.upload_file(combined_pdf_file, s3_key)  # Upload the combined pdf to S3
+    await s3_file_manager.async_upload_file(combined_pdf_file, s3_key)  # Upload the combined pdf to S3
 
-    s3_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{s3_key}"  # Generate S3 link for the combined pdf
+    s3_link = get_public_url(s3_key)  # Generate S3 link for the combined pdf
 
     for pdf_file in pdf_files:
         os.remove(pdf_file)
@@ -356,8 +362,8 @@ def combine_pdfs(pdf_urls):
 
 # Function to consolidate all reports
 async def consolidate_reports(project_id):
-    mongo_client = AtlasClient()
-    project = mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    mongo_client = AsyncAtlasClient()
+    project = await mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
     if not project:
         return "Project not found"
     project = project[0]
@@ -367,24 +373,24 @@ async def consolidate_reports(project_id):
         report_ids.append(template["report_ids"][-1])
     
     # get all the pdf urls for the reports
-    pdf_urls = []
-    for report_id in report_ids:
-        report = mongo_client.find("model_reports", {"_id": ObjectId(report_id)})
-        pdf_urls.append(report[0]["url"])
+    reports, missing = await mongo_client.find_many_by_ids("model_reports", report_ids, projection={"url": 1})
+    if missing:
+        logging.warning(f"Project {project_id} references missing reports: {missing}")
+    pdf_urls = [report["url"] for report in reports]
     
 
     # combine the pdfs into a single pdf
-    combined_pdf_url = combine_pdfs(pdf_urls)
+    combined_pdf_url = await combine_pdfs(pdf_urls)
 
     #  insert the url in the model_projects collection
-    mongo_client.update("model_projects", {"_id": ObjectId(project_id)}, {"$set": {"consolidated_report": combined_pdf_url}})
+    await mongo_client.update("model_projects", {"_id": ObjectId(project_id)}, {"$set": {"consolidated_report": combined_pdf_url}})
 
     return combined_pdf_url
 
 # Function to get the completion status of a project
 async def get_completion_status(project_id):
-    mongo_client = AtlasClient()
-    project = mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
+    mongo_client = AsyncAtlasClient()
+    project = await mongo_client.find("model_projects", {"_id": ObjectId(project_id)})
     if not project:
         return "Project not found"
     project = project[0]
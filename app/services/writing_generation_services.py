@@ -1,17 +1,20 @@
-from app.utils.llm import LLM
-from pathlib import Path
-from langchain_core.prompts.prompt import PromptTemplate
+from app.utils.llm import LLM, get_cache_ttl
+from app.utils.assistants import S3Resource, assistant_session
+from app.utils.json_repair import parse_structured
+from app.models.llm_outputs import WritingTemplate
 from app.services.report_generation.generate_pdf import convert_markdown_to_pdf
 from bson.objectid import ObjectId
-from app.utils.s3_file_manager import S3FileManager
-from urllib.parse import quote
-from app.utils.atlas_client import AtlasClient
-from openai import OpenAI
+from app.utils.s3_file_manager import S3FileManager, get_public_url
+from urllib.parse import unquote
+from app.utils.atlas_client import AsyncAtlasClient
+from app.utils.pagination import find_page_or_400
+from app.utils.prompts import prompt_registry
 import os
 import json
 import logging
 import datetime
 import ast
+from typing import List
 from app.services.metaprompt import generate_prompt
 
 identifier_mappings = {
@@ -26,6 +29,10 @@ identifier_mappings = {
     "handout": "Handout",
 }
 
+# Fields left out of the writing list returned to the dashboard
+WRITING_SUMMARY_PROJECTION = {"history": 0, "all_resources": 0}
+WRITING_SORT_FIELDS = {"_id", "writing_name", "status"}
+
 
 def _get_prompt(prompt_name):
     """
@@ -37,49 +44,32 @@ def _get_prompt(prompt_name):
     Returns:
     PromptTemplate: the prompt template
     """
-    prompts_file = "app/data/prompts.json"
-    with open(prompts_file, "r") as file:
-        prompts = json.load(file)
-    if prompt_name not in prompts:
-        logging.error(f"Prompt {prompt_name} not found")
-        return ""
-    return prompts[prompt_name]
-
-def _convert_object_ids_to_strings(data):
-    if isinstance(data, dict):
-        return {key: _convert_object_ids_to_strings(value) for key, value in data.items()}
-    elif isinstance(data, list):
-        return [_convert_object_ids_to_strings(item) for item in data]
-    elif isinstance(data, ObjectId):
-        return str(data)
-    else:
-        return data
-    
-async def get_writings(username: str):
-    atlas_client = AtlasClient()
-    writings = atlas_client.find(collection_name="writing_design")
-    user_writings = []
-    for writing in writings:
-        users = writing.get("users", [])
-        if username in users:
-            user_writings.append(writing)
-    writings = _convert_object_ids_to_strings(user_writings)
+    return prompt_registry.get(prompt_name)
+
+async def get_writings(username: str, limit=0, after_id=None, sort_by="_id", sort_order="asc"):
+    writings = await find_page_or_400("writing_design", WRITING_SORT_FIELDS,
+                                      filter={"users": username},
+                                      projection=WRITING_SUMMARY_PROJECTION,
+                                      limit=limit,
+                                      after_id=after_id,
+                                      sort_by=sort_by,
+                                      sort_order=sort_order,
+                                      noun="writings")
     return writings
 
 async def delete_writing(writing_id):
-    atlas_client = AtlasClient()
-    writing = atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
+    atlas_client = AsyncAtlasClient()
+    writing = await atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
     if writing:
-        atlas_client.delete(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
+        await atlas_client.delete(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
         return True
     return False
 
 async def get_writing(writing_id):
-    atlas_client = AtlasClient()
-    writing = atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
+    atlas_client = AsyncAtlasClient()
+    writing = await atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
     if writing:
         writing = writing[0]
-        writing = _convert_object_ids_to_strings(writing)
     return writing
 
 async def generate_templates(files, identifier, target_audience, tone, expected_length, prompt, use_metaprompt):
@@ -87,93 +77,28 @@ async def generate_templates(files, identifier, target_audience, tone, expected_
     identifier_text = identifier_mappings.get(identifier, "Writing")
     # templates_instructions = _get_prompt(prompt)
     templates_instructions = prompt.replace("{IDENTIFIER_TEXT}", identifier_text)
-    templates_instructions += f"\n\nAdditional instructions from user: \n- Target Audience: {target_audience}\n- Tone: {tone}\n- Expected Length: {expected_length}"
-    
-    if use_metaprompt:
-        templates_instructions = await generate_prompt(templates_instructions)
-    
     if templates_instructions == "The request timed out. Please try again.":
         templates_instructions = _get_prompt("GENERATE_TEMPLATES_FOR_WRITING_PROMPT")
         templates_instructions = templates_instructions.replace("{IDENTIFIER_TEXT}", identifier_text)
-        templates_instructions += f"\n\nAdditional instructions from user: \n- Target Audience: {target_audience}\n- Tone: {tone}\n- Expected Length: {expected_length}"
-
 
-    client = OpenAI(timeout=120, api_key=os.getenv("OPENAI_KEY"))
-
-    assistant_files_streams = []
-    if files:
-        for file in files:
-            file_content = file.file.read()
-
-            file.file.seek(0)
-
-            assistant_files_streams.append((file.filename, file_content))
-
-    # Track created resources
-    created_assistant_id = None
-    created_vector_store_id = None
-    created_thread_id = None
+    # The user's text goes in the message so the assistant, keyed by its
+    # instructions, is reused across requests
+    user_instructions = f"Additional instructions from user: \n- Target Audience: {target_audience}\n- Tone: {tone}\n- Expected Length: {expected_length}"
+    if use_metaprompt:
+        generated_prompt = await generate_prompt(templates_instructions + "\n\n" + user_instructions)
+        if generated_prompt != "The request timed out. Please try again.":
+            user_instructions = generated_prompt
 
     try:
-        assistant = client.beta.assistants.create(
+        response = await assistant_session.run(
             name=identifier_text + " Creator",
             instructions=templates_instructions,
-            model=os.getenv("OPENAI_MODEL"),
-            tools=[{"type": "file_search"}]
-        )
-
-        created_assistant_id = assistant.id  # Track the assistant
-
-        vector_store = client.vector_stores.create(
-            name="writing Resources",
-            expires_after={"days": 7, "anchor": "last_active_at"},
+            message="Generate templates for " + identifier_text + " based on the instructions provided.\n\n" + user_instructions,
+            files=files,
+            vector_store_name="writing Resources",
+            expires_after_days=7,
         )
-
-        created_vector_store_id = vector_store.id  # Track the vector store
-
-        if files:
-            file_batch = client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=vector_store.id, files=assistant_files_streams
-            )
-
-            assistant = client.beta.assistants.update(
-                assistant_id=assistant.id,
-                tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}},
-            )
-        else:
-            assistant = client.beta.assistants.update(
-                        assistant_id=assistant.id,
-                    )
-            
-        thread = client.beta.threads.create(
-            messages=[{
-                "role": "user",
-                "content": "Generate templates for " + identifier_text + " based on the instructions provided.",
-            }]
-        )
-
-        created_thread_id = thread.id  # Track the thread
-
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id, assistant_id=assistant.id, poll_interval_ms=10000
-        )
-
-        messages = list(client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id))
-        message_content = messages[0].content[0].text
-        annotations = message_content.annotations
-        citations = []
-
-        for index, annotation in enumerate(annotations):
-            message_content.value = message_content.value.replace(annotation.text, f"[{index}]")
-            if file_citation := getattr(annotation, "file_citation", None):
-                cited_file = client.files.retrieve(file_citation.file_id)
-                citations.append(f"[{index}] {cited_file.filename}")
-
-        response = message_content.value
-        try:
-            response = json.loads(response)
-        except:
-            response = json.loads(response[response.index("["):response.rindex("]") + 1])
+        response = [template.model_dump() for template in parse_structured(response, List[WritingTemplate])]
 
         for template in response:
             template["template_content"] = template["template_content"].replace("\\n", "\n")
@@ -205,98 +130,31 @@ async def generate_templates(files, identifier, target_audience, tone, expected_
                 }
             ]
         }
-    
-    finally:
-        # Clean up all created resources to avoid charges
-        if created_assistant_id:
-            client.beta.assistants.delete(created_assistant_id)
-        if created_vector_store_id:
-            client.vector_stores.delete(created_vector_store_id)
-        if created_thread_id:
-            client.beta.threads.delete(created_thread_id)
-
-async def writing_outline(files, instructions, identifier, use_metaprompt=False):
+
+async def writing_outline(files, instructions, identifier, use_metaprompt=False, on_delta=None):
     prompt = identifier.upper() + "_PROMPT"
     identifier_text = identifier_mappings.get(identifier, "Writing")
     
     outline_instructions = _get_prompt(prompt)
-    outline_instructions += f"\n\nAdditional instructions from user: \n- {instructions}"
 
+    # The user's text goes in the message so the assistant, keyed by its
+    # instructions, is reused across requests
+    user_instructions = f"Additional instructions from user: \n- {instructions}"
     if use_metaprompt:
-        outline_instructions = await generate_prompt(outline_instructions)
-
-    if outline_instructions == "The request timed out. Please try again.":
-        outline_instructions = _get_prompt(prompt)
-        outline_instructions += f"\n\nAdditional instructions from user: \n- {instructions}"
-
-    client = OpenAI(timeout=120, api_key=os.getenv("OPENAI_KEY"))
-
-    assistant_files_streams = []
-    if files:
-        for file in files:
-            file_content = file.file.read()
-
-            file.file.seek(0)
-
-            assistant_files_streams.append((file.filename, file_content))
-
-    # Track created resources
-    created_assistant_id = None
-    created_vector_store_id = None
-    created_thread_id = None
+        generated_prompt = await generate_prompt(outline_instructions + "\n\n" + user_instructions)
+        if generated_prompt != "The request timed out. Please try again.":
+            user_instructions = generated_prompt
 
     try:
-        assistant = client.beta.assistants.create(
+        response = await assistant_session.run(
             name=identifier_text + " Creator",
             instructions=outline_instructions,
-            model=os.getenv("OPENAI_MODEL"),
-            tools=[{"type": "file_search"}]
-        )
-        created_assistant_id = assistant.id  # Track the assistant
-
-        vector_store = client.vector_stores.create(
-            name="writing Resources",
-            expires_after={"days": 7, "anchor": "last_active_at"},
-        )
-        created_vector_store_id = vector_store.id  # Track the vector store
-        if files:
-            file_batch = client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=vector_store.id, files=assistant_files_streams
-            )
-
-            assistant = client.beta.assistants.update(
-                assistant_id=assistant.id,
-                tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}},
-            )
-        else:
-            assistant = client.beta.assistants.update(
-                        assistant_id=assistant.id,
-                    )
-
-        thread = client.beta.threads.create(
-            messages=[{
-                "role": "user",
-                "content": "Create the " + identifier_text + " in markdown format based on the instructions provided and the user's instructions.",
-            }]
+            message="Create the " + identifier_text + " in markdown format based on the instructions provided and the user's instructions.\n\n" + user_instructions,
+            files=files,
+            vector_store_name="writing Resources",
+            expires_after_days=7,
+            on_delta=on_delta,
         )
-        created_thread_id = thread.id  # Track the thread
-
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id, assistant_id=assistant.id, poll_interval_ms=10000
-        )
-
-        messages = list(client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id))
-        message_content = messages[0].content[0].text
-        annotations = message_content.annotations
-        citations = []
-
-        for index, annotation in enumerate(annotations):
-            message_content.value = message_content.value.replace(annotation.text, f"[{index}]")
-            if file_citation := getattr(annotation, "file_citation", None):
-                cited_file = client.files.retrieve(file_citation.file_id)
-                citations.append(f"[{index}] {cited_file.filename}")
-
-        response = message_content.value
         if response.startswith("```"):
             response = response[3:].strip()
         if response.startswith("markdown"):
@@ -315,42 +173,25 @@ async def writing_outline(files, instructions, identifier, use_metaprompt=False)
         logging.error(f"Error in generating writing: {e}")
         response = "# "+identifier_text+"\nHere's a sample: \n### 1: **On Machine Learning Applications in Investments**\n**Description**: This module provides an overview of the use of machine learning (ML) in investment practices, including its potential benefits and common challenges. It highlights examples where ML techniques have outperformed traditional investment models.\n\n**Learning Outcomes**:\n- Understand the motivations behind using ML in investment strategies.\n- Recognize the challenges and solutions in applying ML to finance.\n- Explore practical applications of ML for predicting equity returns and corporate performance.\n### 2: **Alternative Data and AI in Investment Research**\n**Description**: This module explores how alternative data sources combined with AI are transforming investment research by providing unique insights and augmenting traditional methods.\n\n**Learning Outcomes**:\n- Identify key sources of alternative data and their relevance in investment research.\n- Understand how AI can process and derive actionable insights from alternative data.\n- Analyze real-world use cases showcasing the impact of AI in research and decision-making.\n### 3: **Data Science for Active and Long-Term Fundamental Investing**\n**Description**: This module covers the integration of data science into long-term fundamental investing, discussing how quantitative analysis can enhance traditional methods.\n\n**Learning Outcomes**:\n- Learn the foundational role of data science in long-term investment strategies.\n- Understand the benefits of combining data science with active investing.\n- Evaluate case studies on the effective use of data science to support investment decisions.\n### 4: **Unlocking Insights and Opportunities**\n**Description**: This module focuses on techniques and strategies for using data-driven insights to identify market opportunities and enhance investment management processes.\n\n**Learning Outcomes**:\n- Grasp the importance of leveraging advanced data analytics for opportunity identification.\n- Understand how to apply insights derived from data to optimize investment outcomes.\n- Explore tools and methodologies that facilitate the unlocking of valuable investment insights.\n### 5: **Advances in Natural Language Understanding for Investment Management**\n**Description**: This module highlights the progression of natural language understanding (NLU) and its application in finance. It covers recent developments and their implications for asset management.\n\n**Learning Outcomes**:\n- Recognize advancements in NLU and their integration into investment strategies.\n- Explore trends and applications of NLU in financial data analysis.\n- Understand the technical challenges and solutions associated with implementing NLU tools.\n###"
         # return {"writing_id": str(ObjectId()), "writing":"# "+identifier_text+"\nHere's a sample: \n### 1: **On Machine Learning Applications in Investments**\n**Description**: This module provides an overview of the use of machine learning (ML) in investment practices, including its potential benefits and common challenges. It highlights examples where ML techniques have outperformed traditional investment models.\n\n**Learning Outcomes**:\n- Understand the motivations behind using ML in investment strategies.\n- Recognize the challenges and solutions in applying ML to finance.\n- Explore practical applications of ML for predicting equity returns and corporate performance.\n### 2: **Alternative Data and AI in Investment Research**\n**Description**: This module explores how alternative data sources combined with AI are transforming investment research by providing unique insights and augmenting traditional methods.\n\n**Learning Outcomes**:\n- Identify key sources of alternative data and their relevance in investment research.\n- Understand how AI can process and derive actionable insights from alternative data.\n- Analyze real-world use cases showcasing the impact of AI in research and decision-making.\n### 3: **Data Science for Active and Long-Term Fundamental Investing**\n**Description**: This module covers the integration of data science into long-term fundamental investing, discussing how quantitative analysis can enhance traditional methods.\n\n**Learning Outcomes**:\n- Learn the foundational role of data science in long-term investment strategies.\n- Understand the benefits of combining data science with active investing.\n- Evaluate case studies on the effective use of data science to support investment decisions.\n### 4: **Unlocking Insights and Opportunities**\n**Description**: This module focuses on techniques and strategies for using data-driven insights to identify market opportunities and enhance investment management processes.\n\n**Learning Outcomes**:\n- Grasp the importance of leveraging advanced data analytics for opportunity identification.\n- Understand how to apply insights derived from data to optimize investment outcomes.\n- Explore tools and methodologies that facilitate the unlocking of valuable investment insights.\n### 5: **Advances in Natural Language Understanding for Investment Management**\n**Description**: This module highlights the progression of natural language understanding (NLU) and its application in finance. It covers recent developments and their implications for asset management.\n\n**Learning Outcomes**:\n- Recognize advancements in NLU and their integration into investment strategies.\n- Explore trends and applications of NLU in financial data analysis.\n- Understand the technical challenges and solutions associated with implementing NLU tools.\n###"}
-    finally:
-        
-        # Clean up all created resources to avoid charges
-        # store the assistant_id, vector_store_id, thread_id in mongodb
-        atlas_client = AtlasClient()
-        id = atlas_client.insert(
-            collection_name="writing_design",
-            data={
-                "writing_outline": response,
-                "initial_instructions": instructions
-            }
-            # data={
-            #       "writing_outline": response,
-            #     "assistant_id": created_assistant_id,
-            #     "vector_store_id": created_vector_store_id,
-            #     "thread_id": created_thread_id
-            # }
-        )
 
-        if created_assistant_id:
-            client.beta.assistants.delete(created_assistant_id)
-        if created_vector_store_id:
-            client.vector_stores.delete(created_vector_store_id)
-        if created_thread_id:
-            client.beta.threads.delete(created_thread_id)
+    atlas_client = AsyncAtlasClient()
+    id = await atlas_client.insert(
+        collection_name="writing_design",
+        data={
+            "writing_outline": response,
+            "initial_instructions": instructions
+        }
+    )
 
     return {"writing_id": str(id), "writing": response}
 
 async def create_writing(username, writing_id, writing_name, writing_description, writing_outline, files, writing_image, identifier):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     s3_file_manager = S3FileManager()
 
     key = f"qu-course-design/{writing_id}/course_image/{writing_image.filename}"
     await s3_file_manager.upload_file_from_frontend(writing_image, key)
-    key = quote(key)
-    writing_image_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+    writing_image_link = get_public_url(key)
     users = [username]
     writing = {
         "users": users,
@@ -362,10 +203,10 @@ async def create_writing(username, writing_id, writing_name, writing_description
         "identifier": identifier,
         "tags": [],
     }
-    atlas_client.update("writing_design", filter={"_id": ObjectId(writing_id)}, update={
+    await atlas_client.update("writing_design", filter={"_id": ObjectId(writing_id)}, update={
         "$set": writing
     })
-    writing = atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})[0]
+    writing = (await atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)}))[0]
     instructions = writing.get("initial_instructions", "")
 
     raw_resources = []
@@ -376,8 +217,7 @@ async def create_writing(username, writing_id, writing_name, writing_description
             resource_id = ObjectId()
             key = f"qu-writing-design/{writing_id}/raw_resources/{resource_id}.{file.filename.split('.')[-1]}"
             await s3_file_manager.upload_file_from_frontend(file, key)
-            key = quote(key)
-            resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+            resource_link = get_public_url(key)
             resource = {
                 "resource_id": resource_id,
                 "resource_type": "File",
@@ -394,23 +234,20 @@ async def create_writing(username, writing_id, writing_name, writing_description
         "resources": raw_resources,
         "feedback": instructions
     })
-    atlas_client.update("writing_design", filter={"_id": ObjectId(writing_id)}, update={
+    await atlas_client.update("writing_design", filter={"_id": ObjectId(writing_id)}, update={
         "$set": {"history": history}
     })
-    atlas_client.update("writing_design", filter={"_id": ObjectId(writing_id)}, update={
+    await atlas_client.update("writing_design", filter={"_id": ObjectId(writing_id)}, update={
         "$set": {"all_resources": raw_resources}
     })
-    writing = atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})[0]
-    writing = _convert_object_ids_to_strings(writing)
+    writing = (await atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)}))[0]
 
     return writing
 
 async def regenerate_outline(writing_id, instructions, previous_outline, selected_resources, identifier, prompt):
     selected_resources = json.loads(selected_resources)
-    client = OpenAI(timeout=120, api_key=os.getenv("OPENAI_KEY"))
-    atlas_client = AtlasClient()
-    s3_file_manager = S3FileManager()
-    writing = atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
+    atlas_client = AsyncAtlasClient()
+    writing = await atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
     if not writing:
         return "Writing not found"
     
@@ -418,88 +255,37 @@ async def regenerate_outline(writing_id, instructions, previous_outline, selecte
 
     # prompt = _get_prompt("REGENERATE_DRAFT_PROMPT")
 
-    prompt = prompt.replace("{DRAFT}", previous_outline)
-    prompt = prompt.replace("{USER_INSTRUCTIONS}", instructions)
-
     # if use_metaprompt:
     #     prompt = await generate_prompt(prompt)
 
     if prompt == "The request timed out. Please try again.":
         prompt = _get_prompt("REGENERATE_DRAFT_PROMPT")
-        prompt = prompt.replace("{DRAFT}", previous_outline)
-        prompt = prompt.replace("{USER_INSTRUCTIONS}", instructions)
+
+    # The draft and the user's instructions go in the message so the
+    # assistant, keyed by its instructions, is reused across requests
+    prompt = prompt.replace("{DRAFT}", "(given in the user's message)")
+    prompt = prompt.replace("{USER_INSTRUCTIONS}", "(given in the user's message)")
 
 
+    # Resources OpenAI already has are attached by id; the rest are streamed from S3
     files = []
     for resource in selected_resources:
         file_link = resource.get("resource_link")
-        file_key = file_link.split("/")[3] + "/" + "/".join(file_link.split("/")[4:])
-        file_location = f"files/temp/{writing_id}/"
-        Path(file_location).mkdir(parents=True, exist_ok=True)
-        file_location += file_key.split("/")[-1]
-        s3_file_manager.download_file(file_key, file_location)
-        files.append(Path(file_location))
-
-    # Track created resources
-    created_assistant_id = None
-    created_vector_store_id = None
-    created_thread_id = None
+        files.append(S3Resource(unquote(file_link.split("/", 3)[3])))
 
     identifier_text = identifier_mappings.get(identifier, "Writing")
 
     try:
-        assistant = client.beta.assistants.create(
+        response = await assistant_session.run(
             name=identifier_text + " Creator",
             instructions=prompt,
-            model=os.getenv("OPENAI_MODEL"),
-            tools=[{"type": "file_search"}]
-        )
-        created_assistant_id = assistant.id  # Track the assistant
-
-        vector_store = client.vector_stores.create(
-            name="writing Resources",
-            expires_after={"days": 7, "anchor": "last_active_at"},
-        )
-        created_vector_store_id = vector_store.id  # Track the vector store
-        if files:
-            file_batch = client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=vector_store.id, files=files
-            )
-
-            assistant = client.beta.assistants.update(
-                assistant_id=assistant.id,
-                tool_resources={"file_search": {"vector_store_ids": [vector_store.id]}},
-            )
-        else:
-            assistant = client.beta.assistants.update(
-                        assistant_id=assistant.id,
-                    )
-
-        thread = client.beta.threads.create(
-            messages=[{
-                "role": "user",
-                "content": "Create the " + identifier_text + " in markdown format based on the instructions provided and the user's instructions.",
-            }]
-        )
-        created_thread_id = thread.id  # Track the thread
-
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id, assistant_id=assistant.id, poll_interval_ms=10000
+            message="Create the " + identifier_text + " in markdown format based on the instructions provided and the user's instructions."
+                    + "\n\nUser's Instructions:\n" + instructions + "\nOld Draft:\n" + previous_outline,
+            files=files,
+            vector_store_name="writing Resources",
+            expires_after_days=7,
         )
 
-        messages = list(client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id))
-        message_content = messages[0].content[0].text
-        annotations = message_content.annotations
-        citations = []
-
-        for index, annotation in enumerate(annotations):
-            message_content.value = message_content.value.replace(annotation.text, f"[{index}]")
-            if file_citation := getattr(annotation, "file_citation", None):
-                cited_file = client.files.retrieve(file_citation.file_id)
-                citations.append(f"[{index}] {cited_file.filename}")
-
-        response = message_content.value
-
         if response.startswith("```"):
             response = response[3:].strip()
         if response.startswith("markdown"):
@@ -522,7 +308,7 @@ async def regenerate_outline(writing_id, instructions, previous_outline, selecte
             "resources": selected_resources,
             "feedback": instructions
         })
-        atlas_client.update(
+        await atlas_client.update(
             collection_name="writing_design",
             filter={"_id": ObjectId(writing_id)},
             update={
@@ -531,7 +317,7 @@ async def regenerate_outline(writing_id, instructions, previous_outline, selecte
                 }
             }
         )
-        atlas_client.update(
+        await atlas_client.update(
             collection_name="writing_design",
             filter={"_id": ObjectId(writing_id)},
             update={
@@ -544,31 +330,17 @@ async def regenerate_outline(writing_id, instructions, previous_outline, selecte
     except Exception as e:
         logging.error(e)
         return {"writing_id": str(id), "writing": "The request timed out. Please try again later. However, here's a sample response:\n\n# "+identifier_text+"\n### 1: **On Machine Learning Applications in Investments**\n**Description**: This module provides an overview of the use of machine learning (ML) in investment practices, including its potential benefits and common challenges. It highlights examples where ML techniques have outperformed traditional investment models.\n\n**Learning Outcomes**:\n- Understand the motivations behind using ML in investment strategies.\n- Recognize the challenges and solutions in applying ML to finance.\n- Explore practical applications of ML for predicting equity returns and corporate performance.\n### 2: **Alternative Data and AI in Investment Research**\n**Description**: This module explores how alternative data sources combined with AI are transforming investment research by providing unique insights and augmenting traditional methods.\n\n**Learning Outcomes**:\n- Identify key sources of alternative data and their relevance in investment research.\n- Understand how AI can process and derive actionable insights from alternative data.\n- Analyze real-world use cases showcasing the impact of AI in research and decision-making.\n### 3: **Data Science for Active and Long-Term Fundamental Investing**\n**Description**: This module covers the integration of data science into long-term fundamental investing, discussing how quantitative analysis can enhance traditional methods.\n\n**Learning Outcomes**:\n- Learn the foundational role of data science in long-term investment strategies.\n- Understand the benefits of combining data science with active investing.\n- Evaluate case studies on the effective use of data science to support investment decisions.\n### 4: **Unlocking Insights and Opportunities**\n**Description**: This module focuses on techniques and strategies for using data-driven insights to identify market opportunities and enhance investment management processes.\n\n**Learning Outcomes**:\n- Grasp the importance of leveraging advanced data analytics for opportunity identification.\n- Understand how to apply insights derived from data to optimize investment outcomes.\n- Explore tools and methodologies that facilitate the unlocking of valuable investment insights.\n### 5: **Advances in Natural Language Understanding for Investment Management**\n**Description**: This module highlights the progression of natural language understanding (NLU) and its application in finance. It covers recent developments and their implications for asset management.\n\n**Learning Outcomes**:\n- Recognize advancements in NLU and their integration into investment strategies.\n- Explore trends and applications of NLU in financial data analysis.\n- Understand the technical challenges and solutions associated with implementing NLU tools.\n###"}
-    
-    finally:
-        # Clean up all created resources to avoid charges
-        if created_assistant_id:
-            client.beta.assistants.delete(created_assistant_id)
-        if created_vector_store_id:
-            client.vector_stores.delete(created_vector_store_id)
-        if created_thread_id:
-            client.beta.threads.delete(created_thread_id)
-            
-        for file in files:
-            os.remove(file)
-        os.rmdir(f"files/temp/{writing_id}")
-        os.rmdir("files/temp")
 
     return {"writing_id": str(id), "writing": response}
 
 async def update_writing_tags(writing_id, tags):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
      # Check if tags contain a single empty string and convert it to an empty list
     if len(tags) == 1 and tags[0] == "":
         tags = []
     
     # Fetch the podcast from the database
-    writing_data = atlas_client.find("writing_design", filter={"_id": ObjectId(writing_id)})
+    writing_data = await atlas_client.find("writing_design", filter={"_id": ObjectId(writing_id)})
 
     if not writing_data:
         return "Writing not found"
@@ -580,7 +352,7 @@ async def update_writing_tags(writing_id, tags):
     }
 
     # Perform the update operation
-    update_response = atlas_client.update(
+    update_response = await atlas_client.update(
         "writing_design",  # Collection name
         filter = {"_id": ObjectId(writing_id)},  # Identify the correct lab
         update = update_payload
@@ -605,17 +377,16 @@ async def convert_to_pdf(writing_id, markdown, template_name):
     s3_file_manager = S3FileManager()
     await s3_file_manager.upload_file(output_path, key)
 
-    key = quote(key)
 
     # store the filepath in mongodb
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
 
-    atlas_client.update(
+    await atlas_client.update(
         collection_name="writing_design",
         filter={"_id": ObjectId(writing_id)},
         update={
             "$set": {
-                "pre_processed_deliverable": f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+                "pre_processed_deliverable": get_public_url(key)
             }
         }
     )
@@ -624,17 +395,16 @@ async def convert_to_pdf(writing_id, markdown, template_name):
     os.remove(output_path)
 
     # return file url in s3
-    return f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+    return get_public_url(key)
 
 async def add_resources_to_writing(writing_id, resource_type, resource_name, resource_description, resource_file):
     s3_file_manager = S3FileManager()
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     resource_id = ObjectId()
     key = f"qu-writing-design/{writing_id}/resources/{resource_id}.{resource_file.filename.split('.')[-1]}"
     await s3_file_manager.upload_file_from_frontend(file = resource_file, key = key)
 
-    key = quote(key)
-    resource_link = f"https://qucoursify.s3.us-east-1.amazonaws.com/{key}"
+    resource_link = get_public_url(key)
     resource = {
         "resource_id": resource_id,
         "resource_type": resource_type,
@@ -643,7 +413,7 @@ async def add_resources_to_writing(writing_id, resource_type, resource_name, res
         "resource_link": resource_link
     }
 
-    atlas_client.update(
+    await atlas_client.update(
         collection_name="writing_design",
         filter={"_id": ObjectId(writing_id)},
         update={
@@ -653,13 +423,13 @@ async def add_resources_to_writing(writing_id, resource_type, resource_name, res
         }
     )
 
-    return _convert_object_ids_to_strings(resource)
+    return resource
 
 async def save_writing(writing_id, writing_outline, message, resources):
     resources = json.loads(resources)
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     
-    writing = atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
+    writing = await atlas_client.find(collection_name="writing_design", filter={"_id": ObjectId(writing_id)})
     if not writing:
         return False
     writing = writing[0]
@@ -682,7 +452,7 @@ async def save_writing(writing_id, writing_outline, message, resources):
                 "feedback": message,
                 "resources": resources
             }
-    atlas_client.update(
+    await atlas_client.update(
         collection_name="writing_design",
         filter={"_id": ObjectId(writing_id)},
         update={
@@ -691,7 +461,7 @@ async def save_writing(writing_id, writing_outline, message, resources):
             }
         }
     )
-    atlas_client.update(
+    await atlas_client.update(
         collection_name="writing_design",
         filter={"_id": ObjectId(writing_id)},
         update={
@@ -704,9 +474,9 @@ async def save_writing(writing_id, writing_outline, message, resources):
     return True
 
 async def create_rewriting_project(writing_name, writing_description):
-    atlas_client = AtlasClient()
+    atlas_client = AsyncAtlasClient()
     project_id = ObjectId()
-    atlas_client.insert(
+    await atlas_client.insert(
         collection_name="writing_design",
         document={
             "project_id": project_id,
@@ -718,18 +488,16 @@ async def create_rewriting_project(writing_name, writing_description):
     )
     return project_id
 
-async def rewrite_writing(writing_input):
+async def rewrite_writing(writing_input, use_cache=True):
     llm = LLM()
 
-    prompt = _get_prompt("REWRITE_PROMPT")
-
-    prompt = PromptTemplate(template=prompt, input_variables=["WRITING_INPUT", "USER_INSTRUCTIONS"])
+    prompt = prompt_registry.template("REWRITE_PROMPT")
 
     user_instructions = "Add the definition of cryptocurrency and the reference for the definition."
 
     inputs = {"WRITING_INPUT": writing_input, "USER_INSTRUCTIONS": user_instructions}
 
-    response = llm.get_response(prompt, inputs)
+    response = await llm.aget_response(prompt, inputs, use_cache=use_cache, cache_ttl=get_cache_ttl("REWRITE_PROMPT"))
 
     response = response.replace('```', '')
 
@@ -737,8 +505,8 @@ async def rewrite_writing(writing_input):
 
 async def delete_resources_from_writing(writing_id, resource_id):
 
-    atlas_client = AtlasClient()
-    writing = atlas_client.find("writing_design", filter={
+    atlas_client = AsyncAtlasClient()
+    writing = await atlas_client.find("writing_design", filter={
                                "_id": ObjectId(writing_id)})
 
     if not writing:
@@ -751,9 +519,7 @@ async def delete_resources_from_writing(writing_id, resource_id):
             resources.remove(resource)
             break
 
-    atlas_client.update("writing_design", filter={"_id": ObjectId(writing_id)}, update={"$set": {"all_resources": resources}})
-
-    writing = _convert_object_ids_to_strings(writing)
+    await atlas_client.update("writing_design", filter={"_id": ObjectId(writing_id)}, update={"$set": {"all_resources": resources}})
 
     return writing
 
@@ -0,0 +1,79 @@
+import asyncio
+import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.utils import assistants
+from app.utils.assistants import FILES_COLLECTION, VECTOR_STORES_COLLECTION, AssistantSession
+
+
+def _atlas_client(files, vector_stores):
+    claimed = set()
+
+    async def find(collection_name, filter, projection=None):
+        if collection_name == VECTOR_STORES_COLLECTION:
+            return vector_stores
+        cutoff = filter["last_used_at"]["$lt"]
+        return [record for record in files if record["last_used_at"] < cutoff]
+
+    async def find_one_and_delete(collection_name, filter):
+        if filter["_id"] in claimed:
+            return None
+        claimed.add(filter["_id"])
+        return {"_id": filter["_id"]}
+
+    atlas_client = MagicMock()
+    atlas_client.find = AsyncMock(side_effect=find)
+    atlas_client.find_one_and_delete = AsyncMock(side_effect=find_one_and_delete)
+    return atlas_client
+
+
+def test_expire_files_deletes_unused_files_not_held_by_a_live_vector_store():
+    old = datetime.datetime.utcnow() - datetime.timedelta(days=30)
+    files = [
+        {"_id": "a", "file_id": "file-a", "last_used_at": old},
+        {"_id": "b", "file_id": "file-b", "last_used_at": old},
+        {"_id": "c", "file_id": "file-c", "last_used_at": datetime.datetime.utcnow()},
+    ]
+    atlas_client = _atlas_client(files, [{"file_ids": ["file-b"]}])
+    openai_client = MagicMock()
+    openai_client.files.delete = AsyncMock()
+
+    with patch.object(assistants, "AsyncAtlasClient", return_value=atlas_client), \
+            patch.object(assistants, "get_async_openai_client", return_value=openai_client):
+        assert asyncio.run(AssistantSession().expire_files(max_age_days=7)) == 1
+
+    openai_client.files.delete.assert_awaited_once_with("file-a")
+    claim = atlas_client.find_one_and_delete.await_args
+    assert claim.args[0] == FILES_COLLECTION
+    assert claim.args[1]["file_id"] == "file-a"
+
+
+def test_expire_files_skips_files_claimed_by_another_worker():
+    old = datetime.datetime.utcnow() - datetime.timedelta(days=30)
+    atlas_client = _atlas_client([{"_id": "a", "file_id": "file-a", "last_used_at": old}], [])
+    atlas_client.find_one_and_delete = AsyncMock(return_value=None)
+    openai_client = MagicMock()
+    openai_client.files.delete = AsyncMock()
+
+    with patch.object(assistants, "AsyncAtlasClient", return_value=atlas_client), \
+            patch.object(assistants, "get_async_openai_client", return_value=openai_client):
+        assert asyncio.run(AssistantSession().expire_files(max_age_days=7)) == 0
+
+    openai_client.files.delete.assert_not_awaited()
+
+
+def test_s3_file_found_by_its_etag_is_marked_used():
+    atlas_client = MagicMock()
+    atlas_client.find_one_and_update = AsyncMock(return_value={"_id": "sha", "file_id": "file-a"})
+    s3_file_manager = MagicMock(bucket_name="bucket")
+    s3_file_manager.ahead_object = AsyncMock(return_value={"ETag": '"etag"'})
+
+    with patch.object(assistants, "AsyncAtlasClient", return_value=atlas_client), \
+            patch.object(assistants, "S3FileManager", return_value=s3_file_manager):
+        result = asyncio.run(AssistantSession()._s3_file_id(assistants.S3Resource("docs/a.pdf")))
+
+    assert result == ("sha", "file-a")
+    filter, update = atlas_client.find_one_and_update.await_args.args[1:]
+    assert filter == {"aliases": "s3:bucket/docs/a.pdf:etag"}
+    assert "last_used_at" in update["$set"]
+    s3_file_manager.adownload_file_to_spool.assert_not_called()
@@ -0,0 +1,87 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from app.utils.atlas_client import AsyncAtlasClient
+
+
+def _client(anchor=None):
+    client = AsyncAtlasClient.__new__(AsyncAtlasClient)
+    client.find = AsyncMock(return_value=[])
+    client.find_one = AsyncMock(return_value=anchor)
+    return client
+
+
+def test_find_page_without_anchor_sorts_by_id():
+    client = _client()
+    asyncio.run(client.find_page("course_design", {"users": "alice"}, limit=10))
+
+    client.find.assert_awaited_once_with("course_design", {"users": "alice"}, limit=10, projection=None,
+                                         sort=[("_id", ASCENDING)])
+    client.find_one.assert_not_awaited()
+
+
+def test_find_page_after_id_descending():
+    after_id = ObjectId()
+    client = _client()
+    asyncio.run(client.find_page("course_design", {"users": "alice"}, after_id=str(after_id), sort_order="desc"))
+
+    query = client.find.await_args.args[1]
+    assert query == {"$and": [{"users": "alice"}, {"_id": {"$lt": after_id}}]}
+    assert client.find.await_args.kwargs["sort"] == [("_id", DESCENDING)]
+
+
+def test_find_page_other_field_breaks_ties_by_id():
+    after_id = ObjectId()
+    client = _client(anchor={"_id": after_id, "course_name": "b"})
+    asyncio.run(client.find_page("course_design", {"users": "alice"}, after_id=str(after_id), sort_by="course_name"))
+
+    query = client.find.await_args.args[1]
+    assert query == {"$and": [{"users": "alice"}, {"$or": [
+        {"course_name": {"$gt": "b"}},
+        {"course_name": "b", "_id": {"$gt": after_id}},
+    ]}]}
+    assert client.find.await_args.kwargs["sort"] == [("course_name", ASCENDING), ("_id", ASCENDING)]
+
+
+def test_find_page_missing_anchor_is_rejected():
+    client = _client(anchor=None)
+    with pytest.raises(ValueError, match="Unknown after_id"):
+        asyncio.run(client.find_page("course_design", {"users": "alice"}, after_id=str(ObjectId()),
+                                     sort_by="course_name"))
+    client.find.assert_not_awaited()
+
+
+@pytest.mark.parametrize("kwargs", [{"after_id": "not-an-id"}, {"sort_order": "sideways"}, {"sort_order": -1}])
+def test_find_page_rejects_bad_arguments(kwargs):
+    client = _client()
+    with pytest.raises(ValueError):
+        asyncio.run(client.find_page("course_design", {"users": "alice"}, **kwargs))
+    client.find.assert_not_awaited()
+
+
+def test_find_many_by_ids_keeps_request_order_and_reports_missing():
+    first, second, missing = ObjectId(), ObjectId(), ObjectId()
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[{"_id": second}, {"_id": first}])
+    collection = MagicMock()
+    collection.find.return_value = cursor
+    client = AsyncAtlasClient.__new__(AsyncAtlasClient)
+    client.database = {"model_projects": collection}
+
+    items, not_found = asyncio.run(client.find_many_by_ids("model_projects", [str(first), missing, second, first]))
+
+    assert [item["_id"] for item in items] == [first, second, first]
+    assert not_found == [missing]
+    collection.find.assert_called_once_with({"_id": {"$in": [first, missing, second]}}, projection=None)
+
+
+def test_find_many_by_ids_without_ids_skips_the_query():
+    client = AsyncAtlasClient.__new__(AsyncAtlasClient)
+    client.database = MagicMock()
+
+    assert asyncio.run(client.find_many_by_ids("model_projects", [])) == ([], [])
+    client.database.__getitem__.assert_not_called()
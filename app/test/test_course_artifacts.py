@@ -0,0 +1,81 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bson.objectid import ObjectId
+
+from app.services import course_design_services
+from app.services.course_design_services import ARTIFACT_PROJECTIONS, _hydrate_artifacts, add_artifact_to_course
+
+
+def _atlas_client(documents):
+    async def find(collection_name, filter, projection=None):
+        ids = filter["_id"]["$in"]
+        return [document for document in documents.get(collection_name, []) if document["_id"] in ids]
+
+    atlas_client = MagicMock()
+    atlas_client.find = AsyncMock(side_effect=find)
+    return atlas_client
+
+
+def test_hydrate_artifacts_queries_each_collection_once():
+    lab_ids = [ObjectId(), ObjectId()]
+    writing_id = ObjectId()
+    atlas_client = _atlas_client({
+        "lab_design": [{"_id": lab_id} for lab_id in lab_ids],
+        "writing_design": [{"_id": writing_id}],
+    })
+    artifacts = [
+        {"artifact_type": "Lab", "artifact_id": str(lab_ids[0])},
+        {"artifact_type": "Writing", "artifact_id": str(writing_id)},
+        {"artifact_type": "Lab", "artifact_id": str(lab_ids[1])},
+    ]
+
+    hydrated = asyncio.run(_hydrate_artifacts(atlas_client, artifacts))
+
+    assert [document["_id"] for document in hydrated] == [lab_ids[0], writing_id, lab_ids[1]]
+    calls = {call.args[0]: call.kwargs for call in atlas_client.find.await_args_list}
+    assert set(calls) == {"lab_design", "writing_design"}
+    assert calls["lab_design"]["filter"] == {"_id": {"$in": lab_ids}}
+    assert calls["lab_design"]["projection"] == ARTIFACT_PROJECTIONS["lab_design"]
+
+
+def test_hydrate_artifacts_skips_deleted_documents():
+    podcast_id = ObjectId()
+    atlas_client = _atlas_client({"podcast_design": [{"_id": podcast_id}]})
+    artifacts = [
+        {"artifact_type": "Podcast", "artifact_id": str(ObjectId())},
+        {"artifact_type": "Podcast", "artifact_id": str(podcast_id)},
+    ]
+
+    hydrated = asyncio.run(_hydrate_artifacts(atlas_client, artifacts))
+
+    assert [document["_id"] for document in hydrated] == [podcast_id]
+
+
+def test_hydrate_artifacts_without_references_makes_no_queries():
+    atlas_client = _atlas_client({})
+
+    assert asyncio.run(_hydrate_artifacts(atlas_client, [])) == []
+    atlas_client.find.assert_not_awaited()
+
+
+def test_add_artifact_pushes_the_reference():
+    course_id = ObjectId()
+    atlas_client = MagicMock()
+    atlas_client.find_one_and_update = AsyncMock(return_value={"_id": course_id})
+    get_course = AsyncMock(return_value={"_id": course_id, "additional_artifacts": []})
+
+    with patch.object(course_design_services, "AsyncAtlasClient", return_value=atlas_client), \
+            patch.object(course_design_services, "get_course", get_course):
+        assert asyncio.run(add_artifact_to_course(str(course_id), "Lab", "lab-id"))["_id"] == course_id
+
+    update = atlas_client.find_one_and_update.await_args.kwargs["update"]
+    assert update == {"$push": {"additional_artifacts": {"artifact_type": "Lab", "artifact_id": "lab-id"}}}
+
+
+def test_add_artifact_to_a_missing_course():
+    atlas_client = MagicMock()
+    atlas_client.find_one_and_update = AsyncMock(return_value=None)
+
+    with patch.object(course_design_services, "AsyncAtlasClient", return_value=atlas_client):
+        assert asyncio.run(add_artifact_to_course(str(ObjectId()), "Lab", "lab-id")) == "Course not found"
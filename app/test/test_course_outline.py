@@ -0,0 +1,19 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.services import course_design_services
+from app.services.course_design_services import generate_course_outline
+
+
+def test_course_outline_assistant_instructions_do_not_change_per_request():
+    run = AsyncMock(return_value="# Module 1")
+
+    with patch.object(course_design_services.assistant_session, "run", run):
+        asyncio.run(generate_course_outline([], "Five modules.", "Outline a course on credit risk.", False))
+        asyncio.run(generate_course_outline([], "Three modules.", "Outline a course on options.", False))
+
+    first, second = (call.kwargs for call in run.await_args_list)
+    assert first["instructions"] == second["instructions"]
+    assert "{INSTRUCTIONS}" not in first["instructions"]
+    assert first["message"].startswith("Outline a course on credit risk.")
+    assert first["message"].endswith("Five modules.")
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock
+
+from pymongo.errors import OperationFailure
+
+from app.utils.indexes import INDEX_REGISTRY, apply_indexes, report_indexes
+
+
+def _atlas_client(collections, stats=()):
+    atlas_client = MagicMock()
+    atlas_client.get_collection.side_effect = lambda name: collections[name]
+    atlas_client.aggregate.return_value = list(stats)
+    return atlas_client
+
+
+def test_registry_indexes_the_user_filtered_lists():
+    for collection_name in ("course_design", "lab_design", "podcast_design", "writing_design", "model_projects"):
+        assert {"keys": [("users", 1), ("_id", 1)]} in INDEX_REGISTRY[collection_name]
+
+
+def test_apply_indexes_passes_options_and_skips_failures():
+    good, bad = MagicMock(), MagicMock()
+    good.create_index.return_value = "users_1__id_1"
+    bad.create_index.side_effect = OperationFailure("conflicting index")
+    registry = {
+        "good": [{"keys": [("users", 1), ("_id", 1)]}],
+        "bad": [{"keys": [("expires_at", 1)], "expireAfterSeconds": 0}],
+    }
+
+    applied = apply_indexes(_atlas_client({"good": good, "bad": bad}), registry)
+
+    assert applied == {"good": ["users_1__id_1"]}
+    bad.create_index.assert_called_once_with([("expires_at", 1)], expireAfterSeconds=0)
+
+
+def test_report_indexes_lists_missing_unused_and_unregistered():
+    collection = MagicMock()
+    collection.list_indexes.return_value = [{"name": "_id_"}, {"name": "users_1__id_1"}, {"name": "legacy_1"}]
+    stats = [
+        {"name": "_id_", "accesses": {"ops": 0}},
+        {"name": "users_1__id_1", "accesses": {"ops": 12}},
+        {"name": "legacy_1", "accesses": {"ops": 0}},
+    ]
+    registry = {"courses": [{"keys": [("users", 1), ("_id", 1)]}, {"keys": [("course_id", 1)]}]}
+
+    report = report_indexes(_atlas_client({"courses": collection}, stats), registry)
+
+    assert report == {"courses": {"missing": ["course_id_1"], "unused": ["legacy_1"], "unregistered": ["legacy_1"]}}
@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.utils import jobs
+from app.utils.jobs import COMPLETED, FAILED, QUEUED, RUNNING, JobQueue
+
+
+class _Jobs:
+    """In-memory stand-in for the MongoDB jobs collection."""
+
+    def __init__(self):
+        self.documents = {}
+
+    async def update(self, collection_name, filter, update, upsert=False):
+        self.documents[filter["_id"]] = dict(update["$set"])
+        return True
+
+    async def find_one(self, collection_name, filter, projection=None):
+        document = self.documents.get(filter["_id"])
+        if document is None:
+            return None
+        return {key: value for key, value in document.items() if key != "expires_at"}
+
+
+@pytest.fixture
+def published():
+    states = []
+    redis_client = MagicMock()
+    redis_client.publish.side_effect = lambda channel, payload: states.append(jobs.json.loads(payload)["state"])
+    store = _Jobs()
+    with patch.object(jobs, "AsyncAtlasClient", return_value=store), patch.object(jobs, "redis_client", redis_client):
+        yield states
+
+
+async def _finish(queue, func, *args):
+    job = await queue.enqueue(func, *args, username="alice")
+    while (await queue.get(job["job_id"]))["status"] not in (COMPLETED, FAILED):
+        await asyncio.sleep(0)
+    result = await queue.get(job["job_id"])
+    await queue.stop()
+    return result
+
+
+async def _double(value):
+    return value * 2
+
+
+async def _broken():
+    raise KeyError("choices")
+
+
+def test_job_runs_through_queued_running_completed(published):
+    job = asyncio.run(_finish(JobQueue(redis_url="", concurrency=1), _double, 21))
+
+    assert job["status"] == COMPLETED
+    assert job["result"] == 42
+    assert published == [QUEUED, RUNNING, COMPLETED]
+
+
+def test_failed_job_hides_the_error(published):
+    job = asyncio.run(_finish(JobQueue(redis_url="", concurrency=1), _broken))
+
+    assert job["status"] == FAILED
+    assert job["error"] == "Something went wrong. Please try again later."
+    assert published == [QUEUED, RUNNING, FAILED]
+
+
+def test_worker_keeps_going_when_a_job_cannot_be_run(published):
+    async def scenario():
+        queue = JobQueue(redis_url="", concurrency=1)
+        run = queue._run
+        calls = []
+
+        async def flaky_run(*args):
+            calls.append(args[0])
+            if len(calls) == 1:
+                raise ConnectionError("MongoDB is down")
+            await run(*args)
+
+        queue._run = flaky_run
+        await queue.enqueue(_double, 1)
+        return await _finish(queue, _double, 2)
+
+    assert asyncio.run(scenario())["result"] == 4
+
+
+def test_local_and_redis_workers_are_sized_separately():
+    async def scenario():
+        queue = JobQueue(redis_url="redis://localhost:6379/0", concurrency=3, redis_concurrency=1)
+        with patch.object(queue, "_local_worker", side_effect=lambda: asyncio.sleep(3600)) as local, \
+                patch.object(queue, "_redis_worker", side_effect=lambda: asyncio.sleep(3600)) as remote:
+            await queue.start()
+            counts = local.call_count, remote.call_count
+        for worker in queue._workers:
+            worker.cancel()
+        await asyncio.gather(*queue._workers, return_exceptions=True)
+        return counts
+
+    assert asyncio.run(scenario()) == (3, 1)
@@ -0,0 +1,36 @@
+from typing import List
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from app.utils.json_repair import parse_structured, repair_json
+
+
+class _Module(BaseModel):
+    name: str
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"name": "Intro"}', {"name": "Intro"}),
+    ('```json\n{"name": "Intro"}\n```', {"name": "Intro"}),
+    ('Here is the outline:\n[{"name": "Intro"}]\nLet me know!', [{"name": "Intro"}]),
+    ('json {"name": "Intro"}', {"name": "Intro"}),
+    ('{"names": ["Intro", "Basics",],}', {"names": ["Intro", "Basics"]}),
+    ('{“name”: “Intro”}', {"name": "Intro"}),
+    ("{'name': 'Intro', 'done': True, 'notes': None}", {"name": "Intro", "done": True, "notes": None}),
+])
+def test_repair_json(text, expected):
+    assert repair_json(text) == expected
+
+
+def test_repair_json_gives_up_on_prose():
+    with pytest.raises(ValueError):
+        repair_json("I could not write the outline.")
+
+
+def test_parse_structured_validates_the_schema():
+    modules = parse_structured('```json\n[{"name": "Intro"}, {"name": "Basics"}]\n```', List[_Module])
+    assert [module.name for module in modules] == ["Intro", "Basics"]
+
+    with pytest.raises(ValidationError):
+        parse_structured('[{"title": "Intro"}]', List[_Module])
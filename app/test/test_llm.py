@@ -0,0 +1,185 @@
+import asyncio
+from typing import List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import openai
+import pytest
+from pydantic import BaseModel
+
+from app.utils import llm
+from app.utils.llm import CircuitBreaker, CircuitOpenError, LLMResponseCache, _call_provider, get_parsed_response
+
+
+class _Outline(BaseModel):
+    title: str
+
+
+class _Module(BaseModel):
+    name: str
+
+
+def _key(**kwargs):
+    options = {"provider": "chatgpt", "model": "gpt-4o", "prompt_text": "Outline a course", "temperature": 0.2}
+    options.update(kwargs)
+    return LLMResponseCache.key(**options)
+
+
+def test_cache_key_is_stable():
+    assert _key() == _key()
+    assert _key(response_schema=_Outline) == _key(response_schema=_Outline)
+
+
+def test_cache_key_depends_on_the_generation_settings():
+    keys = {
+        _key(),
+        _key(provider="gemini"),
+        _key(model="gpt-4o-mini"),
+        _key(prompt_text="Outline a lab"),
+        _key(temperature=0.7),
+    }
+    assert len(keys) == 5
+
+
+def test_cache_key_separates_structured_and_free_form_responses():
+    keys = {_key(), _key(response_schema=_Outline), _key(response_schema=_Module),
+            _key(response_schema=List[_Outline])}
+    assert len(keys) == 4
+
+
+def _server_error():
+    response = httpx.Response(500, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return openai.InternalServerError("oops", response=response, body=None)
+
+
+def _open_breaker(cooldown=60):
+    breaker = CircuitBreaker("chatgpt", failure_threshold=2)
+    breaker.cooldown = cooldown
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+@pytest.fixture
+def breaker():
+    breaker = _open_breaker(cooldown=60)
+    with patch.object(llm, "get_circuit_breaker", return_value=breaker), patch.object(llm, "LLM"):
+        yield breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("chatgpt", failure_threshold=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.allow() == (True, False)
+
+    breaker.record_failure()
+    assert breaker.allow() == (False, False)
+    assert not breaker.available()
+
+
+def test_breaker_lets_one_probe_through_after_the_cooldown():
+    breaker = _open_breaker(cooldown=0)
+
+    assert breaker.allow() == (True, True)
+    assert breaker.allow() == (False, False)
+
+    breaker.record_success()
+    assert breaker.allow() == (True, False)
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = _open_breaker(cooldown=0)
+    breaker.allow()
+    breaker.cooldown = 60
+
+    breaker.record_failure()
+    assert not breaker.probing
+    assert breaker.allow() == (False, False)
+
+
+def test_call_provider_skips_an_open_circuit(breaker):
+    async def call(model, **options):
+        return "ok"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(_call_provider(call, "chatgpt"))
+
+
+def test_forced_call_does_not_end_the_probe(breaker):
+    breaker.probing = True
+
+    async def call(model, **options):
+        raise ValueError("not json")
+
+    with pytest.raises(ValueError):
+        asyncio.run(_call_provider(call, "chatgpt", force=True))
+    assert breaker.probing
+
+
+def test_probe_without_a_health_verdict_frees_the_probe(breaker):
+    breaker.cooldown = 0
+
+    async def call(model, **options):
+        raise ValueError("not json")
+
+    with pytest.raises(ValueError):
+        asyncio.run(_call_provider(call, "chatgpt"))
+    assert not breaker.probing
+    assert breaker.allow() == (True, True)
+
+
+def test_call_provider_records_health_errors(breaker):
+    breaker.cooldown = 0
+
+    async def call(model, on_error, **options):
+        on_error(_server_error())
+        raise _server_error()
+
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(_call_provider(call, "chatgpt"))
+    assert breaker.failures == 3
+    assert not breaker.probing
+
+
+def _llm(*responses):
+    model = MagicMock(llm_type="chatgpt")
+    model.aget_response = AsyncMock(side_effect=list(responses))
+    return model
+
+
+def test_get_parsed_response_retries_responses_that_do_not_parse():
+    model = _llm("Sorry, here it is:", '```json\n[{"title": "Intro"}]\n```')
+
+    async def call_with_providers(call, primary=None, strategy=None):
+        return await call(primary, attempts=3, deadline=10, base_delay=0)
+
+    with patch.object(llm, "call_with_providers", call_with_providers):
+        response = asyncio.run(get_parsed_response(model, "prompt", {}, output_type="list"))
+
+    assert response == [{"title": "Intro"}]
+    assert model.aget_response.await_count == 2
+    assert model.aget_response.await_args.kwargs["response_schema"] is None
+
+
+def test_get_parsed_response_streams_sequentially():
+    strategies = []
+
+    async def call_with_providers(call, primary=None, strategy=None):
+        strategies.append(strategy)
+        return await call(primary)
+
+    with patch.object(llm, "call_with_providers", call_with_providers):
+        asyncio.run(get_parsed_response(_llm("text"), "prompt", {}, output_type="str", strategy="hedged"))
+        asyncio.run(get_parsed_response(_llm("text"), "prompt", {}, output_type="str", strategy="hedged",
+                                        on_delta=print))
+
+    assert strategies == ["hedged", "sequential"]
+
+
+def test_get_parsed_response_hides_provider_errors():
+    async def call_with_providers(call, primary=None, strategy=None):
+        raise _server_error()
+
+    with patch.object(llm, "call_with_providers", call_with_providers):
+        with pytest.raises(Exception, match="Something went wrong"):
+            asyncio.run(get_parsed_response(_llm(), "prompt", {}))
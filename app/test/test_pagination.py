@@ -0,0 +1,50 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import pagination
+from app.utils.pagination import find_page_or_400
+
+
+def _atlas_client(**kwargs):
+    atlas_client = MagicMock()
+    atlas_client.find_page = AsyncMock(**kwargs)
+    return atlas_client
+
+
+def test_find_page_or_400_passes_the_paging_arguments_on():
+    atlas_client = _atlas_client(return_value=[{"_id": 1}])
+
+    with patch.object(pagination, "AsyncAtlasClient", return_value=atlas_client):
+        page = asyncio.run(find_page_or_400("lab_design", {"_id", "lab_name"}, {"users": "alice"},
+                                            projection={"name": 1}, limit=5, after_id="a", sort_by="lab_name",
+                                            sort_order="desc"))
+
+    assert page == [{"_id": 1}]
+    atlas_client.find_page.assert_awaited_once_with("lab_design", filter={"users": "alice"}, projection={"name": 1},
+                                                    limit=5, after_id="a", sort_by="lab_name", sort_order="desc")
+
+
+def test_find_page_or_400_rejects_unlisted_sort_fields():
+    atlas_client = _atlas_client()
+
+    with patch.object(pagination, "AsyncAtlasClient", return_value=atlas_client):
+        with pytest.raises(HTTPException) as raised:
+            asyncio.run(find_page_or_400("lab_design", {"_id"}, {}, sort_by="users", noun="labs"))
+
+    assert raised.value.status_code == 400
+    assert raised.value.detail == "Cannot sort labs by users"
+    atlas_client.find_page.assert_not_awaited()
+
+
+def test_find_page_or_400_turns_find_page_errors_into_400():
+    atlas_client = _atlas_client(side_effect=ValueError("Invalid after_id nope"))
+
+    with patch.object(pagination, "AsyncAtlasClient", return_value=atlas_client):
+        with pytest.raises(HTTPException) as raised:
+            asyncio.run(find_page_or_400("lab_design", {"_id"}, {}, after_id="nope"))
+
+    assert raised.value.status_code == 400
+    assert raised.value.detail == "Invalid after_id nope"
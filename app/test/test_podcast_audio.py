@@ -0,0 +1,55 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import podcast_design_services
+from app.services.podcast_design_services import generate_audio_for_podcast
+from app.utils import llm
+
+
+class _Speech:
+    """Streams the line back as audio, counting the requests in flight."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    def create(self, model, voice, input):
+        speech = self
+
+        class _Response:
+            async def __aenter__(self):
+                speech.in_flight += 1
+                speech.peak = max(speech.peak, speech.in_flight)
+                await asyncio.sleep(0.01)
+                return self
+
+            async def __aexit__(self, *exc_info):
+                speech.in_flight -= 1
+
+            async def iter_bytes(self):
+                yield input.encode("utf-8")
+
+        return _Response()
+
+
+def test_podcast_audio_keeps_the_transcript_order_within_the_openai_slots():
+    speech = _Speech()
+    openai_client = MagicMock()
+    openai_client.audio.speech.with_streaming_response = speech
+    s3_file_manager = MagicMock()
+    s3_file_manager.save_mp3_and_upload = AsyncMock()
+    transcript = "\n".join(f"line {index}" for index in range(10))
+
+    async def generate():
+        with patch.dict(llm._async_slots, {"openai": asyncio.Semaphore(3)}):
+            return await generate_audio_for_podcast(transcript, "podcast")
+
+    with patch.object(podcast_design_services, "get_async_openai_client", return_value=openai_client), \
+            patch.object(podcast_design_services, "S3FileManager", return_value=s3_file_manager), \
+            patch.object(podcast_design_services, "get_public_url", return_value="https://example.com/audio.mp3"):
+        link, _ = asyncio.run(generate())
+
+    assert link == "https://example.com/audio.mp3"
+    assert speech.peak == 3
+    audio = s3_file_manager.save_mp3_and_upload.await_args.args[0]
+    assert audio == "".join(f"line {index}" for index in range(10)).encode("utf-8")
@@ -0,0 +1,41 @@
+import json
+import os
+
+import pytest
+
+from app.utils.prompts import PromptRegistry
+
+
+def _write(path, content, mtime):
+    path.write_text(content)
+    os.utime(path, (mtime, mtime))
+
+
+def test_registry_picks_up_edits(tmp_path):
+    prompts_file = tmp_path / "prompts.json"
+    _write(prompts_file, json.dumps({"GREETING": "Hello {name}"}), 1000)
+    registry = PromptRegistry(str(prompts_file), reload_interval=0)
+
+    assert registry.get("GREETING") == "Hello {name}"
+
+    _write(prompts_file, json.dumps({"GREETING": "Hi {name}"}), 2000)
+    assert registry.get("GREETING") == "Hi {name}"
+    assert registry.template("GREETING").format(name="Ada") == "Hi Ada"
+
+
+def test_registry_keeps_prompts_when_the_file_is_mid_write(tmp_path):
+    prompts_file = tmp_path / "prompts.json"
+    _write(prompts_file, json.dumps({"GREETING": "Hello"}), 1000)
+    registry = PromptRegistry(str(prompts_file), reload_interval=0)
+    assert registry.get("GREETING") == "Hello"
+
+    _write(prompts_file, '{"GREETING": "Hel', 2000)
+    assert registry.get("GREETING") == "Hello"
+
+    # The explicit reload reports the error instead
+    with pytest.raises(ValueError):
+        registry.reload()
+    assert registry.get("GREETING") == "Hello"
+
+    _write(prompts_file, json.dumps({"GREETING": "Hello again"}), 3000)
+    assert registry.get("GREETING") == "Hello again"
@@ -0,0 +1,93 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+import openai
+import pytest
+
+from app.utils import retry
+from app.utils.retry import (AUTH, PARSE, RATE_LIMIT, SERVER, TIMEOUT, UNKNOWN, RetryError, backoff_delay,
+                             classify_error, retry_async)
+
+
+def _response(status_code):
+    return httpx.Response(status_code, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+class _Flaky:
+    """Fails with the given errors, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    async def sleep(delay):
+        pass
+
+    with patch.object(retry.asyncio, "sleep", sleep):
+        yield
+
+
+@pytest.mark.parametrize("error, error_class", [
+    (openai.RateLimitError("slow down", response=_response(429), body=None), RATE_LIMIT),
+    (openai.AuthenticationError("bad key", response=_response(401), body=None), AUTH),
+    (openai.InternalServerError("oops", response=_response(500), body=None), SERVER),
+    (asyncio.TimeoutError(), TIMEOUT),
+    (json.JSONDecodeError("Expecting value", "", 0), PARSE),
+    (KeyError("choices"), UNKNOWN),
+])
+def test_classify_error(error, error_class):
+    assert classify_error(error) == error_class
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(1, 20):
+        assert 0 <= backoff_delay(attempt, base_delay=1, max_delay=5) <= 5
+
+
+def test_retry_async_retries_until_success():
+    func = _Flaky(ValueError("not json"), asyncio.TimeoutError())
+    errors = []
+
+    assert asyncio.run(retry_async(func, name="test", attempts=3, deadline=10, on_error=errors.append)) == "ok"
+    assert func.calls == 3
+    assert [classify_error(error) for error in errors] == [PARSE, TIMEOUT]
+
+
+def test_retry_async_does_not_retry_auth_errors():
+    func = _Flaky(openai.AuthenticationError("bad key", response=_response(401), body=None))
+
+    with pytest.raises(RetryError) as raised:
+        asyncio.run(retry_async(func, name="test", attempts=5, deadline=10))
+    assert raised.value.error_class == AUTH
+    assert raised.value.attempts == 1
+    assert func.calls == 1
+
+
+def test_retry_async_gives_up_after_the_last_attempt():
+    func = _Flaky(*[ValueError("not json")] * 5)
+
+    with pytest.raises(RetryError) as raised:
+        asyncio.run(retry_async(func, name="test", attempts=2, deadline=10))
+    assert raised.value.attempts == 2
+    assert raised.value.error_class == PARSE
+    assert func.calls == 2
+
+
+def test_retry_async_stops_when_the_backoff_would_pass_the_deadline():
+    func = _Flaky(*[ValueError("not json")] * 5)
+
+    with patch.object(retry, "backoff_delay", return_value=60):
+        with pytest.raises(RetryError, match="ran out of time"):
+            asyncio.run(retry_async(func, name="test", attempts=5, deadline=1))
+    assert func.calls == 1
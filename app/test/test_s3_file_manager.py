@@ -0,0 +1,124 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+
+from app.utils import s3_file_manager as s3_module
+from app.utils.s3_file_manager import S3FileManager
+
+
+def _s3_file_manager(existing, failing=()):
+    """An S3FileManager over a fake bucket holding the existing keys."""
+    objects = set(existing)
+    s3_client = MagicMock()
+
+    def paginate(Bucket, Prefix):
+        yield {"Contents": [{"Key": key} for key in sorted(objects) if key.startswith(Prefix)]}
+
+    def copy_object(Bucket, CopySource, Key, **kwargs):
+        if CopySource["Key"] in failing:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "missing"}}, "CopyObject")
+        objects.add(Key)
+
+    def delete_objects(Bucket, Delete):
+        for item in Delete["Objects"]:
+            objects.discard(item["Key"])
+        return {}
+
+    s3_client.get_paginator.return_value.paginate.side_effect = paginate
+    s3_client.copy_object.side_effect = copy_object
+    s3_client.delete_objects.side_effect = delete_objects
+    s3_file_manager = S3FileManager.__new__(S3FileManager)
+    s3_file_manager.bucket_name = "bucket"
+    s3_file_manager.s3_client = s3_client
+    return s3_file_manager, objects
+
+
+def test_existing_keys_lists_each_folder_once():
+    s3_file_manager, _ = _s3_file_manager({"lab/1/step2/a.md", "lab/1/step2/other.md", "lab/2/step2/c.md"})
+
+    existing = s3_file_manager.existing_keys(["lab/1/step2/a.md", "lab/1/step2/b.md", "lab/2/step2/c.md"])
+
+    assert existing == {"lab/1/step2/a.md", "lab/2/step2/c.md"}
+    prefixes = [call.kwargs["Prefix"] for call in s3_file_manager.s3_client.get_paginator.return_value.paginate.call_args_list]
+    assert sorted(prefixes) == ["lab/1/step2/", "lab/2/step2/"]
+    s3_file_manager.s3_client.head_object.assert_not_called()
+
+
+def test_existing_keys_assumes_unlistable_keys_exist():
+    s3_file_manager, _ = _s3_file_manager(set())
+    s3_file_manager.s3_client.get_paginator.return_value.paginate.side_effect = ClientError(
+        {"Error": {"Code": "AccessDenied", "Message": "denied"}}, "ListObjectsV2")
+
+    assert s3_file_manager.existing_keys(["lab/1/step2/a.md"]) == {"lab/1/step2/a.md"}
+
+
+def test_copy_or_undo_keeps_every_copy_on_success():
+    s3_file_manager, objects = _s3_file_manager({"lab/1/step1/a.md", "lab/1/step1/b.md"})
+    copies = [("lab/1/step1/a.md", "lab/1/step2/a.md"), ("lab/1/step1/b.md", "lab/1/step2/b.md")]
+
+    assert asyncio.run(s3_file_manager.acopy_files_or_undo(copies))
+    assert {"lab/1/step2/a.md", "lab/1/step2/b.md"} <= objects
+
+
+def test_copy_or_undo_deletes_only_the_objects_it_created():
+    s3_file_manager, objects = _s3_file_manager({"lab/1/step1/a.md", "lab/1/step1/b.md", "lab/1/step2/b.md"},
+                                                failing={"lab/1/step1/missing.md"})
+    copies = [
+        ("lab/1/step1/a.md", "lab/1/step2/a.md"),
+        ("lab/1/step1/b.md", "lab/1/step2/b.md"),
+        ("lab/1/step1/missing.md", "lab/1/step2/missing.md"),
+    ]
+
+    assert not asyncio.run(s3_file_manager.acopy_files_or_undo(copies))
+    assert "lab/1/step2/a.md" not in objects
+    assert "lab/1/step2/b.md" in objects
+    deleted = s3_file_manager.s3_client.delete_objects.call_args.kwargs["Delete"]["Objects"]
+    assert deleted == [{"Key": "lab/1/step2/a.md"}]
+
+
+def _downloading(data):
+    s3_file_manager, _ = _s3_file_manager(set())
+    s3_file_manager.s3_client.download_fileobj.side_effect = lambda bucket, key, file_obj: file_obj.write(data)
+    return s3_file_manager
+
+
+def test_download_to_bytes_spills_large_files_to_disk():
+    spools = []
+    spooled = s3_module.tempfile.SpooledTemporaryFile
+
+    def spool(max_size):
+        spools.append(spooled(max_size=max_size))
+        return spools[-1]
+
+    with patch.object(s3_module, "_SPOOL_SIZE", 4), patch.object(s3_module.tempfile, "SpooledTemporaryFile", spool):
+        assert _downloading(b"abc").download_file_to_bytes("a") == b"abc"
+        assert _downloading(b"abcdefgh").download_file_to_bytes("b") == b"abcdefgh"
+
+    assert [spool._rolled for spool in spools] == [False, True]
+    assert all(spool.closed for spool in spools)
+
+
+def test_download_to_bytes_reports_failures():
+    s3_file_manager, _ = _s3_file_manager(set())
+    s3_file_manager.s3_client.download_fileobj.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchKey", "Message": "missing"}}, "GetObject")
+
+    assert s3_file_manager.download_file_to_bytes("missing") is False
+
+
+def test_make_object_public_uses_the_configured_acl():
+    s3_file_manager, _ = _s3_file_manager(set())
+
+    with patch.object(s3_module, "_OBJECT_ACL", "bucket-owner-full-control"):
+        assert s3_file_manager.make_object_public("a")
+    s3_file_manager.s3_client.put_object_acl.assert_called_once_with(
+        ACL="bucket-owner-full-control", Bucket="bucket", Key="a")
+
+
+def test_make_object_public_does_nothing_without_an_acl():
+    s3_file_manager, _ = _s3_file_manager(set())
+
+    with patch.object(s3_module, "_OBJECT_ACL", ""):
+        assert s3_file_manager.make_object_public("a")
+    s3_file_manager.s3_client.put_object_acl.assert_not_called()
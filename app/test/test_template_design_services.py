@@ -0,0 +1,49 @@
+import asyncio
+import shutil
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fitz
+
+from app.services import template_design_services
+from app.services.template_design_services import combine_pdfs
+
+
+def _pdf(path, pages):
+    document = fitz.open()
+    for _ in range(pages):
+        document.new_page()
+    document.save(path)
+    document.close()
+
+
+def test_combine_pdfs_uses_the_async_s3_helpers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _pdf(tmp_path / "one.pdf", 1)
+    _pdf(tmp_path / "two.pdf", 2)
+    sources = {"qu-model-design/reports/one.pdf": tmp_path / "one.pdf",
+               "qu-model-design/reports/two.pdf": tmp_path / "two.pdf"}
+    pages = []
+
+    async def download(key, path):
+        shutil.copy(sources[key], path)
+        return True
+
+    async def upload(path, key):
+        with fitz.open(path) as document:
+            pages.append(document.page_count)
+        return True
+
+    s3_file_manager = MagicMock()
+    s3_file_manager.adownload_file = AsyncMock(side_effect=download)
+    s3_file_manager.async_upload_file = AsyncMock(side_effect=upload)
+    urls = ["https://bucket.s3.amazonaws.com/qu-model-design/reports/one.pdf",
+            "https://bucket.s3.amazonaws.com/qu-model-design/reports/two.pdf"]
+
+    with patch.object(template_design_services, "S3FileManager", return_value=s3_file_manager), \
+            patch.object(template_design_services, "get_public_url", side_effect=lambda key: key):
+        link = asyncio.run(combine_pdfs(urls))
+
+    assert link.startswith("qu-model-design/reports/") and link.endswith("/combined.pdf")
+    assert pages == [3]
+    s3_file_manager.download_file.assert_not_called()
+    s3_file_manager.upload_file_obj.assert_not_called()
@@ -0,0 +1,496 @@
+# External imports
+from collections import Counter, OrderedDict
+from pathlib import Path
+import asyncio
+import datetime
+import hashlib
+import io
+import logging
+import os
+
+from app.utils.atlas_client import AsyncAtlasClient
+from app.utils.llm import async_provider_slot, get_async_openai_client
+from app.utils.s3_file_manager import S3FileManager
+
+
+# Collections mapping file content to the copies uploaded to OpenAI
+FILES_COLLECTION = "openai_files"
+VECTOR_STORES_COLLECTION = "openai_vector_stores"
+
+# Stop reusing vector stores this long before OpenAI would expire them
+_EXPIRY_MARGIN = datetime.timedelta(hours=1)
+
+# Uploaded files unused for this long are deleted from OpenAI
+FILE_TTL_DAYS = float(os.environ.get("OPENAI_FILE_TTL_DAYS", 7))
+FILE_SWEEP_INTERVAL = float(os.environ.get("OPENAI_FILE_SWEEP_INTERVAL", 3600))
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _digest(*parts):
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def _hash_file(file_obj):
+    """
+    Hash a file object chunk by chunk and rewind it
+
+    Args:
+    file_obj: file object - readable, seekable binary file
+
+    Returns:
+    str: the SHA-256 hex digest of the content
+    """
+    hasher = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(_CHUNK_SIZE), b""):
+        hasher.update(chunk)
+    file_obj.seek(0)
+    return hasher.hexdigest()
+
+
+def _open_file(file):
+    """
+    Get a readable file object for a file to upload
+
+    Args:
+    file: UploadFile, path or (filename, content) pair
+
+    Returns:
+    tuple: (filename, file object, whether the caller has to close it)
+    """
+    if isinstance(file, tuple):
+        filename, content = file
+        return filename, io.BytesIO(content), True
+    if isinstance(file, (str, Path)):
+        path = Path(file)
+        return path.name, open(path, "rb"), True
+    return file.filename, file.file, False
+
+
+class S3Resource:
+    """
+    A file stored in S3. It is only downloaded if OpenAI does not have a copy
+    of this version of it yet.
+
+    Attributes:
+    key: str - the key of the object in the bucket
+    filename: str - the name to upload it under, the last part of the key by default
+    """
+
+    def __init__(self, key, filename=None):
+        self.key = key
+        self.filename = filename or key.split("/")[-1]
+
+
+class AssistantSession:
+    """
+    Runs single-turn file_search conversations against OpenAI assistants.
+    Assistants are created once per (name, instructions, model) and reused for
+    the life of the process. Uploaded files and vector stores are recorded in
+    MongoDB by the SHA-256 of their content, so a file OpenAI already has is
+    attached by id instead of being uploaded again, and a vector store with
+    the same files is reused until it expires. Threads are deleted in the
+    background once the answer has been read, and files no request has used
+    for FILE_TTL_DAYS are deleted by a periodic sweep.
+    """
+
+    def __init__(self, max_assistants=None):
+        self.max_assistants = max_assistants or int(os.environ.get("ASSISTANT_CACHE_SIZE", 64))
+        self._assistants = OrderedDict()
+        # Runs in flight per assistant, and evicted assistants to delete
+        # once their last run finishes
+        self._runs = Counter()
+        self._retired = set()
+        self._pending = {}
+        self._tasks = set()
+        self._sweeper = None
+
+    async def _once(self, key, factory):
+        """
+        Run factory once for concurrent callers asking for the same key
+
+        Args:
+        key: tuple - identifies the resource being created
+        factory: callable - the coroutine function creating it
+
+        Returns:
+        object: the result of factory
+        """
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    def _in_background(self, coro):
+        """
+        Schedule a cleanup coroutine without waiting for it
+
+        Args:
+        coro: coroutine - the cleanup to run
+        """
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _delete(self, kind, resource_id):
+        client = get_async_openai_client()
+        try:
+            if kind == "assistant":
+                await client.beta.assistants.delete(resource_id)
+            elif kind == "vector_store":
+                await client.vector_stores.delete(resource_id)
+            elif kind == "file":
+                await client.files.delete(resource_id)
+            else:
+                await client.beta.threads.delete(resource_id)
+        except Exception as e:
+            logging.error(f"Error deleting {kind} {resource_id}: {e}")
+
+    async def get_assistant(self, name, instructions, model=None):
+        """
+        Get the id of an assistant with the given instructions, creating it on
+        first use. The least recently used assistant is evicted once more than
+        max_assistants are cached, and deleted once no run is using it.
+
+        Args:
+        name: str - the name of the assistant
+        instructions: str - the system instructions
+        model: str - the model, OPENAI_MODEL by default
+
+        Returns:
+        str: the assistant id
+        """
+        model = model or os.getenv("OPENAI_MODEL")
+        key = _digest(name, instructions, model)
+        assistant_id = self._assistants.get(key)
+        if assistant_id is not None:
+            self._assistants.move_to_end(key)
+            return assistant_id
+
+        async def create():
+            assistant = await get_async_openai_client().beta.assistants.create(
+                name=name,
+                instructions=instructions,
+                model=model,
+                tools=[{"type": "file_search"}]
+            )
+            self._assistants[key] = assistant.id
+            while len(self._assistants) > self.max_assistants:
+                _, evicted = self._assistants.popitem(last=False)
+                if self._runs[evicted]:
+                    self._retired.add(evicted)
+                else:
+                    self._in_background(self._delete("assistant", evicted))
+            return assistant.id
+
+        return await self._once(("assistant", key), create)
+
+    async def _checkout_assistant(self, name, instructions, model=None):
+        """
+        Get an assistant for a run, keeping it from being deleted until the
+        run releases it
+
+        Args:
+        name: str - the name of the assistant
+        instructions: str - the system instructions
+        model: str - the model, OPENAI_MODEL by default
+
+        Returns:
+        str: the assistant id
+        """
+        while True:
+            assistant_id = await self.get_assistant(name, instructions, model)
+            # It may have been evicted while this call waited for it
+            if assistant_id in self._assistants.values():
+                self._runs[assistant_id] += 1
+                return assistant_id
+
+    def _release_assistant(self, assistant_id):
+        self._runs[assistant_id] -= 1
+        if self._runs[assistant_id] <= 0:
+            del self._runs[assistant_id]
+            if assistant_id in self._retired:
+                self._retired.discard(assistant_id)
+                self._in_background(self._delete("assistant", assistant_id))
+
+    async def _upload(self, filename, file_obj, sha256, alias=None):
+        """
+        Get the OpenAI file id of some content, uploading it if there is none
+
+        Args:
+        filename: str - the name to upload the file under
+        file_obj: file object - the content, rewound
+        sha256: str - the hash of the content
+        alias: str - another key the content can be looked up by
+
+        Returns:
+        tuple: (sha256, file id)
+        """
+        atlas_client = AsyncAtlasClient()
+        record = await atlas_client.find_one(FILES_COLLECTION, {"_id": sha256})
+        if record is None:
+            uploaded = await get_async_openai_client().files.create(file=(filename, file_obj), purpose="assistants")
+            file_id = uploaded.id
+        else:
+            file_id = record["file_id"]
+
+        update = {"$set": {"file_id": file_id, "filename": filename, "last_used_at": datetime.datetime.utcnow()}}
+        if alias:
+            update["$addToSet"] = {"aliases": alias}
+        await atlas_client.update(FILES_COLLECTION, {"_id": sha256}, update, upsert=True)
+        return sha256, file_id
+
+    async def _s3_file_id(self, resource):
+        """
+        Get the OpenAI file id of an S3 object. Objects are recognised by
+        their ETag, so one that was uploaded before is not downloaded again.
+
+        Args:
+        resource: S3Resource - the object
+
+        Returns:
+        tuple: (sha256, file id)
+        """
+        s3_file_manager = S3FileManager()
+        head = await s3_file_manager.ahead_object(resource.key)
+        alias = None
+        if head:
+            etag = head["ETag"].strip('"')
+            alias = f"s3:{s3_file_manager.bucket_name}/{resource.key}:{etag}"
+            # Marked as used like the content-hash path, so the sweep keeps it
+            record = await AsyncAtlasClient().find_one_and_update(
+                FILES_COLLECTION, {"aliases": alias}, {"$set": {"last_used_at": datetime.datetime.utcnow()}})
+            if record is not None:
+                return record["_id"], record["file_id"]
+
+        spool = await s3_file_manager.adownload_file_to_spool(resource.key)
+        if spool is None:
+            raise FileNotFoundError(f"Could not download {resource.key} from S3")
+        with spool:
+            sha256 = await asyncio.to_thread(_hash_file, spool)
+            return await self._upload(resource.filename, spool, sha256, alias)
+
+    async def _file_id(self, file):
+        """
+        Get the OpenAI file id of a file, uploading it only if OpenAI has no
+        file with the same content. The file is hashed in chunks, never read
+        into memory as a whole.
+
+        Args:
+        file: UploadFile, path, (filename, content) pair or S3Resource
+
+        Returns:
+        tuple: (sha256, file id)
+        """
+        if isinstance(file, S3Resource):
+            return await self._s3_file_id(file)
+        filename, file_obj, owned = _open_file(file)
+        try:
+            sha256 = await asyncio.to_thread(_hash_file, file_obj)
+            return await self._upload(filename, file_obj, sha256)
+        finally:
+            if owned:
+                file_obj.close()
+
+    async def get_vector_store(self, files, name="Resources", expires_after_days=1):
+        """
+        Get the id of a vector store holding the given files, creating one
+        only if no live vector store holds the same content
+
+        Args:
+        files: list - UploadFiles, paths, (filename, content) pairs or S3Resources
+        name: str - the name of the vector store
+        expires_after_days: int - days of inactivity before OpenAI expires it
+
+        Returns:
+        str: the vector store id, or None if there are no files
+        """
+        if not files:
+            return None
+
+        atlas_client = AsyncAtlasClient()
+        uploaded = await asyncio.gather(*(self._file_id(file) for file in files))
+        hashes = [sha256 for sha256, _ in uploaded]
+        file_ids = [file_id for _, file_id in uploaded]
+
+        key = _digest(expires_after_days, *sorted(hashes))
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(days=expires_after_days) - _EXPIRY_MARGIN
+        record = await atlas_client.find_one(VECTOR_STORES_COLLECTION, {"_id": key, "expires_at": {"$gt": now}})
+        if record is not None:
+            await atlas_client.update(VECTOR_STORES_COLLECTION, {"_id": key}, {"$set": {"expires_at": expires_at}})
+            return record["vector_store_id"]
+
+        async def create():
+            client = get_async_openai_client()
+            vector_store = await client.vector_stores.create(
+                name=name,
+                expires_after={"days": expires_after_days, "anchor": "last_active_at"},
+            )
+            try:
+                batch = await client.vector_stores.file_batches.create_and_poll(
+                    vector_store_id=vector_store.id, file_ids=file_ids
+                )
+                if batch.file_counts.failed:
+                    raise ValueError(f"{batch.file_counts.failed} files could not be added to vector store {vector_store.id}")
+            except Exception:
+                self._in_background(self._delete("vector_store", vector_store.id))
+                # The files may have been deleted on OpenAI's side; forget
+                # them so the next request uploads them again
+                for sha256 in hashes:
+                    await atlas_client.delete(FILES_COLLECTION, {"_id": sha256})
+                raise
+            await atlas_client.update(VECTOR_STORES_COLLECTION, {"_id": key}, {
+                "$set": {"vector_store_id": vector_store.id, "file_ids": file_ids, "expires_at": expires_at}
+            }, upsert=True)
+            return vector_store.id
+
+        return await self._once(("vector_store", key), create)
+
+    async def run(self, name, instructions, message, files=None, vector_store_name="Resources",
+                  expires_after_days=1, model=None, on_delta=None):
+        """
+        Ask an assistant a single question, searching the given files. The
+        thread and run are created in one streaming request, so the answer is
+        returned as soon as the run completes instead of at the next poll.
+
+        Args:
+        name: str - the name of the assistant
+        instructions: str - the system instructions
+        message: str - the user message
+        files: list - UploadFiles, paths, (filename, content) pairs or S3Resources to search
+        vector_store_name: str - the name of the vector store for the files
+        expires_after_days: int - days of inactivity before the vector store expires
+        model: str - the model, OPENAI_MODEL by default
+        on_delta: callable - called with each chunk of text as it is generated,
+            after its `reset` attribute, if any, is called
+
+        Returns:
+        str: the answer, with file citations replaced by [index] markers
+        """
+        if getattr(on_delta, "reset", None) is not None:
+            on_delta.reset()
+        client = get_async_openai_client()
+        assistant_id, vector_store_id = await asyncio.gather(
+            self._checkout_assistant(name, instructions, model),
+            self.get_vector_store(files, vector_store_name, expires_after_days),
+            return_exceptions=True,
+        )
+        if isinstance(vector_store_id, BaseException):
+            if not isinstance(assistant_id, BaseException):
+                self._release_assistant(assistant_id)
+            raise vector_store_id
+        if isinstance(assistant_id, BaseException):
+            raise assistant_id
+
+        thread = {"messages": [{"role": "user", "content": message}]}
+        if vector_store_id:
+            thread["tool_resources"] = {"file_search": {"vector_store_ids": [vector_store_id]}}
+
+        thread_id = None
+        try:
+            async with async_provider_slot("openai"):
+                async with client.beta.threads.create_and_run_stream(assistant_id=assistant_id, thread=thread) as stream:
+                    async for event in stream:
+                        if event.event == "thread.created":
+                            thread_id = event.data.id
+                        elif event.event == "thread.message.delta" and on_delta is not None:
+                            for block in event.data.delta.content or []:
+                                if block.type == "text" and block.text and block.text.value:
+                                    on_delta(block.text.value)
+                    run = await stream.get_final_run()
+                    messages = await stream.get_final_messages()
+        finally:
+            self._release_assistant(assistant_id)
+            if thread_id:
+                self._in_background(self._delete("thread", thread_id))
+
+        if run.status != "completed" or not messages:
+            raise ValueError(f"Run {run.id} finished with status {run.status} and no answer")
+        message_content = messages[-1].content[0].text
+        response = message_content.value
+        for index, annotation in enumerate(message_content.annotations):
+            response = response.replace(annotation.text, f"[{index}]")
+        return response
+
+    async def expire_files(self, max_age_days=None):
+        """
+        Delete the uploaded files no request has used for max_age_days, along
+        with their records. Files held by a live vector store are kept. Each
+        record is claimed by deleting it, so of several workers sweeping at
+        once only one deletes a given file.
+
+        Args:
+        max_age_days: float - days since the last use, FILE_TTL_DAYS by default
+
+        Returns:
+        int: the number of files deleted
+        """
+        atlas_client = AsyncAtlasClient()
+        now = datetime.datetime.utcnow()
+        cutoff = now - datetime.timedelta(days=max_age_days or FILE_TTL_DAYS)
+        live_stores = await atlas_client.find(VECTOR_STORES_COLLECTION, {"expires_at": {"$gt": now}},
+                                              projection={"file_ids": 1})
+        in_use = {file_id for store in live_stores for file_id in store.get("file_ids", [])}
+        stale = await atlas_client.find(FILES_COLLECTION, {"last_used_at": {"$lt": cutoff}},
+                                        projection={"file_id": 1})
+
+        deleted = 0
+        for record in stale:
+            if record["file_id"] in in_use:
+                continue
+            # Used again since it was read, or claimed by another worker
+            if await atlas_client.find_one_and_delete(FILES_COLLECTION, {
+                "_id": record["_id"], "file_id": record["file_id"], "last_used_at": {"$lt": cutoff},
+            }) is None:
+                continue
+            await self._delete("file", record["file_id"])
+            deleted += 1
+        if deleted:
+            logging.info(f"Deleted {deleted} OpenAI files unused since {cutoff}")
+        return deleted
+
+    async def _sweep_files(self, interval):
+        while True:
+            try:
+                await self.expire_files()
+            except Exception as e:
+                logging.error(f"Error expiring OpenAI files: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval=None):
+        """
+        Start sweeping unused files every interval seconds. Called on
+        application startup.
+
+        Args:
+        interval: float - seconds between sweeps, FILE_SWEEP_INTERVAL by default
+        """
+        if self._sweeper is None:
+            self._sweeper = asyncio.ensure_future(self._sweep_files(interval or FILE_SWEEP_INTERVAL))
+
+    async def aclose(self):
+        """
+        Stop the file sweep, delete the cached assistants and wait for the
+        background cleanups. Vector stores are recorded in MongoDB for the
+        other workers and are left to expire. Called on application shutdown.
+        """
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        for assistant_id in list(self._assistants.values()) + list(self._retired):
+            self._in_background(self._delete("assistant", assistant_id))
+        self._assistants.clear()
+        self._retired.clear()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+assistant_session = AssistantSession()
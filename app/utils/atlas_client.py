@@ -1,12 +1,195 @@
 # External imports
-from pymongo import MongoClient
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReadPreference, ReturnDocument
+from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
+import logging
 import os
+import threading
 
 # Load the environment variables
 load_dotenv()
 
 
+# Process-wide MongoClient cache, keyed by URI. MongoClient is thread-safe and
+# owns its own connection pool, so one instance per process is all we need.
+_clients = {}
+_async_clients = {}
+_ensured_indexes = set()
+_clients_lock = threading.Lock()
+_clients_pid = os.getpid()
+
+_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primarypreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondarypreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+# Directions find_page accepts for sort_order
+SORT_ORDERS = {
+    "asc": ASCENDING,
+    "desc": DESCENDING,
+}
+
+
+def _get_client_options():
+    """
+    Builds the MongoClient keyword arguments from the environment.
+
+    Returns:
+    --------
+    dict: The keyword arguments for MongoClient.
+    """
+    options = {
+        "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", 100)),
+        "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 300000)),
+        "serverSelectionTimeoutMS": int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000)),
+        "connectTimeoutMS": int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 20000)),
+        "retryWrites": True,
+    }
+    socket_timeout = os.environ.get("MONGO_SOCKET_TIMEOUT_MS")
+    if socket_timeout:
+        options["socketTimeoutMS"] = int(socket_timeout)
+
+    read_preference = os.environ.get("MONGO_READ_PREFERENCE", "primary").lower()
+    if read_preference not in _READ_PREFERENCES:
+        logging.warning(f"Unknown MONGO_READ_PREFERENCE '{read_preference}', using primary")
+        read_preference = "primary"
+    options["read_preference"] = _READ_PREFERENCES[read_preference]
+    return options
+
+
+def _reset_after_fork():
+    """
+    Drops the clients inherited from the parent process. A MongoClient must not
+    be shared across a fork, so the child lazily creates its own.
+    """
+    global _clients, _async_clients, _clients_lock, _clients_pid
+    _clients = {}
+    _async_clients = {}
+    _clients_lock = threading.Lock()
+    _clients_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_mongo_client(altas_uri=None):
+    """
+    Gets the shared MongoClient for the given URI, creating it on first use.
+
+    Parameters:
+    -----------
+    altas_uri: str
+        The URI for the MongoDB Atlas. Defaults to ATLAS_URI.
+
+    Returns:
+    --------
+    client: MongoClient
+        The process-wide MongoClient.
+    """
+    altas_uri = altas_uri or os.environ.get("ATLAS_URI")
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _clients.get(altas_uri)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(altas_uri)
+        if client is None:
+            client = MongoClient(altas_uri, **_get_client_options())
+            _clients[altas_uri] = client
+    return client
+
+
+def get_async_mongo_client(altas_uri=None):
+    """
+    Gets the shared Motor client for the given URI, creating it on first use.
+
+    Parameters:
+    -----------
+    altas_uri: str
+        The URI for the MongoDB Atlas. Defaults to ATLAS_URI.
+
+    Returns:
+    --------
+    client: AsyncIOMotorClient
+        The process-wide Motor client.
+    """
+    altas_uri = altas_uri or os.environ.get("ATLAS_URI")
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _async_clients.get(altas_uri)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _async_clients.get(altas_uri)
+        if client is None:
+            client = AsyncIOMotorClient(altas_uri, **_get_client_options())
+            _async_clients[altas_uri] = client
+    return client
+
+
+def close_mongo_clients():
+    """
+    Closes every shared MongoClient and Motor client. Called on application shutdown.
+    """
+    with _clients_lock:
+        for client in list(_clients.values()) + list(_async_clients.values()):
+            try:
+                client.close()
+            except Exception as e:
+                logging.error(f"Error closing MongoDB client: {e}")
+        _clients.clear()
+        _async_clients.clear()
+
+
+def _by_ids_query(ids):
+    """
+    Builds the $in filter for a list of ids.
+
+    Parameters:
+    -----------
+    ids: list
+        The ids to look up, as ObjectIds or their string form.
+
+    Returns:
+    --------
+    tuple: The ids as ObjectIds and the filter matching all of them.
+    """
+    object_ids = [id if isinstance(id, ObjectId) else ObjectId(id) for id in ids]
+    return object_ids, {"_id": {"$in": list(dict.fromkeys(object_ids))}}
+
+
+def _order_by_ids(object_ids, items):
+    """
+    Puts the result of an $in query back in the order of the requested ids.
+
+    Parameters:
+    -----------
+    object_ids: list
+        The requested ids, in order.
+    items: list
+        The documents the query returned.
+
+    Returns:
+    --------
+    tuple: The documents in request order, and the ids that matched nothing.
+    """
+    items_by_id = {item["_id"]: item for item in items}
+    ordered = [items_by_id[id] for id in object_ids if id in items_by_id]
+    missing = [id for id in dict.fromkeys(object_ids) if id not in items_by_id]
+    return ordered, missing
+
+
 class AtlasClient ():
     """
     A class to interact with MongoDB Atlas.
@@ -18,7 +201,7 @@ class AtlasClient ():
     dbname: str
         The name of the database.
     mongodb_client: MongoClient
-        The MongoDB client.
+        The shared MongoDB client.
     database: Database
         The MongoDB database.
 
@@ -30,8 +213,12 @@ class AtlasClient ():
         Gets a collection from the database.
     find(collection_name, filter={}, limit=0)
         Finds documents in a collection.
-    update(collection_name, filter, update)
+    find_one(collection_name, filter={}, projection=None)
+        Finds a single document in a collection.
+    update(collection_name, filter, update, array_filters=None)
         Updates documents in a collection.
+    find_one_and_update(collection_name, filter, update, array_filters=None, projection=None)
+        Atomically updates a document and returns the updated document.
     insert(collection_name, data)
         Inserts a document in a collection.
     delete(collection_name, filter)
@@ -50,8 +237,11 @@ class AtlasClient ():
             The URI for the MongoDB Atlas.
         dbname: str
             The name of the database.    
+
+        The underlying MongoClient is shared by every AtlasClient in the
+        process, so constructing an AtlasClient is cheap.
         """
-        self.mongodb_client = MongoClient(altas_uri)
+        self.mongodb_client = get_mongo_client(altas_uri)
         self.database = self.mongodb_client[dbname]
 
     def ping(self):
@@ -98,7 +288,54 @@ class AtlasClient ():
         items = list(collection.find(filter=filter, limit=limit))
         return items
 
-    def update(self, collection_name, filter, update):
+    def find_one(self, collection_name, filter={}, projection=None):
+        """
+        Finds a single document in a collection.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        projection: dict
+            The fields to include or exclude.
+
+        Returns:
+        --------
+        item: dict
+            The document, or None if nothing matches.
+        """
+        collection = self.database[collection_name]
+        return collection.find_one(filter, projection=projection)
+
+    def find_many_by_ids(self, collection_name, ids, projection=None):
+        """
+        Fetches several documents by id with a single $in query.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        ids: list
+            The ids to fetch, as ObjectIds or their string form.
+        projection: dict
+            The fields to include or exclude.
+
+        Returns:
+        --------
+        items: list
+            The documents, in the order of ids.
+        missing: list
+            The ids (as ObjectIds) that matched no document.
+        """
+        object_ids, filter = _by_ids_query(ids)
+        if not object_ids:
+            return [], []
+        items = list(self.database[collection_name].find(filter, projection=projection))
+        return _order_by_ids(object_ids, items)
+
+    def update(self, collection_name, filter, update, array_filters=None, upsert=False):
         """
         Updates documents in a collection.
 
@@ -110,15 +347,46 @@ class AtlasClient ():
             The filter to apply.
         update: dict
             The update to apply.
+        array_filters: list
+            The filters for the $[<identifier>] positional operators in update.
+        upsert: bool
+            Insert a document if none matches the filter.
 
         Returns:
         --------
         bool: True if successful, False otherwise.
             """
         collection = self.database[collection_name]
-        collection.update_one(filter, update)
+        collection.update_one(filter, update, array_filters=array_filters, upsert=upsert)
         return True
 
+    def find_one_and_update(self, collection_name, filter, update, array_filters=None, projection=None):
+        """
+        Atomically updates a document and returns it after the update.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        update: dict
+            The update to apply.
+        array_filters: list
+            The filters for the $[<identifier>] positional operators in update.
+        projection: dict
+            The fields to include or exclude in the returned document.
+
+        Returns:
+        --------
+        item: dict
+            The updated document, or None if nothing matched the filter.
+        """
+        collection = self.database[collection_name]
+        return collection.find_one_and_update(filter, update, projection=projection,
+                                              array_filters=array_filters,
+                                              return_document=ReturnDocument.AFTER)
+
     def insert(self, collection_name, data):
         """
         Inserts a document in a collection.
@@ -176,3 +444,408 @@ class AtlasClient ():
         """
         collection = self.database[collection_name]
         return list(collection.aggregate(pipeline))
+
+
+class AsyncAtlasClient ():
+    """
+    An asyncio counterpart of AtlasClient built on Motor.
+
+    Every method has the same name and arguments as on AtlasClient but is a
+    coroutine, so database round-trips do not block the event loop.
+
+    Attributes:
+    -----------
+    mongodb_client: AsyncIOMotorClient
+        The shared Motor client.
+    database: AsyncIOMotorDatabase
+        The MongoDB database.
+
+    Methods:
+    --------
+    ping()
+        Pings the MongoDB Atlas.
+    get_collection(collection_name)
+        Gets a collection from the database.
+    find(collection_name, filter={}, limit=0)
+        Finds documents in a collection.
+    find_one(collection_name, filter={}, projection=None)
+        Finds a single document in a collection.
+    find_cursor(collection_name, filter={}, limit=0, **kwargs)
+        Returns a cursor over documents in a collection, for async iteration.
+    find_page(collection_name, filter={}, projection=None, limit=0, after_id=None, sort_by="_id", sort_order="asc")
+        Finds one page of documents using keyset pagination.
+    ensure_index(collection_name, keys, **kwargs)
+        Creates an index once per process.
+    update(collection_name, filter, update, array_filters=None)
+        Updates documents in a collection.
+    find_one_and_update(collection_name, filter, update, array_filters=None, projection=None)
+        Atomically updates a document and returns the updated document.
+    insert(collection_name, data)
+        Inserts a document in a collection.
+    delete(collection_name, filter)
+        Deletes a document in a collection.
+    aggregate(collection_name, pipeline)
+        Aggregates documents in a collection.
+    aggregate_cursor(collection_name, pipeline)
+        Returns a cursor over an aggregation, for async iteration.
+    """
+
+    def __init__(self, altas_uri=os.environ.get("ATLAS_URI"), dbname=os.environ.get("DB_NAME")):
+        """
+        Constructor for the AsyncAtlasClient class.
+
+        Parameters:
+        -----------
+        altas_uri: str
+            The URI for the MongoDB Atlas.
+        dbname: str
+            The name of the database.
+        """
+        self.mongodb_client = get_async_mongo_client(altas_uri)
+        self.database = self.mongodb_client[dbname]
+
+    async def ping(self):
+        """
+        Pings the MongoDB Atlas.
+        """
+        await self.mongodb_client.admin.command('ping')
+
+    def get_collection(self, collection_name):
+        """
+        Gets a collection from the database.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+
+        Returns:
+        --------
+        collection: AsyncIOMotorCollection
+        """
+        return self.database[collection_name]
+
+    async def find(self, collection_name, filter={}, limit=0, projection=None, sort=None):
+        """
+        Finds documents in a collection.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        limit: int
+            The limit of documents to return.
+        projection: dict
+            The fields to include or exclude.
+        sort: list
+            The (key, direction) pairs to sort by.
+
+        Returns:
+        --------
+        items: list
+            The list of documents.
+        """
+        cursor = self.database[collection_name].find(filter=filter, projection=projection, sort=sort, limit=limit)
+        return await cursor.to_list(length=None)
+
+    async def find_page(self, collection_name, filter={}, projection=None, limit=0, after_id=None, sort_by="_id", sort_order="asc"):
+        """
+        Finds one page of documents using keyset pagination. The page starts
+        right after the document with id `after_id` in the requested order, so
+        no documents are skipped over on the server.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        projection: dict
+            The fields to include or exclude.
+        limit: int
+            The page size. 0 returns every remaining document.
+        after_id: str
+            The id of the last document of the previous page.
+        sort_by: str
+            The field to sort by. Ties are broken by _id.
+        sort_order: str
+            "asc" or "desc".
+
+        Returns:
+        --------
+        items: list
+            The list of documents.
+
+        Raises:
+        -------
+        ValueError
+            If after_id is not an ObjectId, sort_order is unknown, or the
+            after_id document no longer exists when sorting by another field.
+        """
+        if sort_order not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort order {sort_order}")
+        if after_id and not ObjectId.is_valid(after_id):
+            raise ValueError(f"Invalid after_id {after_id}")
+        direction = SORT_ORDERS[sort_order]
+        operator = "$lt" if direction == DESCENDING else "$gt"
+
+        query = dict(filter)
+        if after_id:
+            after_id = ObjectId(after_id)
+            if sort_by == "_id":
+                query = {"$and": [filter, {"_id": {operator: after_id}}]}
+            else:
+                anchor = await self.find_one(collection_name, {"_id": after_id}, projection={sort_by: 1})
+                # Without it the page cannot be placed; serving the first page
+                # again would repeat documents
+                if anchor is None:
+                    raise ValueError(f"Unknown after_id {after_id}")
+                value = anchor.get(sort_by)
+                query = {"$and": [filter, {"$or": [
+                    {sort_by: {operator: value}},
+                    {sort_by: value, "_id": {operator: after_id}},
+                ]}]}
+
+        sort = [(sort_by, direction)]
+        if sort_by != "_id":
+            sort.append(("_id", direction))
+
+        return await self.find(collection_name, query, limit=limit, projection=projection, sort=sort)
+
+    async def find_one(self, collection_name, filter={}, projection=None):
+        """
+        Finds a single document in a collection.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        projection: dict
+            The fields to include or exclude.
+
+        Returns:
+        --------
+        item: dict
+            The document, or None if nothing matches.
+        """
+        return await self.database[collection_name].find_one(filter, projection=projection)
+
+    async def find_many_by_ids(self, collection_name, ids, projection=None):
+        """
+        Fetches several documents by id with a single $in query.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        ids: list
+            The ids to fetch, as ObjectIds or their string form.
+        projection: dict
+            The fields to include or exclude.
+
+        Returns:
+        --------
+        items: list
+            The documents, in the order of ids.
+        missing: list
+            The ids (as ObjectIds) that matched no document.
+        """
+        object_ids, filter = _by_ids_query(ids)
+        if not object_ids:
+            return [], []
+        items = await self.database[collection_name].find(filter, projection=projection).to_list(length=None)
+        return _order_by_ids(object_ids, items)
+
+    async def ensure_index(self, collection_name, keys, **kwargs):
+        """
+        Creates an index unless this process already did. create_index is
+        idempotent on the server, so this only saves the round-trip.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        keys: list
+            The (key, direction) pairs of the index.
+        kwargs: dict
+            Extra index options (unique, name, ...).
+
+        Returns:
+        --------
+        name: str
+            The name of the index, or None if it was already ensured.
+        """
+        cache_key = (self.database.name, collection_name, tuple(keys))
+        if cache_key in _ensured_indexes:
+            return None
+        name = await self.database[collection_name].create_index(keys, **kwargs)
+        _ensured_indexes.add(cache_key)
+        return name
+
+    def find_cursor(self, collection_name, filter={}, limit=0, **kwargs):
+        """
+        Returns a cursor over documents in a collection. Use it with
+        `async for` to stream large result sets instead of loading them.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        limit: int
+            The limit of documents to return.
+        kwargs: dict
+            Extra arguments for find (projection, sort, batch_size, ...).
+
+        Returns:
+        --------
+        cursor: AsyncIOMotorCursor
+        """
+        return self.database[collection_name].find(filter=filter, limit=limit, **kwargs)
+
+    async def update(self, collection_name, filter, update, array_filters=None, upsert=False):
+        """
+        Updates documents in a collection.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        update: dict
+            The update to apply.
+        array_filters: list
+            The filters for the $[<identifier>] positional operators in update.
+        upsert: bool
+            Insert a document if none matches the filter.
+
+        Returns:
+        --------
+        bool: True if successful, False otherwise.
+        """
+        await self.database[collection_name].update_one(filter, update, array_filters=array_filters, upsert=upsert)
+        return True
+
+    async def find_one_and_update(self, collection_name, filter, update, array_filters=None, projection=None):
+        """
+        Atomically updates a document and returns it after the update.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        update: dict
+            The update to apply.
+        array_filters: list
+            The filters for the $[<identifier>] positional operators in update.
+        projection: dict
+            The fields to include or exclude in the returned document.
+
+        Returns:
+        --------
+        item: dict
+            The updated document, or None if nothing matched the filter.
+        """
+        return await self.database[collection_name].find_one_and_update(filter, update, projection=projection,
+                                                                        array_filters=array_filters,
+                                                                        return_document=ReturnDocument.AFTER)
+
+    async def insert(self, collection_name, data):
+        """
+        Inserts a document in a collection.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        data: dict
+            The data to insert.
+
+        Returns:
+        --------
+        id: ObjectId
+            The id of the inserted document.
+        """
+        result = await self.database[collection_name].insert_one(data)
+        return result.inserted_id
+
+    async def delete(self, collection_name, filter):
+        """
+        Deletes a document in a collection.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+
+        Returns:
+        --------
+        bool: True if successful, False otherwise.
+        """
+        await self.database[collection_name].delete_one(filter)
+        return True
+
+    async def find_one_and_delete(self, collection_name, filter, projection=None):
+        """
+        Atomically deletes a document and returns it.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        filter: dict
+            The filter to apply.
+        projection: dict
+            The fields to include or exclude in the returned document.
+
+        Returns:
+        --------
+        item: dict
+            The deleted document, or None if nothing matched the filter.
+        """
+        return await self.database[collection_name].find_one_and_delete(filter, projection=projection)
+
+    async def aggregate(self, collection_name, pipeline):
+        """
+        Aggregates documents in a collection.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        pipeline: list
+            The aggregation pipeline.
+
+        Returns:
+        --------
+        list: The list of documents.
+        """
+        cursor = self.database[collection_name].aggregate(pipeline)
+        return await cursor.to_list(length=None)
+
+    def aggregate_cursor(self, collection_name, pipeline):
+        """
+        Returns a cursor over an aggregation, for use with `async for`.
+
+        Parameters:
+        -----------
+        collection_name: str
+            The name of the collection.
+        pipeline: list
+            The aggregation pipeline.
+
+        Returns:
+        --------
+        cursor: AsyncIOMotorCommandCursor
+        """
+        return self.database[collection_name].aggregate(pipeline)
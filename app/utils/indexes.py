@@ -0,0 +1,196 @@
+# External imports
+import argparse
+import json
+import logging
+import os
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+# Internal imports
+from app.utils.atlas_client import AtlasClient
+
+
+# Collections the course design pipeline uses as work queues. Every document
+# in them is looked up by (course_id, module_id).
+COURSE_QUEUE_COLLECTIONS = [
+    "in_outline_generation_queue",
+    "in_content_generation_queue",
+    "in_structure_generation_queue",
+    "in_deliverables_generation_queue",
+    "in_publishing_queue",
+    "published",
+]
+
+# Declarative index registry: collection name -> list of index specs.
+# Each spec has the index "keys" plus any extra create_index options
+# (unique, expireAfterSeconds, sparse, ...). Indexes keep MongoDB's default
+# names. This is the only place indexes are defined; services rely on them
+# having been applied at startup.
+INDEX_REGISTRY = {
+    "course_design": [
+        {"keys": [("users", 1), ("_id", 1)]},
+    ],
+    "lab_design": [
+        {"keys": [("users", 1), ("_id", 1)]},
+    ],
+    "podcast_design": [
+        {"keys": [("users", 1), ("_id", 1)]},
+    ],
+    "writing_design": [
+        {"keys": [("users", 1), ("_id", 1)]},
+    ],
+    "model_projects": [
+        {"keys": [("users", 1), ("_id", 1)]},
+    ],
+    "courses": [
+        {"keys": [("course_id", 1)]},
+    ],
+    "notifications": [
+        {"keys": [("username", 1)]},
+    ],
+    "quAPIVault": [
+        {"keys": [("username", 1)]},
+    ],
+    "qucreate_users": [
+        {"keys": [("username", 1)], "unique": True},
+    ],
+    "users": [
+        {"keys": [("username", 1)], "unique": True},
+    ],
+    "project_waitlist": [
+        {"keys": [("user_id", 1), ("project_id", 1)]},
+    ],
+    "in_lab_generation_queue": [
+        {"keys": [("lab_id", 1)]},
+    ],
+    # last_used_at backs the sweep that deletes unused files from OpenAI
+    "openai_files": [
+        {"keys": [("aliases", 1)]},
+        {"keys": [("last_used_at", 1)]},
+    ],
+    # Vector store records are dropped once OpenAI would have expired them
+    "openai_vector_stores": [
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+    # Job state, when JOBS_REDIS_URL is not set, is dropped once it expires
+    "jobs": [
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+}
+
+for _queue in COURSE_QUEUE_COLLECTIONS:
+    INDEX_REGISTRY[_queue] = [
+        {"keys": [("course_id", 1), ("module_id", 1)]},
+    ]
+
+# Notifications can optionally expire. Set NOTIFICATIONS_TTL_DAYS to enable.
+if os.environ.get("NOTIFICATIONS_TTL_DAYS"):
+    INDEX_REGISTRY["notifications"].append({
+        "keys": [("creation_date", 1)],
+        "expireAfterSeconds": int(os.environ["NOTIFICATIONS_TTL_DAYS"]) * 24 * 60 * 60,
+    })
+
+
+def _index_name(spec):
+    """
+    Get the name MongoDB gives an index spec
+
+    Args:
+    spec: dict - the index spec
+
+    Returns:
+    str: the index name
+    """
+    return IndexModel(spec["keys"], **_index_options(spec)).document["name"]
+
+
+def _index_options(spec):
+    """
+    Get the create_index options of an index spec
+
+    Args:
+    spec: dict - the index spec
+
+    Returns:
+    dict: the options to pass to create_index
+    """
+    return {key: value for key, value in spec.items() if key != "keys"}
+
+
+def apply_indexes(atlas_client=None, registry=INDEX_REGISTRY):
+    """
+    Create every index in the registry. create_index is a no-op for indexes
+    that already exist with the same definition, so this is safe to run on
+    every startup. A failing index is logged and skipped.
+
+    Args:
+    atlas_client: AtlasClient - the client to use
+    registry: dict - collection name -> list of index specs
+
+    Returns:
+    dict: collection name -> list of index names created or confirmed
+    """
+    atlas_client = atlas_client or AtlasClient()
+    applied = {}
+    for collection_name, specs in registry.items():
+        collection = atlas_client.get_collection(collection_name)
+        for spec in specs:
+            try:
+                name = collection.create_index(spec["keys"], **_index_options(spec))
+                applied.setdefault(collection_name, []).append(name)
+            except OperationFailure as e:
+                logging.error(f"Could not create index {_index_name(spec)} on {collection_name}: {e}")
+    return applied
+
+
+def report_indexes(atlas_client=None, registry=INDEX_REGISTRY):
+    """
+    Compare the indexes in the database with the registry
+
+    Args:
+    atlas_client: AtlasClient - the client to use
+    registry: dict - collection name -> list of index specs
+
+    Returns:
+    dict: collection name -> {"missing": [...], "unused": [...], "unregistered": [...]}
+        missing: registered indexes that do not exist
+        unused: existing indexes with no recorded accesses since the last restart
+        unregistered: existing indexes that are not in the registry
+    """
+    atlas_client = atlas_client or AtlasClient()
+    report = {}
+    for collection_name, specs in registry.items():
+        collection = atlas_client.get_collection(collection_name)
+        existing = {index["name"]: index for index in collection.list_indexes()}
+        registered = {_index_name(spec) for spec in specs}
+
+        try:
+            stats = atlas_client.aggregate(collection_name, [{"$indexStats": {}}])
+            usage = {stat["name"]: stat["accesses"]["ops"] for stat in stats}
+        except OperationFailure as e:
+            logging.error(f"Could not read index stats for {collection_name}: {e}")
+            usage = {}
+
+        report[collection_name] = {
+            "missing": sorted(registered - set(existing)),
+            "unused": sorted(name for name, ops in usage.items() if ops == 0 and name != "_id_"),
+            "unregistered": sorted(set(existing) - registered - {"_id_"}),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the MongoDB indexes used by the services.")
+    parser.add_argument("command", choices=["apply", "report"],
+                        help="apply: create the registered indexes, report: show missing and unused indexes")
+    args = parser.parse_args()
+
+    if args.command == "apply":
+        print(json.dumps(apply_indexes(), indent=2))
+    else:
+        print(json.dumps(report_indexes(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# External imports
+import asyncio
+import datetime
+import json
+import logging
+import os
+import uuid
+
+import redis.asyncio as aioredis
+
+from app.utils.atlas_client import AsyncAtlasClient
+from app.utils.responses import dumps
+from app.websocket_manager import redis_client
+
+
+# Job functions that may be run by name, keyed by "module.qualname"
+JOB_FUNCTIONS = {}
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_QUEUE_KEY = "jobs:queue"
+_JOB_KEY = "jobs:{}"
+
+# Job state without Redis, shared by all worker processes
+JOBS_COLLECTION = "jobs"
+
+
+def register_job(func):
+    """
+    Allow a coroutine function to be run as a background job
+
+    Args:
+    func: callable - the coroutine function
+
+    Returns:
+    str: the name the job is queued under
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    JOB_FUNCTIONS[name] = func
+    return name
+
+
+def _is_serializable(args, kwargs):
+    try:
+        json.dumps([args, kwargs])
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+class JobQueue:
+    """
+    Runs long generations outside the request that started them. When
+    JOBS_REDIS_URL is set, jobs are queued in Redis and picked up by whichever
+    worker process is free; jobs whose arguments cannot be serialized (such
+    as uploaded files) and all jobs without Redis run on this process's own
+    workers. Job state is kept for JOBS_RESULT_TTL seconds, in Redis or else
+    in MongoDB, so any worker process can report it. Every change is
+    published on the websocket manager's task_updates channel.
+
+    Attributes:
+    concurrency: int - workers running this process's own jobs (JOBS_CONCURRENCY)
+    redis_concurrency: int - workers taking jobs from Redis, when it is
+        configured (JOBS_REDIS_CONCURRENCY, JOBS_CONCURRENCY by default)
+    """
+
+    def __init__(self, redis_url=None, concurrency=None, result_ttl=None, redis_concurrency=None):
+        self.redis_url = redis_url or os.environ.get("JOBS_REDIS_URL")
+        self.concurrency = concurrency or int(os.environ.get("JOBS_CONCURRENCY", 4))
+        self.redis_concurrency = redis_concurrency or int(os.environ.get("JOBS_REDIS_CONCURRENCY", self.concurrency))
+        self.result_ttl = result_ttl or int(os.environ.get("JOBS_RESULT_TTL", 86400))
+        self._redis = aioredis.from_url(self.redis_url) if self.redis_url else None
+        self._local = None
+        self._workers = []
+
+    async def start(self):
+        """
+        Start the workers. Called on application startup.
+        """
+        if self._workers:
+            return
+        self._local = asyncio.Queue()
+        for _ in range(self.concurrency):
+            self._workers.append(asyncio.ensure_future(self._local_worker()))
+        if self._redis is not None:
+            for _ in range(self.redis_concurrency):
+                self._workers.append(asyncio.ensure_future(self._redis_worker()))
+
+    async def stop(self):
+        """
+        Stop the workers. Jobs still running are cancelled and marked failed.
+        Called on application shutdown.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def enqueue(self, func, *args, username="", **kwargs):
+        """
+        Queue a call to func
+
+        Args:
+        func: callable - the coroutine function to run
+        *args: the positional arguments for func
+        username: str - the user to send progress updates to
+        **kwargs: the keyword arguments for func
+
+        Returns:
+        dict: the job, with its job_id and status
+        """
+        name = register_job(func)
+        now = datetime.datetime.utcnow()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "name": func.__name__,
+            "username": username or "",
+            "status": QUEUED,
+            "created_at": now,
+            "updated_at": now,
+            "result": None,
+            "error": None,
+        }
+        await self._save(job)
+
+        if self._redis is not None and _is_serializable(args, kwargs):
+            await self._redis.lpush(_QUEUE_KEY, json.dumps({"job_id": job["job_id"], "name": name,
+                                                            "args": args, "kwargs": kwargs}))
+        else:
+            if self._local is None:
+                await self.start()
+            self._local.put_nowait((job["job_id"], func, args, kwargs))
+        await self._publish(job)
+        return job
+
+    async def get(self, job_id):
+        """
+        Get a job
+
+        Args:
+        job_id: str - the id of the job
+
+        Returns:
+        dict: the job, or None if it does not exist or has expired
+        """
+        if self._redis is not None:
+            data = await self._redis.get(_JOB_KEY.format(job_id))
+            return json.loads(data) if data else None
+        return await AsyncAtlasClient().find_one(JOBS_COLLECTION,
+                                                 {"_id": job_id, "expires_at": {"$gt": datetime.datetime.utcnow()}},
+                                                 {"_id": 0, "expires_at": 0})
+
+    async def _save(self, job):
+        if self._redis is not None:
+            await self._redis.set(_JOB_KEY.format(job["job_id"]), dumps(job), ex=self.result_ttl)
+            return
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.result_ttl)
+        await AsyncAtlasClient().update(JOBS_COLLECTION, {"_id": job["job_id"]},
+                                        {"$set": {**job, "expires_at": expires_at}}, upsert=True)
+
+    async def _publish(self, job):
+        payload = {
+            "type": "jobUpdate",
+            "username": job["username"],
+            "module_id": "",
+            "project_id": job["job_id"],
+            "job_id": job["job_id"],
+            "state": job["status"],
+            "message": f"{job['name']} {job['status']}",
+        }
+        try:
+            await asyncio.to_thread(redis_client.publish, "task_updates", json.dumps(payload))
+        except Exception as e:
+            logging.error(f"Could not publish update for job {job['job_id']}: {e}")
+
+    async def _run(self, job_id, func, args, kwargs):
+        """
+        Run a job and record its result
+
+        Args:
+        job_id: str - the id of the job
+        func: callable - the coroutine function, or None if it is not registered
+        args: list - the positional arguments
+        kwargs: dict - the keyword arguments
+        """
+        job = await self.get(job_id)
+        if job is None:
+            logging.error(f"Job {job_id} expired before it ran")
+            return
+        job.update(status=RUNNING, updated_at=datetime.datetime.utcnow())
+        await self._save(job)
+        await self._publish(job)
+
+        try:
+            if func is None:
+                raise ValueError(f"{job['name']} is not a registered job")
+            result = await func(*args, **kwargs)
+            job.update(status=COMPLETED, result=result)
+        except asyncio.CancelledError:
+            job.update(status=FAILED, error="The job was cancelled.", updated_at=datetime.datetime.utcnow())
+            await self._save(job)
+            raise
+        except Exception as e:
+            logging.error(f"Job {job_id} ({job['name']}) failed: {e}")
+            job.update(status=FAILED, error="Something went wrong. Please try again later.")
+        job["updated_at"] = datetime.datetime.utcnow()
+        await self._save(job)
+        await self._publish(job)
+
+    async def _local_worker(self):
+        while True:
+            job_id, func, args, kwargs = await self._local.get()
+            # A job whose state cannot be saved must not stop the worker
+            try:
+                await self._run(job_id, func, args, kwargs)
+            except Exception as e:
+                logging.error(f"Error running job {job_id}: {e}")
+
+    async def _redis_worker(self):
+        while True:
+            try:
+                item = await self._redis.brpop(_QUEUE_KEY, timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error reading the job queue: {e}")
+                await asyncio.sleep(5)
+                continue
+            if item is None:
+                continue
+            try:
+                message = json.loads(item[1])
+                func = JOB_FUNCTIONS.get(message["name"])
+                if func is None:
+                    logging.error(f"Unknown job function {message['name']}")
+                await self._run(message["job_id"], func, message["args"], message["kwargs"])
+            except Exception as e:
+                logging.error(f"Error running queued job {item[1]!r}: {e}")
+
+
+job_queue = JobQueue()
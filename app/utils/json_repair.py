@@ -0,0 +1,84 @@
+# External imports
+import ast
+import json
+import re
+
+from pydantic import TypeAdapter
+
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.S | re.I)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def _extract(text):
+    """
+    Cut the JSON value out of an LLM response: drop code fences and any text
+    before the first bracket or after the matching last one
+
+    Args:
+    text: str - the response
+
+    Returns:
+    str: the JSON candidate
+    """
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    text = text.strip()
+    if text[:4].lower() == "json":
+        text = text[4:].lstrip()
+
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        return text
+    start = min(starts)
+    end = text.rfind("}" if text[start] == "{" else "]")
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def repair_json(text):
+    """
+    Parse a near-valid JSON response. Handles code fences, leading and
+    trailing prose, trailing commas, smart quotes and Python literals.
+
+    Args:
+    text: str - the response
+
+    Returns:
+    object: the parsed value
+
+    Raises:
+    ValueError: if the response cannot be repaired
+    """
+    candidate = _extract(text)
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    candidate = _TRAILING_COMMA.sub(r"\1", candidate.translate(_SMART_QUOTES))
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        # Single quotes, True/False/None
+        return ast.literal_eval(candidate)
+    except (ValueError, SyntaxError) as e:
+        raise ValueError(f"Could not repair JSON response: {e}") from e
+
+
+def parse_structured(text, schema):
+    """
+    Parse and validate a response against a pydantic model or type
+
+    Args:
+    text: str - the response
+    schema: type - a pydantic model, or a type such as List[Model]
+
+    Returns:
+    object: the validated value
+    """
+    return TypeAdapter(schema).validate_python(repair_json(text))
@@ -3,15 +3,798 @@ from langchain_openai.chat_models import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from langchain.chains import LLMChain
 import google.generativeai as gemini
+from google import genai
+from openai import AsyncOpenAI, OpenAI
 
 # External imports
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
 from dotenv import load_dotenv
+import hashlib
+import httpx
+import json
+import logging
 import os
+import threading
+import time
+
+import redis.asyncio as aioredis
+from pydantic import TypeAdapter
+
+from app.utils.json_repair import parse_structured, repair_json
+from app.utils.retry import RATE_LIMIT, SERVER, TIMEOUT, RetryError, classify_error, retry_async
 
 # Load the environment variables
 load_dotenv()
 
 
+# Process-wide provider clients. Each client keeps its own pool of keep-alive
+# HTTP connections, so constructing them once per process avoids a TLS
+# handshake and object setup on every generation.
+_clients = {}
+_slots = {}
+_async_slots = {}
+_clients_lock = threading.RLock()
+_clients_pid = os.getpid()
+
+# Default number of concurrent requests allowed per vendor
+_DEFAULT_CONCURRENCY = {
+    "openai": 16,
+    "gemini": 8,
+}
+
+# Provider names that share a vendor's concurrency limit
+_VENDORS = {
+    "chatgpt": "openai",
+}
+
+def _reset_after_fork():
+    """
+    Drops the clients inherited from the parent process. Their connection
+    pools must not be shared across a fork, so the child creates its own.
+    """
+    global _clients, _slots, _async_slots, _clients_lock, _clients_pid
+    _clients = {}
+    _slots = {}
+    _async_slots = {}
+    _clients_lock = threading.RLock()
+    _clients_pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_or_create(name, factory):
+    """
+    Get a shared client, creating it with factory on first use
+
+    Args:
+    name: str - the registry key of the client
+    factory: callable - builds the client
+
+    Returns:
+    object: the process-wide client
+    """
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _clients.get(name)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = factory()
+            _clients[name] = client
+    return client
+
+
+def _http_limits():
+    """
+    Get the connection pool limits for the provider HTTP clients
+
+    Returns:
+    httpx.Limits: the pool limits, read from the environment
+    """
+    return httpx.Limits(max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 100)),
+                        max_keepalive_connections=int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", 20)),
+                        keepalive_expiry=float(os.environ.get("LLM_KEEPALIVE_EXPIRY", 60)))
+
+
+def _http_timeout():
+    return float(os.environ.get("LLM_TIMEOUT", 120))
+
+
+def get_http_client():
+    """
+    Get the shared keep-alive httpx client used by the OpenAI clients
+
+    Returns:
+    httpx.Client: the process-wide HTTP client
+    """
+    return _get_or_create("http", lambda: httpx.Client(limits=_http_limits(), timeout=_http_timeout()))
+
+
+def get_async_http_client():
+    """
+    Get the shared keep-alive httpx client used by the async OpenAI clients
+
+    Returns:
+    httpx.AsyncClient: the process-wide async HTTP client
+    """
+    return _get_or_create("async_http", lambda: httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout()))
+
+
+def get_openai_client():
+    """
+    Get the shared OpenAI SDK client
+
+    Returns:
+    OpenAI: the process-wide OpenAI client
+    """
+    return _get_or_create("openai", lambda: OpenAI(timeout=_http_timeout(),
+                                                   api_key=os.environ.get("OPENAI_KEY"),
+                                                   http_client=get_http_client()))
+
+
+def get_async_openai_client():
+    """
+    Get the shared async OpenAI SDK client
+
+    Returns:
+    AsyncOpenAI: the process-wide async OpenAI client
+    """
+    return _get_or_create("async_openai", lambda: AsyncOpenAI(timeout=_http_timeout(),
+                                                              api_key=os.environ.get("OPENAI_KEY"),
+                                                              http_client=get_async_http_client()))
+
+
+def get_chat_model():
+    """
+    Get the shared langchain ChatOpenAI model
+
+    Returns:
+    ChatOpenAI: the process-wide chat model
+    """
+    return _get_or_create("chatgpt", lambda: ChatOpenAI(model=os.environ.get("OPENAI_MODEL"),
+                                                        temperature=1,
+                                                        api_key=os.environ.get("OPENAI_KEY"),
+                                                        http_client=get_http_client(),
+                                                        http_async_client=get_async_http_client()))
+
+
+def get_gemini_model(model_name="gemini-pro"):
+    """
+    Get a shared google.generativeai model. The module is configured when
+    the model is first created.
+
+    Args:
+    model_name: str - the name of the Gemini model
+
+    Returns:
+    GenerativeModel: the process-wide model
+    """
+    def create():
+        gemini.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+        return gemini.GenerativeModel(model_name=model_name)
+
+    return _get_or_create(f"gemini:{model_name}", create)
+
+
+def get_genai_client():
+    """
+    Get the shared google-genai client
+
+    Returns:
+    genai.Client: the process-wide client
+    """
+    return _get_or_create("genai", lambda: genai.Client(api_key=os.environ.get("GEMINI_API_KEY")))
+
+
+def _vendor(provider):
+    return _VENDORS.get(provider, provider)
+
+
+def _provider_limit(vendor):
+    limit = os.environ.get(f"{vendor.upper()}_MAX_CONCURRENCY")
+    if limit is None and vendor == "openai":
+        limit = os.environ.get("CHATGPT_MAX_CONCURRENCY")
+    return int(limit or _DEFAULT_CONCURRENCY.get(vendor, 8))
+
+
+def get_provider_slots(provider):
+    """
+    Get the semaphore bounding the concurrent sync requests to a provider's
+    vendor. Provider names of the same vendor (chatgpt, openai) share one
+    limit, read from <VENDOR>_MAX_CONCURRENCY, e.g. OPENAI_MAX_CONCURRENCY.
+
+    Args:
+    provider: str - the provider name (chatgpt, openai, gemini)
+
+    Returns:
+    threading.BoundedSemaphore: the vendor's semaphore
+    """
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+    vendor = _vendor(provider)
+    slots = _slots.get(vendor)
+    if slots is None:
+        with _clients_lock:
+            slots = _slots.setdefault(vendor, threading.BoundedSemaphore(_provider_limit(vendor)))
+    return slots
+
+
+@contextmanager
+def provider_slot(provider):
+    """
+    Hold one of the provider's concurrency slots for the duration of a request
+
+    Args:
+    provider: str - the provider name
+    """
+    slots = get_provider_slots(provider)
+    with slots:
+        yield
+
+
+def get_async_provider_slots(provider):
+    """
+    Get the asyncio semaphore bounding the concurrent async requests to a
+    provider's vendor. Async callers have their own budget of
+    <VENDOR>_MAX_CONCURRENCY slots next to the sync one, so waiting
+    coroutines queue in order without holding up threads.
+
+    Args:
+    provider: str - the provider name (chatgpt, openai, gemini)
+
+    Returns:
+    asyncio.Semaphore: the vendor's semaphore
+    """
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+    vendor = _vendor(provider)
+    slots = _async_slots.get(vendor)
+    if slots is None:
+        with _clients_lock:
+            slots = _async_slots.setdefault(vendor, asyncio.Semaphore(_provider_limit(vendor)))
+    return slots
+
+
+@asynccontextmanager
+async def async_provider_slot(provider):
+    """
+    Hold one of the provider's async concurrency slots for the duration of a
+    request without blocking the event loop
+
+    Args:
+    provider: str - the provider name
+    """
+    async with get_async_provider_slots(provider):
+        yield
+
+
+def close_llm_clients():
+    """
+    Close the shared HTTP connection pools. Called on application shutdown.
+    The async pools are closed by aclose_llm_clients.
+    """
+    with _clients_lock:
+        for name in ("openai", "http"):
+            client = _clients.get(name)
+            if client is None:
+                continue
+            try:
+                client.close()
+            except Exception as e:
+                logging.error(f"Error closing {name} client: {e}")
+        _clients.pop("openai", None)
+        _clients.pop("http", None)
+
+
+async def aclose_llm_clients():
+    """
+    Close the shared async HTTP connection pools. Called on application shutdown.
+    """
+    cache = _clients.pop("cache", None)
+    if cache is not None:
+        await cache.aclose()
+    for name in ("async_openai", "async_http"):
+        client = _clients.pop(name, None)
+        if client is None:
+            continue
+        try:
+            if isinstance(client, httpx.AsyncClient):
+                await client.aclose()
+            else:
+                await client.close()
+        except Exception as e:
+            logging.error(f"Error closing {name} client: {e}")
+    _clients.clear()
+
+
+def openai_response_format(schema):
+    """
+    Get the OpenAI response_format for a structured output schema. OpenAI
+    only accepts object schemas, so other schemas (e.g. lists) get None and
+    rely on local parsing.
+
+    Args:
+    schema: type - a pydantic model, or a type such as List[Model]
+
+    Returns:
+    dict: the response_format, or None
+    """
+    json_schema = TypeAdapter(schema).json_schema()
+    if json_schema.get("type") != "object":
+        return None
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": getattr(schema, "__name__", "response"),
+            "schema": json_schema,
+            "strict": False,
+        },
+    }
+
+
+def get_cache_ttl(prompt_name):
+    """
+    Get how long responses to a prompt stay cached. Per-prompt TTLs come from
+    LLM_CACHE_TTLS, a JSON object of prompt name -> seconds; other prompts
+    use LLM_CACHE_TTL.
+
+    Args:
+    prompt_name: str - the name of the prompt in prompts.json
+
+    Returns:
+    int: the TTL in seconds
+    """
+    ttls = json.loads(os.environ.get("LLM_CACHE_TTLS", "{}"))
+    return int(ttls.get(prompt_name, os.environ.get("LLM_CACHE_TTL", 3600)))
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM responses. Entries live in an in-memory
+    LRU and, when LLM_CACHE_REDIS_URL is set, in Redis so that they are
+    shared between workers. The cache is off unless LLM_CACHE_ENABLED=true.
+
+    Attributes:
+    max_entries: int - the size of the in-memory LRU
+    """
+
+    def __init__(self, max_entries=None, redis_url=None):
+        self.enabled = os.environ.get("LLM_CACHE_ENABLED", "false").lower() == "true"
+        self.max_entries = max_entries or int(os.environ.get("LLM_CACHE_SIZE", 512))
+        redis_url = redis_url or os.environ.get("LLM_CACHE_REDIS_URL")
+        self._redis = aioredis.from_url(redis_url) if redis_url else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(provider, model, prompt_text, temperature, response_schema=None):
+        """
+        Get the cache key of a generation
+
+        Args:
+        provider: str - the LLM type
+        model: str - the model name
+        prompt_text: str - the fully rendered prompt
+        temperature: float - the sampling temperature
+        response_schema: type - the structured output schema, if any. Its JSON
+            schema is part of the key, so free-form and structured responses to
+            the same prompt are cached apart
+
+        Returns:
+        str: the cache key
+        """
+        json_schema = TypeAdapter(response_schema).json_schema() if response_schema else None
+        payload = json.dumps([provider, model, prompt_text, temperature, json_schema], sort_keys=True)
+        return "llm:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(self, key):
+        """
+        Get a cached response
+
+        Args:
+        key: str - the cache key
+
+        Returns:
+        str: the cached response, or None
+        """
+        value = self._get_local(key)
+        if value is not None or self._redis is None:
+            return value
+        try:
+            value = await self._redis.get(key)
+            if value is None:
+                return None
+            value = value.decode("utf-8")
+            ttl = await self._redis.ttl(key)
+            if ttl > 0:
+                self._set_local(key, value, ttl)
+            return value
+        except Exception as e:
+            logging.error(f"Error reading the LLM cache from Redis: {e}")
+            return None
+
+    async def set(self, key, value, ttl):
+        """
+        Cache a response
+
+        Args:
+        key: str - the cache key
+        value: str - the response
+        ttl: int - how long to keep it, in seconds
+        """
+        self._set_local(key, value, ttl)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(key, value, ex=ttl)
+        except Exception as e:
+            logging.error(f"Error writing the LLM cache to Redis: {e}")
+
+    def clear(self):
+        """
+        Drop the in-memory entries
+        """
+        with self._lock:
+            self._entries.clear()
+
+    async def aclose(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+
+
+def get_llm_cache():
+    """
+    Get the shared LLM response cache
+
+    Returns:
+    LLMResponseCache: the process-wide cache
+    """
+    return _get_or_create("cache", LLMResponseCache)
+
+
+# Errors that say something about a provider's health. Parse, validation
+# and bad request errors are about the request and do not trip the breaker.
+_HEALTH_ERRORS = {RATE_LIMIT, SERVER, TIMEOUT}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose circuit is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker. After `failure_threshold` consecutive
+    failed attempts the provider is skipped for `cooldown` seconds, then one
+    call is let through to probe it while the others keep skipping it.
+
+    Attributes:
+    provider: str - the provider name
+    failure_threshold: int - consecutive failures that open the circuit
+    cooldown: float - how long the circuit stays open, in seconds
+    """
+
+    def __init__(self, provider, failure_threshold=None, cooldown=None):
+        self.provider = provider
+        self.failure_threshold = failure_threshold or int(os.environ.get("LLM_BREAKER_FAILURES", 3))
+        self.cooldown = cooldown or float(os.environ.get("LLM_BREAKER_COOLDOWN", 60))
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def available(self):
+        """
+        Whether the provider could be called now, without claiming the probe
+
+        Returns:
+        bool: False while the circuit is open or a probe is in flight
+        """
+        if self.opened_at is None:
+            return True
+        return not self.probing and time.monotonic() - self.opened_at >= self.cooldown
+
+    def allow(self):
+        """
+        Whether a call to the provider should be attempted. Once the cooldown
+        has passed, the first caller is let through as the probe; the
+        circuit stays open for everyone else until the probe finishes.
+
+        Returns:
+        tuple: (allowed, probe) - allowed is False while the circuit is open
+            or a probe is in flight; probe is True for the caller that was
+            let through as the probe
+        """
+        if not self.available():
+            return False, False
+        if self.opened_at is None:
+            return True, False
+        self.probing = True
+        return True, True
+
+    def end_probe(self):
+        """
+        Let another caller probe the provider. Only the probe calls this,
+        when it ended without saying anything about the provider's health.
+        """
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logging.error(f"Circuit opened for {self.provider} after {self.failures} failures")
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+
+def get_circuit_breaker(provider):
+    """
+    Get the shared circuit breaker of a provider
+
+    Args:
+    provider: str - the provider name
+
+    Returns:
+    CircuitBreaker: the process-wide breaker
+    """
+    return _get_or_create(f"breaker:{provider}", lambda: CircuitBreaker(provider))
+
+
+def _error_class(error):
+    if isinstance(error, RetryError):
+        return error.error_class
+    return classify_error(error)
+
+
+def _retry_options(final):
+    """
+    Get the retry_async options for one provider. A provider with another
+    one to fall back on gets a short budget, so that a failing provider
+    hands over quickly; the last one gets the full retry budget.
+
+    Args:
+    final: bool - whether no provider is left to fall back on
+
+    Returns:
+    dict: the retry_async keyword arguments
+    """
+    if final:
+        return {}
+    return {
+        "attempts": int(os.environ.get("LLM_FALLBACK_ATTEMPTS", 2)),
+        "deadline": float(os.environ.get("LLM_FALLBACK_DEADLINE", 30)),
+    }
+
+
+async def _call_provider(call, provider, final=True, force=False):
+    """
+    Call one provider and record the outcome of every attempt on its
+    circuit breaker
+
+    Args:
+    call: callable - coroutine function taking an LLM and retry_async options
+    provider: str - the provider name
+    final: bool - whether no provider is left to fall back on
+    force: bool - call the provider even if its circuit is open
+
+    Returns:
+    object: the result of call
+    """
+    breaker = get_circuit_breaker(provider)
+    allowed, probe = breaker.allow()
+    if not allowed and not force:
+        raise CircuitOpenError(f"The circuit for {provider} is open")
+    recorded = []
+
+    def on_error(error):
+        if _error_class(error) in _HEALTH_ERRORS:
+            breaker.record_failure()
+            recorded.append(error)
+
+    try:
+        result = await call(LLM(provider), on_error=on_error, **_retry_options(final))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Calls that do not report their attempts are recorded once here
+        if not recorded and _error_class(e) in _HEALTH_ERRORS:
+            breaker.record_failure()
+        raise
+    finally:
+        # A forced call must not end the probe of another caller
+        if probe and breaker.probing:
+            breaker.end_probe()
+    breaker.record_success()
+    return result
+
+
+async def call_with_providers(call, primary=None, providers=None, strategy=None, hedge_delay=None):
+    """
+    Run a generation against the LLM providers using the configured strategy.
+    Providers whose circuit breaker is open are skipped while another one is
+    available. Every provider but the last is retried with the short
+    LLM_FALLBACK_ATTEMPTS / LLM_FALLBACK_DEADLINE budget before the next one
+    takes over.
+
+    Strategies (LLM_PROVIDER_STRATEGY):
+    sequential - try the providers in order, moving on when one fails
+    hedged - start the primary; if it has not succeeded after hedge_delay
+        seconds (LLM_HEDGE_DELAY, default 10), start the next provider too and
+        take the first successful result
+
+    Args:
+    call: callable - coroutine function taking an LLM and the retry_async
+        keyword options (attempts, deadline, on_error) and returning the result
+    primary: LLM - the LLM to try first, if any
+    providers: list - the provider names, in order of preference
+    strategy: str - "sequential" or "hedged"
+    hedge_delay: float - the delay before a hedged request, in seconds
+
+    Returns:
+    object: the first successful result
+    """
+    providers = list(providers or ["chatgpt", "gemini"])
+    if primary is not None:
+        providers = [primary.llm_type] + [provider for provider in providers if provider != primary.llm_type]
+    strategy = strategy or os.environ.get("LLM_PROVIDER_STRATEGY", "sequential")
+    hedge_delay = hedge_delay if hedge_delay is not None else float(os.environ.get("LLM_HEDGE_DELAY", 10))
+
+    healthy = [provider for provider in providers if get_circuit_breaker(provider).available()]
+    force = not healthy
+    if force:
+        logging.error("Every LLM provider circuit is open, trying them anyway")
+        healthy = providers
+
+    def start(index):
+        return _call_provider(call, healthy[index], final=index == len(healthy) - 1, force=force)
+
+    if strategy != "hedged":
+        last_error = None
+        for index, provider in enumerate(healthy):
+            try:
+                return await start(index)
+            except Exception as e:
+                logging.error(f"Error in getting response from {provider}: {e}")
+                last_error = e
+        raise last_error
+
+    pending = {asyncio.create_task(start(0)): healthy[0]}
+    next_index = 1
+    last_error = None
+    try:
+        while pending:
+            timeout = hedge_delay if next_index < len(healthy) else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider = pending.pop(task)
+                try:
+                    return task.result()
+                except Exception as e:
+                    logging.error(f"Error in getting response from {provider}: {e}")
+                    last_error = e
+            # Nothing succeeded yet: hedge with the next provider
+            if next_index < len(healthy):
+                pending[asyncio.create_task(start(next_index))] = healthy[next_index]
+                next_index += 1
+    finally:
+        for task in pending:
+            task.cancel()
+    raise last_error
+
+
+async def _get_provider_response(llm, prompt, inputs, output_type="json", use_cache=False, cache_ttl=None,
+                                 on_delta=None, **retry_options):
+    """
+    Get the parsed response of one provider, retrying responses that do not parse
+
+    Args:
+    llm: LLM - the LLM object
+    prompt: PromptTemplate - the prompt template
+    inputs: dict - the inputs for the prompt
+    output_type: str or type - "json", "list", "str", or a pydantic schema
+        for structured output
+    use_cache: bool - whether the LLM response cache may be used
+    cache_ttl: int - how long to cache the response, in seconds
+    on_delta: callable - stream the response, passing each piece to it
+    **retry_options: retry_async options for this provider (attempts, deadline, on_error)
+
+    Returns:
+    object: the parsed response
+    """
+    response_schema = None if isinstance(output_type, str) else output_type
+
+    def parse(response):
+        # Near-valid JSON is repaired locally instead of asking the model again
+        if output_type == "json" or output_type == "list":
+            return repair_json(response)
+
+        elif response_schema is not None:
+            return parse_structured(response, response_schema)
+
+        else:
+            return response
+
+    async def attempt():
+        # Only responses that parse are cached
+        response = await llm.aget_response(prompt, inputs=inputs, use_cache=use_cache, cache_ttl=cache_ttl,
+                                           validate=parse, response_schema=response_schema, on_delta=on_delta)
+        logging.info(f"Processed response: {response}")
+        return parse(response)
+
+    # Backs off only after a failed attempt; auth and bad request errors are not retried
+    return await retry_async(attempt, name=llm.llm_type, **retry_options)
+
+
+async def get_parsed_response(llm, prompt, inputs, output_type="json", use_cache=False, cache_ttl=None,
+                              on_delta=None, strategy=None):
+    """
+    Get the parsed response to a prompt, trying the given LLM (chatgpt by
+    default) first and then the other providers, sequentially or hedged
+    depending on LLM_PROVIDER_STRATEGY. Streamed responses are never hedged,
+    so only one provider streams at a time.
+
+    Args:
+    llm: LLM - the LLM to try first
+    prompt: PromptTemplate - the prompt template
+    inputs: dict - the inputs for the prompt
+    output_type: str or type - "json", "list", "str", or a pydantic schema
+        for structured output
+    use_cache: bool - whether the LLM response cache may be used
+    cache_ttl: int - how long to cache the response, in seconds
+    on_delta: callable - stream the response, passing each piece to it
+    strategy: str - "sequential" or "hedged", overriding LLM_PROVIDER_STRATEGY
+
+    Returns:
+    object: the parsed response
+
+    Raises:
+    Exception: if every provider failed
+    """
+    async def call(provider_llm, **retry_options):
+        return await _get_provider_response(provider_llm, prompt, inputs, output_type, use_cache, cache_ttl,
+                                            on_delta, **retry_options)
+
+    try:
+        return await call_with_providers(call, primary=llm, strategy="sequential" if on_delta else strategy)
+    except Exception as e:
+        logging.error(f"Error in getting response: {e}")
+
+    raise Exception("Something went wrong. Please try again later.")
+
+
 class LLM:
     """
     Singleton class for LLM
@@ -26,22 +809,14 @@ class LLM:
 
     def __init__(self, llm="chatgpt"):
         """
-        Constructor for the LLM class
+        Constructor for the LLM class. The underlying model comes from the
+        shared client registry, so creating an LLM is cheap.
 
         Args:
         llm: str - the type of LLM to be used
 
         """
-        self.llm_type = llm
-
-        # set the LLM based on the type
-        if llm == "chatgpt":
-            self.llm = ChatOpenAI(model=os.environ.get("OPENAI_MODEL"),
-                                  temperature=1,
-                                  api_key=os.environ.get("OPENAI_KEY"))
-        elif llm == "gemini":
-            gemini.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-            self.llm = gemini.GenerativeModel(model_name="gemini-pro")
+        self.change_llm_type(llm)
 
     def change_llm_type(self, llm_type):
         """
@@ -52,12 +827,9 @@ class LLM:
         """
         self.llm_type = llm_type
         if llm_type == "chatgpt":
-            self.llm = ChatOpenAI(model=os.environ.get("OPENAI_MODEL"),
-                                  temperature=1,
-                                  api_key=os.environ.get("OPENAI_KEY"))
+            self.llm = get_chat_model()
         elif llm_type == "gemini":
-            gemini.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-            self.llm = gemini.GenerativeModel(model_name="gemini-pro")
+            self.llm = get_gemini_model()
 
     def get_response(self, prompt, inputs=None):
         """
@@ -73,12 +845,145 @@ class LLM:
 
         if self.llm_type == "chatgpt":
             chain = LLMChain(llm=self.llm, prompt=prompt)
-            response = chain.invoke(input=inputs)['text']
+            with provider_slot(self.llm_type):
+                response = chain.invoke(input=inputs)['text']
             return response
         elif self.llm_type == "gemini":
             if inputs is None:
                 inputs = {}
-            response = self.llm.generate_content(
-                prompt.invoke(inputs).to_string(),
-            )
+            with provider_slot(self.llm_type):
+                response = self.llm.generate_content(
+                    prompt.invoke(inputs).to_string(),
+                )
             return response.text
+
+    def _cache_key(self, prompt, inputs, response_schema=None):
+        """
+        Get the response cache key for a prompt and its inputs
+
+        Args:
+        prompt: PromptTemplate object for the prompt
+        inputs: dict - dictionary containing the inputs for the LLM
+        response_schema: type - the structured output schema, if any
+
+        Returns:
+        str: the cache key
+        """
+        model = getattr(self.llm, "model_name", None)
+        temperature = getattr(self.llm, "temperature", None)
+        return LLMResponseCache.key(self.llm_type, model, prompt.format(**inputs), temperature, response_schema)
+
+    async def aget_response(self, prompt, inputs=None, use_cache=False, cache_ttl=None, validate=None, response_schema=None,
+                            on_delta=None):
+        """
+        Get the response from the LLM without blocking the event loop
+
+        Args:
+        prompt: PromptTemplate object for the prompt
+        inputs: dict - dictionary containing the inputs for the LLM
+        use_cache: bool - serve and store the response in the LLM cache, if it is enabled
+        cache_ttl: int - how long to cache the response, in seconds
+        validate: callable - called with the response before it is cached; a
+            response it raises on is not cached
+        response_schema: type - ask the provider for JSON output matching this
+            pydantic model (OpenAI JSON schema, Gemini JSON mode)
+        on_delta: callable - if given, the response is streamed and this is
+            called with each piece of it; a cached response is passed in one piece.
+            Its `reset` attribute, if any, is called first, since the pieces of
+            an earlier attempt are discarded
+
+        Returns:
+        response: str - response from the LLM
+        """
+        if inputs is None:
+            inputs = {}
+        if getattr(on_delta, "reset", None) is not None:
+            on_delta.reset()
+
+        cache = get_llm_cache() if use_cache else None
+        if cache is None or not cache.enabled:
+            return await self._agenerate(prompt, inputs, response_schema, on_delta)
+
+        key = self._cache_key(prompt, inputs, response_schema)
+        response = await cache.get(key)
+        if response is not None:
+            logging.info(f"LLM cache hit for {self.llm_type}")
+            if on_delta is not None:
+                on_delta(response)
+            return response
+
+        response = await self._agenerate(prompt, inputs, response_schema, on_delta)
+        if validate is not None:
+            validate(response)
+        await cache.set(key, response, cache_ttl or int(os.environ.get("LLM_CACHE_TTL", 3600)))
+        return response
+
+    async def _agenerate(self, prompt, inputs, response_schema=None, on_delta=None):
+        """
+        Call the LLM asynchronously
+
+        Args:
+        prompt: PromptTemplate object for the prompt
+        inputs: dict - dictionary containing the inputs for the LLM
+        response_schema: type - the structured output schema, if any
+        on_delta: callable - stream the response, passing each piece to it
+
+        Returns:
+        response: str - response from the LLM
+        """
+        if on_delta is not None and response_schema is None:
+            chunks = []
+            async for chunk in self.astream_response(prompt, inputs):
+                chunks.append(chunk)
+                on_delta(chunk)
+            return "".join(chunks)
+
+        if self.llm_type == "chatgpt":
+            response_format = openai_response_format(response_schema) if response_schema else None
+            if response_format:
+                chain = prompt | self.llm.bind(response_format=response_format)
+                async with async_provider_slot(self.llm_type):
+                    response = await chain.ainvoke(inputs)
+                return response.content
+
+            chain = LLMChain(llm=self.llm, prompt=prompt)
+            async with async_provider_slot(self.llm_type):
+                response = await chain.ainvoke(input=inputs)
+            return response['text']
+        elif self.llm_type == "gemini":
+            generation_config = {"response_mime_type": "application/json"} if response_schema else None
+            async with async_provider_slot(self.llm_type):
+                response = await self.llm.generate_content_async(
+                    prompt.invoke(inputs).to_string(),
+                    generation_config=generation_config,
+                )
+            return response.text
+
+    async def astream_response(self, prompt, inputs=None):
+        """
+        Stream the response from the LLM as it is generated
+
+        Args:
+        prompt: PromptTemplate object for the prompt
+        inputs: dict - dictionary containing the inputs for the LLM
+
+        Yields:
+        str: the next piece of the response
+        """
+        if inputs is None:
+            inputs = {}
+
+        if self.llm_type == "chatgpt":
+            async with async_provider_slot(self.llm_type):
+                async for chunk in (prompt | self.llm).astream(inputs):
+                    if chunk.content:
+                        yield chunk.content
+        elif self.llm_type == "gemini":
+            async with async_provider_slot(self.llm_type):
+                response = await self.llm.generate_content_async(
+                    prompt.invoke(inputs).to_string(),
+                    stream=True,
+                )
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
@@ -0,0 +1,37 @@
+# External imports
+from fastapi import HTTPException
+
+from app.utils.atlas_client import AsyncAtlasClient
+
+
+async def find_page_or_400(collection_name, sort_fields, filter, projection=None, limit=0, after_id=None,
+                           sort_by="_id", sort_order="asc", noun="documents"):
+    """
+    Find one page of a list endpoint's documents. The paging arguments come
+    straight from the request, so bad ones are answered with a 400.
+
+    Args:
+    collection_name: str - the name of the collection
+    sort_fields: set - the fields the list may be sorted by
+    filter: dict - the filter to apply
+    projection: dict - the fields to include or exclude
+    limit: int - the page size, 0 for every remaining document
+    after_id: str - the id of the last document of the previous page
+    sort_by: str - the field to sort by
+    sort_order: str - "asc" or "desc"
+    noun: str - what the documents are called in the error message
+
+    Returns:
+    list: the documents of the page
+
+    Raises:
+    HTTPException: 400 if sort_by is not in sort_fields or find_page rejects
+        sort_order or after_id
+    """
+    if sort_by not in sort_fields:
+        raise HTTPException(status_code=400, detail=f"Cannot sort {noun} by {sort_by}")
+    try:
+        return await AsyncAtlasClient().find_page(collection_name, filter=filter, projection=projection, limit=limit,
+                                                  after_id=after_id, sort_by=sort_by, sort_order=sort_order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,122 @@
+# External imports
+import json
+import logging
+import os
+import threading
+import time
+
+from langchain_core.prompts import PromptTemplate
+
+
+PROMPTS_FILE = "app/data/prompts.json"
+
+
+class PromptRegistry:
+    """
+    In-memory copy of the prompts file. The file is read once and re-read only
+    when its modification time changes, so prompt edits are picked up without
+    a restart. The mtime is checked at most every `reload_interval` seconds.
+    """
+
+    def __init__(self, prompts_file=PROMPTS_FILE, reload_interval=None):
+        self.prompts_file = prompts_file
+        self.reload_interval = float(os.environ.get("PROMPTS_RELOAD_INTERVAL", 2)) if reload_interval is None else reload_interval
+        self._lock = threading.Lock()
+        self._prompts = {}
+        self._templates = {}
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        """
+        Reload the prompts if the file changed since the last load
+        """
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.prompts_file).st_mtime
+        except OSError as e:
+            logging.error(f"Could not stat prompts file {self.prompts_file}: {e}")
+            return
+        if mtime != self._mtime:
+            try:
+                self.reload(mtime)
+            except (OSError, ValueError) as e:
+                # e.g. the file was caught mid-write; it is read again on the next check
+                logging.error(f"Could not reload prompts file {self.prompts_file}, keeping the loaded prompts: {e}")
+
+    def reload(self, mtime=None):
+        """
+        Read the prompts file and drop the compiled templates. If the file
+        cannot be read or parsed, the loaded prompts are kept.
+
+        Args:
+        mtime: float - the modification time of the file, if already known
+
+        Returns:
+        int: the number of prompts loaded
+
+        Raises:
+        OSError: if the file cannot be read
+        ValueError: if the file is not valid JSON
+        """
+        with self._lock:
+            with open(self.prompts_file, "r") as file:
+                prompts = json.load(file)
+            self._prompts = prompts
+            self._templates = {}
+            self._mtime = os.stat(self.prompts_file).st_mtime if mtime is None else mtime
+            self._checked_at = time.monotonic()
+        logging.info(f"Loaded {len(prompts)} prompts from {self.prompts_file}")
+        return len(prompts)
+
+    def get(self, prompt_name):
+        """
+        Get the text of a prompt
+
+        Args:
+        prompt_name: str - the name of the prompt
+
+        Returns:
+        str: the prompt text, or "" if there is no such prompt
+        """
+        self._refresh()
+        prompt = self._prompts.get(prompt_name)
+        if prompt is None:
+            logging.error(f"Prompt {prompt_name} not found")
+            return ""
+        return prompt
+
+    def template(self, prompt_name):
+        """
+        Get the compiled PromptTemplate of a prompt. Templates are built once
+        per prompt and reused until the file changes.
+
+        Args:
+        prompt_name: str - the name of the prompt
+
+        Returns:
+        PromptTemplate: the prompt template
+        """
+        self._refresh()
+        template = self._templates.get(prompt_name)
+        if template is None:
+            template = PromptTemplate.from_template(self.get(prompt_name))
+            self._templates[prompt_name] = template
+        return template
+
+    def names(self):
+        """
+        Get the names of the available prompts
+
+        Returns:
+        list: the prompt names
+        """
+        self._refresh()
+        return sorted(self._prompts)
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,97 @@
+# External imports
+import functools
+import inspect
+
+import orjson
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from fastapi.encoders import ENCODERS_BY_TYPE
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+
+
+# Anything that still goes through FastAPI's jsonable_encoder (response_model
+# routes, HTTPException details, ...) should render ObjectIds the same way.
+ENCODERS_BY_TYPE[ObjectId] = str
+ENCODERS_BY_TYPE[Decimal128] = str
+
+
+def _default(obj):
+    """
+    Encode the BSON types orjson does not know about
+
+    Args:
+    obj: object - the value orjson could not serialize
+
+    Returns:
+    str: the JSON representation of the value
+    """
+    if isinstance(obj, (ObjectId, Decimal128)):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    """
+    Serialize a value that may contain MongoDB documents to JSON
+
+    Args:
+    content: object - the value to serialize
+
+    Returns:
+    bytes: the JSON document
+    """
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class BSONJSONResponse(JSONResponse):
+    """
+    JSON response that serializes MongoDB documents directly with orjson.
+    ObjectIds become their hex string and datetimes ISO 8601 strings, so
+    services can return documents as they come out of the database.
+    """
+
+    def render(self, content):
+        return dumps(content)
+
+
+def _render_with(endpoint, status_code):
+    """
+    Wrap an endpoint so plain return values are rendered by BSONJSONResponse
+
+    Args:
+    endpoint: callable - the route endpoint
+    status_code: int - the status code declared on the route
+
+    Returns:
+    callable: the wrapped endpoint, with the same signature
+    """
+    def _as_response(result):
+        if isinstance(result, Response):
+            return result
+        return BSONJSONResponse(result, status_code=status_code or 200)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            return _as_response(await endpoint(*args, **kwargs))
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return _as_response(endpoint(*args, **kwargs))
+    wrapper.renders_bson = True
+    return wrapper
+
+
+class BSONRoute(APIRoute):
+    """
+    Route class that skips FastAPI's jsonable_encoder pass for routes without
+    a response_model. jsonable_encoder rebuilds every dict and list of the
+    response in Python before the response class gets to it, which is the
+    same cost the old per-service ObjectId converters had.
+    """
+
+    def get_route_handler(self):
+        if self.response_model is None and not getattr(self.dependant.call, "renders_bson", False):
+            self.dependant.call = _render_with(self.dependant.call, self.status_code)
+        return super().get_route_handler()
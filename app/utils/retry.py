@@ -0,0 +1,143 @@
+# External imports
+from collections import Counter
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+import openai
+from google.api_core import exceptions as google_exceptions
+
+
+# Error classes returned by classify_error
+RATE_LIMIT = "rate_limit"
+TIMEOUT = "timeout"
+SERVER = "server"
+PARSE = "parse"
+AUTH = "auth"
+BAD_REQUEST = "bad_request"
+UNKNOWN = "unknown"
+
+# Errors that another attempt cannot fix
+NON_RETRYABLE = {AUTH, BAD_REQUEST}
+
+_ERROR_TYPES = [
+    (RATE_LIMIT, (openai.RateLimitError, google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)),
+    (TIMEOUT, (openai.APITimeoutError, asyncio.TimeoutError, google_exceptions.DeadlineExceeded)),
+    (AUTH, (openai.AuthenticationError, openai.PermissionDeniedError,
+            google_exceptions.Unauthenticated, google_exceptions.PermissionDenied)),
+    (BAD_REQUEST, (openai.BadRequestError, openai.NotFoundError, google_exceptions.InvalidArgument)),
+    (SERVER, (openai.APIConnectionError, openai.InternalServerError,
+              google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError)),
+    (PARSE, (json.JSONDecodeError, ValueError, SyntaxError)),
+]
+
+# Attempt outcomes per operation name, e.g. ("chatgpt", "rate_limit")
+retry_metrics = Counter()
+
+
+class RetryError(Exception):
+    """
+    Raised when every attempt failed, the deadline passed or the error was
+    not retryable
+
+    Attributes:
+    error_class: str - the class of the last error
+    attempts: int - the number of attempts made
+    """
+
+    def __init__(self, message, error_class, attempts):
+        super().__init__(message)
+        self.error_class = error_class
+        self.attempts = attempts
+
+
+def classify_error(error):
+    """
+    Classify an exception raised by an LLM call
+
+    Args:
+    error: Exception - the exception
+
+    Returns:
+    str: one of RATE_LIMIT, TIMEOUT, SERVER, PARSE, AUTH, BAD_REQUEST, UNKNOWN
+    """
+    for error_class, types in _ERROR_TYPES:
+        if isinstance(error, types):
+            return error_class
+    return UNKNOWN
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    """
+    Get the delay before the next attempt, using exponential backoff with
+    full jitter
+
+    Args:
+    attempt: int - the number of failed attempts so far, starting at 1
+    base_delay: float - the delay after the first failure, in seconds
+    max_delay: float - the largest delay, in seconds
+
+    Returns:
+    float: the delay in seconds
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+async def retry_async(func, *args, name="llm", attempts=None, deadline=None, base_delay=None, max_delay=None,
+                      on_error=None, **kwargs):
+    """
+    Call an async function until it succeeds. The first attempt runs
+    immediately; later attempts wait with exponential backoff and jitter.
+    Auth and bad request errors are raised at once. Each attempt is bounded
+    by the time left before the deadline.
+
+    Args:
+    func: callable - the coroutine function to call
+    *args: the positional arguments for func
+    name: str - the operation name used in logs and retry_metrics
+    attempts: int - the maximum number of attempts (LLM_RETRY_ATTEMPTS, default 5)
+    deadline: float - the total time budget in seconds (LLM_RETRY_DEADLINE, default 300)
+    base_delay: float - the delay after the first failure (LLM_RETRY_BASE_DELAY, default 1)
+    max_delay: float - the largest delay (LLM_RETRY_MAX_DELAY, default 30)
+    on_error: callable - called with the exception of every failed attempt
+    **kwargs: the keyword arguments for func
+
+    Returns:
+    object: the result of func
+    """
+    attempts = attempts or int(os.environ.get("LLM_RETRY_ATTEMPTS", 5))
+    deadline = deadline or float(os.environ.get("LLM_RETRY_DEADLINE", 300))
+    base_delay = base_delay or float(os.environ.get("LLM_RETRY_BASE_DELAY", 1))
+    max_delay = max_delay or float(os.environ.get("LLM_RETRY_MAX_DELAY", 30))
+
+    expires_at = time.monotonic() + deadline
+    error_class = UNKNOWN
+    for attempt in range(1, attempts + 1):
+        remaining = expires_at - time.monotonic()
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout=remaining)
+            retry_metrics[(name, "success")] += 1
+            return result
+        except Exception as e:
+            error_class = classify_error(e)
+            retry_metrics[(name, error_class)] += 1
+            logging.error(f"{name} attempt {attempt}/{attempts} failed ({error_class}): {e}")
+            if on_error is not None:
+                on_error(e)
+            if error_class in NON_RETRYABLE:
+                raise RetryError(f"{name} failed with a non-retryable error: {e}", error_class, attempt) from e
+            last_error = e
+
+        if attempt == attempts:
+            break
+        delay = backoff_delay(attempt, base_delay, max_delay)
+        if time.monotonic() + delay >= expires_at:
+            retry_metrics[(name, "deadline")] += 1
+            raise RetryError(f"{name} ran out of time after {attempt} attempts", error_class, attempt) from last_error
+        await asyncio.sleep(delay)
+
+    retry_metrics[(name, "exhausted")] += 1
+    raise RetryError(f"{name} failed after {attempts} attempts", error_class, attempts) from last_error
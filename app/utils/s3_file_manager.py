@@ -1,19 +1,129 @@
 # External imports
-from pathlib import Path
+import io
 import os
 import boto3
 import tempfile
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, ClientError
 import logging
 import tempfile
 from dotenv import load_dotenv
 import os
 from fastapi import UploadFile
-import time
+from urllib.parse import quote
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Load the environment variables
 load_dotenv()
 
+# One client and connection pool per process, shared by every S3FileManager.
+# S3_MAX_WORKERS bounds the threads running blocking boto3 calls for the
+# async methods; it should not exceed the connection pool size.
+_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 50))
+_MAX_WORKERS = int(os.environ.get("S3_MAX_WORKERS", 16))
+
+# Uploads larger than one part go up as multipart uploads. At most
+# S3_UPLOAD_CONCURRENCY parts of S3_UPLOAD_PART_SIZE bytes are in memory
+# per upload, whatever the size of the file.
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.environ.get("S3_UPLOAD_PART_SIZE", 8 * 1024 * 1024)),
+    multipart_chunksize=int(os.environ.get("S3_UPLOAD_PART_SIZE", 8 * 1024 * 1024)),
+    max_concurrency=int(os.environ.get("S3_UPLOAD_CONCURRENCY", 4)),
+)
+
+# Objects are made public by the request that writes them. Set
+# S3_OBJECT_ACL to an empty string when the bucket policy makes them public
+# instead (buckets with ACLs disabled reject requests that set one).
+_OBJECT_ACL = os.environ.get("S3_OBJECT_ACL", "public-read")
+_ACL_ARGS = {"ACL": _OBJECT_ACL} if _OBJECT_ACL else {}
+
+# S3 verifies every part against a checksum computed while it is read
+_UPLOAD_ARGS = {"ChecksumAlgorithm": "SHA256", **_ACL_ARGS}
+
+# Downloads into a file object are kept in memory up to S3_SPOOL_SIZE bytes
+# and spill to disk beyond that; open_reader yields chunks of _CHUNK_SIZE
+_SPOOL_SIZE = int(os.environ.get("S3_SPOOL_SIZE", 8 * 1024 * 1024))
+_CHUNK_SIZE = 1024 * 1024
+
+_PUBLIC_URL = os.environ.get("S3_PUBLIC_URL", "https://qucoursify.s3.us-east-1.amazonaws.com").rstrip("/")
+
+# copy_object accepts sources up to 5 GB; larger objects are copied in
+# parts of S3_COPY_PART_SIZE bytes with upload_part_copy
+_MAX_COPY_SIZE = 5 * 1024 ** 3
+_COPY_PART_SIZE = int(os.environ.get("S3_COPY_PART_SIZE", 512 * 1024 * 1024))
+
+_client = None
+_executor = None
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def _reset_after_fork():
+    """
+    Drops the client and executor inherited from the parent process. Neither
+    the connection pool nor the executor's threads survive a fork.
+    """
+    global _client, _executor, _lock, _pid
+    _client = None
+    _executor = None
+    _lock = threading.Lock()
+    _pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_s3_client():
+    """
+    Get the shared S3 client
+
+    Returns:
+    S3.Client: the process-wide boto3 S3 client
+    """
+    global _client
+    if _pid != os.getpid():
+        _reset_after_fork()
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = boto3.client(
+                    's3',
+                    aws_access_key_id=os.environ.get("AWS_ACCESS_KEY"),
+                    aws_secret_access_key=os.environ.get("AWS_SECRET_KEY"),
+                    config=Config(max_pool_connections=_MAX_POOL_CONNECTIONS,
+                                  retries={"max_attempts": 5, "mode": "standard"})
+                )
+    return _client
+
+
+def get_public_url(key):
+    """
+    Get the public URL of an object
+
+    Args:
+    key: str - key of the object in the S3 bucket, not URL-encoded
+
+    Returns:
+    str: the URL the object is served from
+    """
+    return f"{_PUBLIC_URL}/{quote(key)}"
+
+
+def _get_executor():
+    global _executor
+    if _pid != os.getpid():
+        _reset_after_fork()
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="s3")
+    return _executor
+
 
 class S3FileManager:
     """
@@ -28,7 +138,7 @@ class S3FileManager:
     bucket_name: str
         The name of the bucket.
     s3_client: S3 client
-        The S3 client.
+        The shared S3 client.
 
 
     Methods:
@@ -41,15 +151,38 @@ class S3FileManager:
         List all files in the S3 bucket with the given key.
     download_file(key, download_path)
         Download a file from S3.
+    download_file_obj(key, file_obj)
+        Download a file from S3 into a file object.
+    head_object(key)
+        Get the metadata of an object in S3.
+    existing_keys(keys)
+        Find which of the given keys exist in S3.
+    copy_files(copies)
+        Copy many files in S3 in parallel.
     delete_file(key)
         Delete a file from S3.
+    delete_files(keys)
+        Delete many files from S3.
     upload_file_from_bytes(data, key)
         Upload a file to S3 from bytes.
     download_file_to_bytes(key)
         Download a file from S3 to bytes.
+    download_file_to_spool(key)
+        Download a file from S3 into a spooled temporary file.
+    open_reader(key)
+        Open an object in S3 for streaming in chunks.
     get_object(key)
         Get an object from S3.
 
+    Uploads and copies are made public by the write request itself, so
+    make_object_public is only needed for objects written elsewhere. Use
+    get_public_url(key) for their links.
+
+    The blocking methods have non-blocking counterparts prefixed with "a"
+    (acopy_file, acopy_files, adelete_file, adelete_files, adownload_file,
+    adownload_file_obj, adownload_file_to_spool, ahead_object, aget_object,
+    alist_files) that run on a bounded thread pool.
+    Creating an S3FileManager is cheap: all instances share one client.
     """
 
     def __init__(self):
@@ -61,11 +194,22 @@ class S3FileManager:
         self.aws_access_key_id = os.environ.get("AWS_ACCESS_KEY")
         self.aws_secret_access_key = os.environ.get("AWS_SECRET_KEY")
         self.bucket_name = os.environ.get("AWS_BUCKET_NAME")
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key
-        )
+        self.s3_client = get_s3_client()
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        Run a blocking call on the S3 thread pool
+
+        Args:
+        func: callable - the blocking function
+        *args: the positional arguments for func
+        **kwargs: the keyword arguments for func
+
+        Returns:
+        object: the return value of func
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
 
     def upload_file_obj(self, file_obj, key):
         """
@@ -79,8 +223,8 @@ class S3FileManager:
         bool: True if the file was uploaded successfully, False otherwise
         """
         try:
-            self.s3_client.upload_fileobj(file_obj, self.bucket_name, key)
-            self.make_object_public(key)
+            self.s3_client.upload_fileobj(file_obj, self.bucket_name, key,
+                                          ExtraArgs=_UPLOAD_ARGS, Config=_TRANSFER_CONFIG)
             return True
         except FileNotFoundError:
             logging.error("The file was not found")
@@ -93,10 +237,21 @@ class S3FileManager:
             return False
         
     async def upload_file_from_frontend(self, file: UploadFile, key):
+        """
+        Upload an uploaded file to S3, streaming it from its spooled file in
+        parts rather than reading it into memory
+
+        Args:
+        file: UploadFile - the uploaded file, uploaded from the start
+        key: str - key to be used in the S3 bucket
+
+        Returns:
+        bool: True if the file was uploaded successfully, False otherwise
+        """
         try:
-            file_content = await file.read()
-            self.s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=file_content)
-            self.make_object_public(key)
+            await file.seek(0)
+            await self._run(self.s3_client.upload_fileobj, file.file, self.bucket_name, key,
+                            ExtraArgs=_UPLOAD_ARGS, Config=_TRANSFER_CONFIG)
             return True
         except FileNotFoundError:
             logging.error("The file was not found")
@@ -120,9 +275,12 @@ class S3FileManager:
         Returns:
         bool: True if the file was uploaded successfully, False otherwise
         """
+        return await self._run(self._upload_file, file_path, key)
+
+    def _upload_file(self, file_path, key):
         try:
-            self.s3_client.upload_file(file_path, self.bucket_name, key)
-            self.make_object_public(key)
+            self.s3_client.upload_file(file_path, self.bucket_name, key,
+                                       ExtraArgs=_UPLOAD_ARGS, Config=_TRANSFER_CONFIG)
             return True
         except FileNotFoundError:
             logging.error("The file was not found")
@@ -136,7 +294,7 @@ class S3FileManager:
 
     def upload_temp_file(self, file, key):
         """
-        Upload a temporary file to S3
+        Upload a temporary file to S3 straight from memory
 
         Args:
         file: bytes - file data to be uploaded
@@ -145,24 +303,16 @@ class S3FileManager:
         Returns:
         bool: True if the file was uploaded successfully, False otherwise
         """
-        try:
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file.write(file)
-                temp_file.close()
-                self.upload_file(temp_file.name, key)
-                os.unlink(temp_file.name)
-            return True
-        except NoCredentialsError:
-            logging.error("Credentials not available")
-            return False
-        except ClientError as e:
-            logging.error(e)
-            return False
+        return self.upload_file_from_bytes(file, key)
         
     def make_object_public(self, key):
+        # With S3_OBJECT_ACL empty the bucket policy makes objects public,
+        # and buckets with ACLs disabled reject put_object_acl
+        if not _OBJECT_ACL:
+            return True
         try:
             self.s3_client.put_object_acl(
-                ACL='public-read', Bucket=self.bucket_name, Key=key)
+                ACL=_OBJECT_ACL, Bucket=self.bucket_name, Key=key)
             logging.info(
                 f"Object '{key}' made public in S3 bucket '{self.bucket_name}'")
             return True
@@ -184,17 +334,69 @@ class S3FileManager:
         Returns:
         bool: True if the file was copied successfully, False otherwise
         """
+        return self._copy_object(source_key, destination_key)["copied"]
+
+    def copy_files(self, copies):
+        """
+        Copy many files in S3 in parallel. Each copy is made public in the
+        copy request itself, like every other write.
+
+        Args:
+        copies: list - (source_key, destination_key) pairs
+
+        Returns:
+        list: one dict per pair, in the same order, with the source_key,
+            destination_key, whether it was copied and the error if it was not
+        """
+        if not copies:
+            return []
+        return list(_get_executor().map(lambda copy: self._copy_object(*copy), copies))
+
+    def _copy_object(self, source_key, destination_key):
+        result = {"source_key": source_key, "destination_key": destination_key, "copied": False, "error": None}
+        copy_source = {"Bucket": self.bucket_name, "Key": source_key}
         try:
-            self.s3_client.copy_object(
-                Bucket=self.bucket_name, CopySource=f"{self.bucket_name}/{source_key}", Key=destination_key)
-            self.make_object_public(destination_key)
-            return True
-        except NoCredentialsError:
+            try:
+                self.s3_client.copy_object(Bucket=self.bucket_name, CopySource=copy_source,
+                                           Key=destination_key, **_ACL_ARGS)
+            except ClientError as e:
+                # Sources over 5 GB are rejected as an InvalidRequest
+                if e.response.get("Error", {}).get("Code") != "InvalidRequest":
+                    raise
+                size = self.s3_client.head_object(Bucket=self.bucket_name, Key=source_key)["ContentLength"]
+                if size <= _MAX_COPY_SIZE:
+                    raise
+                self._copy_object_in_parts(copy_source, destination_key, size)
+            result["copied"] = True
+        except NoCredentialsError as e:
             logging.error("Credentials not available")
-            return False
+            result["error"] = str(e)
         except ClientError as e:
             logging.error(e)
-            return False
+            result["error"] = str(e)
+        return result
+
+    def _copy_object_in_parts(self, copy_source, destination_key, size):
+        upload_id = self.s3_client.create_multipart_upload(
+            Bucket=self.bucket_name, Key=destination_key, **_ACL_ARGS)["UploadId"]
+
+        def copy_part(part):
+            number, start = part
+            end = min(start + _COPY_PART_SIZE, size) - 1
+            response = self.s3_client.upload_part_copy(
+                Bucket=self.bucket_name, Key=destination_key, CopySource=copy_source,
+                CopySourceRange=f"bytes={start}-{end}", PartNumber=number, UploadId=upload_id)
+            return {"ETag": response["CopyPartResult"]["ETag"], "PartNumber": number}
+
+        try:
+            with ThreadPoolExecutor(max_workers=_TRANSFER_CONFIG.max_concurrency) as pool:
+                parts = list(pool.map(copy_part, enumerate(range(0, size, _COPY_PART_SIZE), 1)))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=destination_key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts})
+        except Exception:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=destination_key, UploadId=upload_id)
+            raise
 
     def list_files(self, key):
         """
@@ -239,6 +441,76 @@ class S3FileManager:
             logging.error(e)
             return False
 
+    def download_file_obj(self, key, file_obj):
+        """
+        Download a file from S3 into a file object
+
+        Args:
+        key: str - key of the file in the S3 bucket
+        file_obj: file object - writable binary file object
+
+        Returns:
+        bool: True if the file was downloaded successfully, False otherwise
+        """
+        try:
+            self.s3_client.download_fileobj(self.bucket_name, key, file_obj)
+            return True
+        except NoCredentialsError:
+            logging.error("Credentials not available")
+            return False
+        except ClientError as e:
+            logging.error(e)
+            return False
+
+    def head_object(self, key):
+        """
+        Get the metadata of an object in S3 without downloading it
+
+        Args:
+        key: str - key of the object in the S3 bucket
+
+        Returns:
+        dict: the object metadata (ETag, ContentLength, ...), or None if it could not be read
+        """
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except NoCredentialsError:
+            logging.error("Credentials not available")
+            return None
+        except ClientError as e:
+            logging.error(e)
+            return None
+
+    def existing_keys(self, keys):
+        """
+        Find which of the given keys exist in S3, listing each of their
+        folders once instead of asking for every object
+
+        Args:
+        keys: list - keys of objects in the S3 bucket
+
+        Returns:
+        set: the keys that exist. If a folder cannot be listed, all of its
+            keys are taken to exist, so that none is ever taken to be absent
+        """
+        prefixes = {}
+        for key in keys:
+            prefixes.setdefault(key.rpartition("/")[0] + "/", set()).add(key)
+
+        existing = set()
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for prefix, wanted in prefixes.items():
+            try:
+                for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                    existing.update(item["Key"] for item in page.get("Contents", []) if item["Key"] in wanted)
+            except NoCredentialsError:
+                logging.error("Credentials not available")
+                existing.update(wanted)
+            except ClientError as e:
+                logging.error(e)
+                existing.update(wanted)
+        return existing
+
     def delete_file(self, key):
         """
         Delete a file from S3
@@ -259,9 +531,37 @@ class S3FileManager:
             logging.error(e)
             return False
 
+    def delete_files(self, keys):
+        """
+        Delete many files from S3, up to 1000 per request
+
+        Args:
+        keys: list - keys of the files in the S3 bucket
+
+        Returns:
+        bool: True if every file was deleted successfully, False otherwise
+        """
+        try:
+            deleted = True
+            for start in range(0, len(keys), 1000):
+                response = self.s3_client.delete_objects(Bucket=self.bucket_name, Delete={
+                    "Objects": [{"Key": key} for key in keys[start:start + 1000]], "Quiet": True})
+                for error in response.get("Errors", []):
+                    logging.error(f"Could not delete {error.get('Key')}: {error.get('Message')}")
+                    deleted = False
+            return deleted
+        except NoCredentialsError:
+            logging.error("Credentials not available")
+            return False
+        except ClientError as e:
+            logging.error(e)
+            return False
+
     def upload_file_from_bytes(self, data, key):
         """
-        Upload a file to S3 from bytes
+        Upload a file to S3 from bytes, without writing them to disk. The
+        data is already in memory; it is sent in parts of S3_UPLOAD_PART_SIZE
+        bytes, so the transfer holds no second copy of it whatever its size.
 
         Args:
         data: bytes - data to be uploaded
@@ -271,11 +571,8 @@ class S3FileManager:
         bool: True if the file was uploaded successfully, False otherwise
         """
         try:
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file.write(data)
-                temp_file.close()
-                self.upload_file(temp_file.name, key)
-                os.unlink(temp_file.name)
+            self.s3_client.upload_fileobj(io.BytesIO(data), self.bucket_name, key,
+                                          ExtraArgs=_UPLOAD_ARGS, Config=_TRANSFER_CONFIG)
             return True
         except NoCredentialsError:
             logging.error("Credentials not available")
@@ -286,28 +583,57 @@ class S3FileManager:
 
     def download_file_to_bytes(self, key):
         """
-        Download a file from S3 to bytes
+        Download a file from S3 to bytes. Files up to S3_SPOOL_SIZE bytes are
+        downloaded in memory; larger ones are downloaded to a temporary file
+        first, so only the returned bytes are held in memory.
 
         Args:
         key: str - key of the file in the S3 bucket
 
         Returns:
-        bytes: data of the file
+        bytes: data of the file, or False if it could not be downloaded
         """
-        try:
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file.close()
-                self.download_file(key, temp_file.name)
-                with open(temp_file.name, 'rb') as f:
-                    data = f.read()
-                os.unlink(temp_file.name)
-            return data
-        except NoCredentialsError:
-            logging.error("Credentials not available")
-            return False
-        except ClientError as e:
-            logging.error(e)
+        spool = self.download_file_to_spool(key)
+        if spool is None:
             return False
+        with spool:
+            return spool.read()
+
+    def download_file_to_spool(self, key):
+        """
+        Download a file from S3 into a temporary file object that stays in
+        memory up to S3_SPOOL_SIZE bytes and spills to disk beyond that
+
+        Args:
+        key: str - key of the file in the S3 bucket
+
+        Returns:
+        SpooledTemporaryFile: the file, rewound, or None if it could not be downloaded
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE)
+        if not self.download_file_obj(key, spool):
+            spool.close()
+            return None
+        spool.seek(0)
+        return spool
+
+    async def open_reader(self, key, chunk_size=_CHUNK_SIZE):
+        """
+        Open an object in S3 for streaming. The object is read chunk by
+        chunk as the reader is iterated, so it is never held in memory as a
+        whole.
+
+        Args:
+        key: str - key of the object in the S3 bucket
+        chunk_size: int - the size of the chunks to yield
+
+        Returns:
+        S3Reader: an async iterator over the object's bytes, or None if the object could not be read
+        """
+        response = await self.aget_object(key)
+        if response is None:
+            return None
+        return S3Reader(self, key, response, chunk_size)
 
     def get_object(self, key):
         """
@@ -346,7 +672,7 @@ class S3FileManager:
                 for file in files:
                     file_path = os.path.join(root, file)
                     s3_key = key + file_path[len(directory_path):]
-                    self.upload_file(file_path, s3_key)
+                    self._upload_file(file_path, s3_key)
             return True
         except NoCredentialsError:
             logging.error("Credentials not available")
@@ -382,49 +708,26 @@ class S3FileManager:
 
     async def save_mp3_and_upload(self, audio_data, key):
         """
-        Save the MP3 data to a file and upload it to S3.
-        
+        Upload MP3 data to S3 straight from memory.
+
         Args:
         audio_data: bytes - The audio data (MP3).
         key: str - The key under which to store the file in S3.
-        
+
         Returns:
         bool: True if the upload succeeded, False otherwise.
         """
         try:
-            # Define the folder where you want to save the file
-            folder_path = "mp3_files"
-            Path(folder_path).mkdir(parents=True, exist_ok=True)  # Create the folder if it doesn't exist
-            
-            # Create a unique filename using the current timestamp
-            file_name = f"podcast_audio_{int(time.time())}.mp3"
-            file_path = os.path.join(folder_path, file_name)
-            
-            # Write the audio data to an MP3 file
-            with open(file_path, 'wb') as f:
-                f.write(audio_data)
-
-            # Upload the file asynchronously
-            success = await self.async_upload_file(file_path, key)
-            
-            if success:
-                logging.info(f"Successfully uploaded file to S3 with key: {key}")
-                return True
-            else:
-                logging.error(f"Failed to upload file to S3 with key: {key}")
-                return False
-
+            await self._run(self.s3_client.upload_fileobj, io.BytesIO(audio_data), self.bucket_name, key,
+                            ExtraArgs={**_UPLOAD_ARGS, "ContentType": "audio/mpeg"}, Config=_TRANSFER_CONFIG)
+            logging.info(f"Successfully uploaded file to S3 with key: {key}")
+            return True
         except Exception as e:
-            logging.error(f"Error saving and uploading MP3: {e}")
-            return False  # Return False if there's an exception
-
-        finally:
-            # Clean up: Delete the file after uploading
-            if 'file_path' in locals() and os.path.exists(file_path):
-                os.remove(file_path)
+            logging.error(f"Error uploading MP3 to S3 with key {key}: {e}")
+            return False
 
 
-    def async_upload_file(self, file_path, key):
+    async def async_upload_file(self, file_path, key):
         """
         Upload a file to S3.
 
@@ -437,12 +740,142 @@ class S3FileManager:
         """
         try:
             # Upload the file to S3
-            response = self.s3_client.upload_file(file_path, self.bucket_name, key)
+            await self._run(self.s3_client.upload_file, file_path, self.bucket_name, key,
+                            ExtraArgs=_UPLOAD_ARGS, Config=_TRANSFER_CONFIG)
             logging.info(f"Successfully uploaded file to S3 with key: {key}")
             return True
         except Exception as e:
             logging.error(f"Error uploading file to S3: {e}")
             return False
 
-        
-    
\ No newline at end of file
+    async def acopy_file(self, source_key, destination_key):
+        """
+        Copy a file in S3 without blocking the event loop. See copy_file.
+        """
+        return await self._run(self.copy_file, source_key, destination_key)
+
+    async def acopy_files(self, copies):
+        """
+        Copy many files in S3 in parallel without blocking the event loop.
+        See copy_files.
+        """
+        return list(await asyncio.gather(*(self._run(self._copy_object, source_key, destination_key)
+                                           for source_key, destination_key in copies)))
+
+    async def acopy_files_or_undo(self, copies):
+        """
+        Copy many files in S3 in parallel, all or nothing. If any copy fails,
+        the copies that created a new object are deleted again; destinations
+        that already existed are left in place rather than deleted.
+
+        Args:
+        copies: list - (source_key, destination_key) pairs
+
+        Returns:
+        bool: True if every file was copied, False otherwise
+        """
+        existed = await self._run(self.existing_keys, [destination_key for _, destination_key in copies])
+        results = await self.acopy_files(copies)
+        if all(result["copied"] for result in results):
+            return True
+        created = [result["destination_key"] for result in results
+                   if result["copied"] and result["destination_key"] not in existed]
+        if created:
+            await self.adelete_files(created)
+        return False
+
+    async def adelete_files(self, keys):
+        """
+        Delete many files from S3 without blocking the event loop. See delete_files.
+        """
+        return await self._run(self.delete_files, keys)
+
+    async def adelete_file(self, key):
+        """
+        Delete a file from S3 without blocking the event loop. See delete_file.
+        """
+        return await self._run(self.delete_file, key)
+
+    async def adownload_file(self, key, download_path):
+        """
+        Download a file from S3 without blocking the event loop. See download_file.
+        """
+        return await self._run(self.download_file, key, download_path)
+
+    async def adownload_file_obj(self, key, file_obj):
+        """
+        Download a file from S3 into a file object without blocking the event
+        loop. See download_file_obj.
+        """
+        return await self._run(self.download_file_obj, key, file_obj)
+
+    async def ahead_object(self, key):
+        """
+        Get the metadata of an object in S3 without blocking the event loop.
+        See head_object.
+        """
+        return await self._run(self.head_object, key)
+
+    async def aget_object(self, key):
+        """
+        Get an object from S3 without blocking the event loop. See get_object.
+        """
+        return await self._run(self.get_object, key)
+
+    async def adownload_file_to_spool(self, key):
+        """
+        Download a file from S3 into a spooled temporary file without
+        blocking the event loop. See download_file_to_spool.
+        """
+        return await self._run(self.download_file_to_spool, key)
+
+    async def alist_files(self, key):
+        """
+        List the files with the given key without blocking the event loop.
+        See list_files.
+        """
+        return await self._run(self.list_files, key)
+
+
+class S3Reader:
+    """
+    An object in S3, read chunk by chunk on the S3 thread pool as it is
+    iterated with `async for`. The connection is released once the object
+    has been read or the reader is closed.
+
+    Attributes:
+    -----------
+    key: str
+        The key of the object.
+    content_type: str
+        The Content-Type of the object, if S3 has one.
+    content_length: int
+        The size of the object in bytes.
+    """
+
+    def __init__(self, s3_file_manager, key, response, chunk_size):
+        self.key = key
+        self.content_type = response.get("ContentType")
+        self.content_length = response.get("ContentLength")
+        self._s3_file_manager = s3_file_manager
+        self._body = response["Body"]
+        self._chunk_size = chunk_size
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        try:
+            while True:
+                chunk = await self._s3_file_manager._run(self._body.read, self._chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Release the connection without reading the rest of the object.
+        """
+        self._body.close()
@@ -0,0 +1,130 @@
+# External imports
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+
+from fastapi import UploadFile
+from fastapi.responses import StreamingResponse
+
+from app.utils.responses import dumps
+
+
+# Uploads larger than this are buffered on disk instead of in memory
+_SPOOL_SIZE = int(os.environ.get("UPLOAD_SPOOL_SIZE", 8 * 1024 * 1024))
+
+# Generations still running after their client disconnected
+_detached = set()
+
+
+def sse_event(data, event=None):
+    """
+    Format a server-sent event
+
+    Args:
+    data: object - the payload, serialized to JSON
+    event: str - the event name
+
+    Returns:
+    str: the event, terminated by a blank line
+    """
+    message = f"data: {dumps(data).decode('utf-8')}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+
+async def buffer_uploads(files):
+    """
+    Copy uploaded files so they outlive the request. Starlette closes the
+    request's UploadFiles once the endpoint returns, before a streaming
+    response has finished. The copies are made on a worker thread, since
+    large uploads spill to disk.
+
+    Args:
+    files: list - the uploaded files
+
+    Returns:
+    list: UploadFiles backed by spooled temporary files, or None if there were no files
+    """
+    if not files:
+        return files
+    buffered = []
+    for file in files:
+        spool = await asyncio.to_thread(_copy_to_spool, file.file)
+        buffered.append(UploadFile(file=spool, filename=file.filename, headers=file.headers))
+    return buffered
+
+
+def _copy_to_spool(file_obj):
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE)
+    file_obj.seek(0)
+    shutil.copyfileobj(file_obj, spool)
+    spool.seek(0)
+    return spool
+
+
+def stream_generation(func, *args, detach=False, **kwargs):
+    """
+    Run a generator function and stream its text to the client as
+    server-sent events. func is called with an `on_delta` callback; every
+    chunk it reports is sent as a `delta` event, followed by a `done` event
+    with func's return value, or an `error` event if it raised. When a retry
+    or another provider starts over after deltas were sent, a `reset` event
+    tells the client to discard the text it has received so far. The
+    callback's `reset` attribute is called at the start of every attempt.
+
+    Args:
+    func: callable - the coroutine function accepting on_delta
+    *args: the positional arguments for func
+    detach: bool - keep running func if the client disconnects, for
+        generations that persist their result; otherwise it is cancelled
+    **kwargs: the keyword arguments for func
+
+    Returns:
+    StreamingResponse: the text/event-stream response
+    """
+    queue = asyncio.Queue()
+    sent = False
+
+    def on_delta(text):
+        nonlocal sent
+        sent = True
+        queue.put_nowait(("delta", {"text": text}))
+
+    def reset():
+        nonlocal sent
+        if sent:
+            sent = False
+            queue.put_nowait(("reset", {}))
+
+    on_delta.reset = reset
+
+    async def produce():
+        try:
+            result = await func(*args, on_delta=on_delta, **kwargs)
+            queue.put_nowait(("done", result))
+        except Exception as e:
+            logging.error(f"Error in streaming {func.__name__}: {e}")
+            queue.put_nowait(("error", {"detail": "Something went wrong. Please try again later."}))
+
+    async def events():
+        task = asyncio.ensure_future(produce())
+        try:
+            while True:
+                event, data = await queue.get()
+                yield sse_event(data, event)
+                if event not in ("delta", "reset"):
+                    break
+        finally:
+            if task.done():
+                pass
+            elif detach:
+                _detached.add(task)
+                task.add_done_callback(_detached.discard)
+            else:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})